@@ -0,0 +1,85 @@
+"""
+Retrieval latency of EpisodicMemory as the memory grows.
+
+Fills the memory with seeded random DIMACS problems and times retrieve_similar at several
+memory sizes, in either retrieval mode. In bm25 mode, up to --max-reference entries it also rebuilds rank_bm25.BM25Okapi per query,
+the way retrieval used to work, and checks that both return the same top-k ranking.
+
+Usage:
+    python -m benchmarks.bench_episodic_memory --sizes 100 1000 10000 40000
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from problem_generator.generate import GraphColoringGenerator
+from utils.episodic_memory import EpisodicMemory
+
+
+def random_problem(rng, labels):
+    """Returns a random G(n, p) instance in the DIMACS form used in the prompts."""
+    n = rng.randint(5, 50)
+    p = rng.choice([0.2, 0.4, 0.6, 0.8])
+    edges = [(labels[u], labels[v]) for u in range(n) for v in range(u + 1, n) if rng.random() < p]
+    return f"p edge {n} {len(edges)}\n" + "\n".join(f"e {u} {v}" for u, v in edges)
+
+
+def reference_top_k(memory, query, top_k):
+    """The previous retrieval: rebuild BM25Okapi over the whole memory for every query."""
+    from rank_bm25 import BM25Okapi
+
+    corpus = [doc['problem'].split() for doc in memory.memory]
+    scores = BM25Okapi(corpus).get_scores(query.split())
+    return np.argsort(scores, kind='stable')[::-1][:top_k].tolist(), scores
+
+
+def run(sizes, queries, top_k, max_reference, seed, mode="bm25"):
+    rng = random.Random(seed)
+    labels = list(GraphColoringGenerator().label_generator(50))
+    memory = EpisodicMemory()
+    query_set = [random_problem(rng, labels) for _ in range(queries)]
+    results = []
+    for size in sorted(sizes):
+        while len(memory.memory) < size:
+            memory.add_memory(random_problem(rng, labels), "(a 1)")
+
+        start = time.perf_counter()
+        for query in query_set:
+            memory.retrieve_similar(query, top_k, mode=mode)
+        latency = (time.perf_counter() - start) / len(query_set)
+        row = {"mode": mode, "memory_size": size, "index_ms": latency * 1000}
+
+        if mode == "bm25" and size <= max_reference:
+            start = time.perf_counter()
+            matches = 0
+            for query in query_set:
+                expected, scores = reference_top_k(memory, query, top_k)
+                got = memory.index.top_k(query.split(), top_k)
+                # Floating point summation order may only swap exact ties
+                matches += got == expected or np.allclose(scores[got], scores[expected])
+            row["rebuild_ms"] = (time.perf_counter() - start) / len(query_set) * 1000
+            row["same_ranking"] = matches == len(query_set)
+        results.append(row)
+        print(", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 10000, 20000, 40000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-reference", type=int, default=5000,
+                        help="largest memory size at which the rebuild-per-query reference is also timed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=["bm25", "structural"], default="bm25")
+    parser.add_argument("--output", help="optional path for the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.queries, args.top_k, args.max_reference, args.seed, args.mode)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,129 @@
+"""
+Startup latency of the Streamlit app.
+
+Measures, in fresh interpreters, how long the app's own imports take and which heavy modules
+(matplotlib, networkx, rank_bm25) they load. When streamlit is installed, it also runs
+run_app.py headless with streamlit.testing (against a solve service with the fake backend,
+started here) and times the first run, which creates the cached resources, and the reruns,
+which should only redraw the widgets. The exit status is 1 when a budget is exceeded.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5 --reruns 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# The modules run_app.py imports besides streamlit
+APP_IMPORTS = [
+    "utils.episodic_memory", "utils.graph", "solver.client", "utils.util_functions", "utils.visualization",
+]
+HEAVY_MODULES = ["matplotlib", "networkx", "rank_bm25"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(modules):
+    """Imports modules in a fresh interpreter; returns (seconds, heavy modules loaded)."""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}: __import__(name)\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps([seconds, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": ROOT}).stdout
+    seconds, heavy = json.loads(output.splitlines()[-1])
+    return seconds, heavy
+
+
+def start_service(port):
+    """Starts a solve service with the fake S1 backend and waits until it answers."""
+    from solver.client import ServiceClient
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "solver.service", "--port", str(port), "--backend", "fake", "--memory-db", "",
+         "--trace", ""],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    client = ServiceClient(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client.health()
+            return process
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("the solve service did not start")
+            time.sleep(0.1)
+
+
+def app_latency(reruns, port):
+    """Returns (first run seconds, [rerun seconds]) of run_app.py, or None without streamlit."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+    service = start_service(port)
+    os.environ["SOFAI_SERVICE_URL"] = f"http://127.0.0.1:{port}"
+    try:
+        app = AppTest.from_file(os.path.join(ROOT, "run_app.py"), default_timeout=60)
+        start = time.perf_counter()
+        app.run()
+        first = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(f"run_app.py raised: {app.exception[0].value}")
+        times = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            app.run()
+            times.append(time.perf_counter() - start)
+        return first, times
+    finally:
+        service.terminate()
+        service.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters timed per measurement")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8791, help="port of the solve service started for the app")
+    parser.add_argument("--max-import", type=float, default=0.5, help="budget in seconds for the app's imports")
+    parser.add_argument("--max-rerun", type=float, default=0.25, help="budget in seconds for a median rerun")
+    args = parser.parse_args()
+
+    failures = []
+    runs = [import_time(APP_IMPORTS) for _ in range(args.repeat)]
+    seconds = min(run[0] for run in runs)
+    heavy = sorted({m for run in runs for m in run[1]})
+    print(f"app imports (cold): {seconds * 1000:.1f} ms, heavy modules loaded: {', '.join(heavy) or 'none'}")
+    for module in HEAVY_MODULES:
+        try:
+            print(f"  for reference, {module}: {min(import_time([module])[0] for _ in range(args.repeat)) * 1000:.1f} ms")
+        except subprocess.CalledProcessError:
+            print(f"  for reference, {module}: not installed")
+    if seconds > args.max_import:
+        failures.append(f"app imports take {seconds:.3f}s (budget {args.max_import}s)")
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+
+    latency = app_latency(args.reruns, args.port)
+    if latency is None:
+        print("streamlit is not installed; app run and rerun latency not measured")
+    else:
+        first, times = latency
+        times.sort()
+        median = times[len(times) // 2] if times else 0.0
+        print(f"app first run: {first * 1000:.1f} ms, rerun: median {median * 1000:.1f} ms, "
+              f"max {max(times, default=0.0) * 1000:.1f} ms over {len(times)} reruns")
+        if median > args.max_rerun:
+            failures.append(f"median rerun takes {median:.3f}s (budget {args.max_rerun}s)")
+
+    for line in failures:
+        print(f"OVER BUDGET {line}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,199 @@
+"""
+Offline benchmark suite for the hot paths of the SOFAI loop.
+
+Times parse_graph, process_plan, GraphColoringValidator.validate_coloring, run_degree_of_saturation,
+EpisodicMemory.retrieve_similar (both modes), generate_example and generate_and_save_graphs on
+seeded G(n, p) instances over a sweep of sizes and edge densities. No model server is needed.
+
+Every result is the best of --repeat runs of the mean time per call (the least noisy estimate). Results are written
+as JSON and can be compared with a stored baseline: a case regresses when it is more than
+--threshold times slower than the baseline (and slower by at least --min-delta seconds), or
+when its result check (for example the chromatic numbers found by S2) differs. The exit status
+is 1 when anything regressed, so the suite can gate a deploy.
+
+Usage:
+    python -m benchmarks.bench_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --output bench_results.json --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from problem_generator.generate import GraphColoringGenerator, _labels, sparse_gnp_edges
+from solver.s2 import run_degree_of_saturation
+from utils.episodic_memory import EpisodicMemory
+from utils.example_generator import generate_example, greedy_color
+from utils.graph import CompactGraph
+from utils.util_functions import parse_graph, process_plan
+from validator.validate import GraphColoringValidator
+
+SIZES = [5, 10, 20, 30, 40, 50, 60, 100, 200]
+DENSITIES = [0.2, 0.4, 0.6]
+# Exact S2 grows exponentially; larger instances are only timed by the other benchmarks
+S2_MAX_VERTICES = 60
+
+
+def make_graph(n, p, seed, index):
+    """Returns a seeded G(n, p) instance; the same arguments always give the same graph."""
+    rng = np.random.default_rng([seed, n, round(p * 1000), index])
+    return CompactGraph(_labels(n), sparse_gnp_edges(n, p, rng))
+
+
+def greedy_response(graph):
+    """A valid coloring of graph formatted like an LLM response."""
+    coloring = greedy_color(graph, list(range(graph.num_vertices)))
+    return "\n".join(f"({graph.labels[v]} {c + 1})" for v, c in coloring.items())
+
+
+def time_calls(fn, calls, repeat, setup=None):
+    """
+    Returns the best of repeat runs of the mean seconds per call of fn(*args) for args in calls.
+    An untimed first run warms up lazily built state (indexes, caches, imports).
+    """
+    times = []
+    for args in calls[:1]:
+        fn(*args)
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for args in calls:
+            fn(*args)
+        times.append((time.perf_counter() - start) / len(calls))
+    return min(times)
+
+
+def fill_memory(memory_size, seed):
+    """Returns an EpisodicMemory holding memory_size seeded problems of 5 to 50 vertices."""
+    rng = random.Random(seed)
+    memory = EpisodicMemory()
+    for i in range(memory_size):
+        graph = make_graph(rng.randint(5, 50), rng.choice(DENSITIES), seed + 1, i)
+        memory.add_memory(graph.to_dimacs(), greedy_response(graph), graph=graph)
+    return memory
+
+
+def run_case(n, p, count, seed, repeat, memory, directory, s2_max_vertices):
+    """Runs every benchmark on count instances of G(n, p) and returns the result rows."""
+    graphs = [make_graph(n, p, seed, i) for i in range(count)]
+    paths = []
+    for i, graph in enumerate(graphs):
+        paths.append(os.path.join(directory, f"bench_n{n}_p{p}_{i}.col"))
+        with open(paths[-1], "w") as f:
+            f.write(graph.to_dimacs() + "\n")
+    responses = [greedy_response(graph) for graph in graphs]
+    colorings = [process_plan(response) for response in responses]
+    validators = [GraphColoringValidator(graph) for graph in graphs]
+    dimacs = [graph.to_dimacs() for graph in graphs]
+
+    results = {
+        "parse_graph": (time_calls(parse_graph, [(path,) for path in paths], repeat),
+                        sum(parse_graph(path)[1] for path in paths)),
+        "process_plan": (time_calls(process_plan, [(r,) for r in responses], repeat),
+                         sum(len(c) for c in colorings)),
+        "validate_coloring": (time_calls(lambda v, c: v.validate_coloring(c), list(zip(validators, colorings)), repeat),
+                              sum(v.validate_coloring(c)[0] for v, c in zip(validators, colorings))),
+        "retrieve_similar_bm25": (time_calls(lambda q: memory.retrieve_similar(q, 3, mode="bm25"),
+                                             [(q,) for q in dimacs], repeat), None),
+        "retrieve_similar_structural": (time_calls(lambda g: memory.retrieve_similar(g, 3, mode="structural"),
+                                                   [(g,) for g in graphs], repeat), None),
+        "generate_example": (time_calls(generate_example, [(g,) for g in graphs], repeat,
+                                        setup=lambda: random.seed(seed)), None),
+    }
+    generator = GraphColoringGenerator(os.path.join(directory, "generated"))
+    results["generate_and_save_graphs"] = (
+        time_calls(generator.generate_and_save_graphs, [(count, [n], p)], repeat, setup=lambda: random.seed(seed)) / count,
+        None,
+    )
+    if n <= s2_max_vertices:
+        chromatic_numbers = [run_degree_of_saturation(graph)[1] for graph in graphs]
+        results["run_degree_of_saturation"] = (
+            time_calls(run_degree_of_saturation, [(graph,) for graph in graphs], repeat), chromatic_numbers
+        )
+
+    rows = []
+    for benchmark, (seconds, check) in results.items():
+        rows.append({"benchmark": benchmark, "n": n, "p": p, "instances": count, "seconds": seconds, "check": check})
+        print(f"{benchmark:28s} n={n:<4d} p={p:<4} {seconds * 1000:10.3f} ms/call")
+    return rows
+
+
+def run(sizes, densities, count, seed, repeat, memory_size, s2_max_vertices):
+    memory = fill_memory(memory_size, seed)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            for p in densities:
+                rows.extend(run_case(n, p, count, seed, repeat, memory, directory, s2_max_vertices))
+    return rows
+
+
+def compare(rows, baseline_rows, threshold, min_delta):
+    """
+    Compares results with a baseline.
+
+    Returns:
+        list of str: One line per regression (slower than threshold times the baseline, or a different check).
+    """
+    baseline = {(row["benchmark"], row["n"], row["p"]): row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        key = (row["benchmark"], row["n"], row["p"])
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        name = f"{row['benchmark']} n={row['n']} p={row['p']}"
+        if base["check"] is not None and row["check"] != base["check"]:
+            regressions.append(f"{name}: result changed from {base['check']} to {row['check']}")
+        ratio = row["seconds"] / base["seconds"] if base["seconds"] > 0 else 1.0
+        if ratio > threshold and row["seconds"] - base["seconds"] > min_delta:
+            regressions.append(f"{name}: {row['seconds'] * 1000:.3f} ms vs {base['seconds'] * 1000:.3f} ms "
+                               f"({ratio:.2f}x)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--densities", type=float, nargs="+", default=DENSITIES)
+    parser.add_argument("--instances", type=int, default=5, help="instances per (size, density)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-size", type=int, default=1000, help="episodic memory entries queried by retrieval")
+    parser.add_argument("--s2-max-vertices", type=int, default=S2_MAX_VERTICES)
+    parser.add_argument("--output", help="optional path for the results as JSON")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=2.0, help="slowdown factor counted as a regression")
+    parser.add_argument("--min-delta", type=float, default=1e-4,
+                        help="slowdowns of fewer seconds per call are ignored as noise")
+    args = parser.parse_args()
+
+    rows = run(args.sizes, args.densities, args.instances, args.seed, args.repeat, args.memory_size,
+               args.s2_max_vertices)
+    report = {
+        "metadata": {
+            "python": platform.python_version(), "machine": platform.machine(), "seed": args.seed,
+            "instances": args.instances, "repeat": args.repeat, "memory_size": args.memory_size,
+        },
+        "results": rows,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(rows, baseline["results"], args.threshold, args.min_delta)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions against {args.compare}")
+        sys.exit(1 if regressions else 0)
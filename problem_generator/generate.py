@@ -1,15 +1,117 @@
-import networkx as nx
+import argparse
+import numpy as np
 import os
 from itertools import product
+from functools import lru_cache
+from multiprocessing import Pool
 import pickle
 from string import ascii_lowercase
 
+from utils.example_generator import greedy_color
+from utils.graph import CompactGraph
+
+
+def sparse_gnp_edges(n, p, rng):
+    """
+    Samples the edges of an Erdős–Rényi G(n, p) graph in O(n + m) time and memory.
+
+    Instead of flipping a coin for each of the n(n-1)/2 vertex pairs, the gaps between
+    consecutive edges in the enumeration of all pairs are drawn from a geometric distribution
+    (Batagelj and Brandes, 2005), so the cost only depends on the number of edges sampled.
+
+    Args:
+        n (int): Number of vertices.
+        p (float): Edge probability.
+        rng (np.random.Generator): Source of randomness.
+
+    Returns:
+        np.ndarray: An (m, 2) int64 array of edges (u, v) with u < v.
+    """
+    pairs = n * (n - 1) // 2
+    if p <= 0 or pairs == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    if p >= 1:
+        positions = np.arange(pairs, dtype=np.int64)
+    else:
+        chunks = []
+        last = -1
+        while True:
+            # Enough gaps for the expected number of edges in the remaining pairs, plus slack
+            size = int((pairs - last) * p + 10 * np.sqrt((pairs - last) * p + 1)) + 16
+            gaps = rng.geometric(p, size=size)
+            chunk = last + np.cumsum(gaps)
+            chunks.append(chunk[chunk < pairs])
+            if chunk[-1] >= pairs:
+                break
+            last = chunk[-1]
+        positions = np.concatenate(chunks)
+    # Pair number k enumerates (u, v), u < v, in order of v: k = v(v-1)/2 + u
+    v = ((1 + np.sqrt(1 + 8 * positions.astype(np.float64))) // 2).astype(np.int64)
+    v -= v * (v - 1) // 2 > positions  # guard against rounding up
+    v += (v + 1) * v // 2 <= positions  # and rounding down
+    u = positions - v * (v - 1) // 2
+    return np.stack([u, v], axis=1)
+
+
+@lru_cache(maxsize=None)
+def _labels(n_vertices):
+    return list(GraphColoringGenerator.label_generator(n_vertices))
+
+
+def _instance_rng(seed, n_vertices, index):
+    """Returns the generator of one instance; it only depends on the seed, size and index, not on the worker."""
+    return np.random.default_rng([seed, n_vertices, index])
+
+
+def _generate_instance(task):
+    """
+    Generates one instance and writes it as a .col file; runs in a pool worker.
+
+    With num_colors set, a solvable instance is made k-colorable by construction: every vertex is
+    assigned to one of k planted color classes and only pairs from different classes can be
+    joined. An unsolvable instance is G(n, p) with a planted (k+1)-clique, so it needs more than k
+    colors. Either way no graph has to be rejected and regenerated.
+    """
+    output_dir, n_vertices, index, p, seed, num_colors, solvable_fraction = task
+    labels = _labels(n_vertices)
+    rng = _instance_rng(seed, n_vertices, index)
+    solvable = None
+    if num_colors is not None:
+        solvable = bool(rng.random() < solvable_fraction)
+    edges = sparse_gnp_edges(n_vertices, p, rng)
+    if solvable:
+        classes = rng.permutation(np.arange(n_vertices) % num_colors)
+        edges = edges[classes[edges[:, 0]] != classes[edges[:, 1]]]
+    elif solvable is False:
+        if n_vertices <= num_colors:
+            raise ValueError(f"{n_vertices} vertices are always {num_colors}-colorable; cannot plant a "
+                             f"{num_colors + 1}-clique")
+        clique = np.sort(rng.choice(n_vertices, size=num_colors + 1, replace=False))
+        u, v = np.triu_indices(len(clique), k=1)
+        edges = np.unique(np.concatenate([edges, np.stack([clique[u], clique[v]], axis=1)]), axis=0)
+
+    if num_colors is None:
+        # Like generate_and_save_graphs, the budget is the size of a largest-first greedy coloring
+        graph = CompactGraph(labels, edges)
+        colors = max(greedy_color(graph, list(range(graph.num_vertices))).values(), default=-1) + 1
+    else:
+        colors = num_colors
+
+    file_name = os.path.join(output_dir, f"graph_n{n_vertices}_graph{index}.col")
+    label_array = np.asarray(labels, dtype=object)
+    with open(file_name, "w") as f:
+        f.write(f"c colors {colors} solvable {solvable} seed {seed} probability {p}\n")
+        f.write(f"p edge {n_vertices} {len(edges)}\n")
+        f.writelines(f"e {a} {b}\n" for a, b in zip(label_array[edges[:, 0]], label_array[edges[:, 1]]))
+    return file_name, n_vertices, len(edges), colors, solvable
+
 class GraphColoringGenerator:
     def __init__(self, output_dir="graph_coloring_problems"):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def label_generator(self, n):
+    @staticmethod
+    def label_generator(n):
         """Generates labels for nodes based on the number of vertices."""
         length = 1
         while True:
@@ -24,6 +126,8 @@ class GraphColoringGenerator:
         """Generates a planar Erdős–Rényi graph with labeled nodes."""
         # while True:
         # for i in range(n_graphs):
+        import networkx as nx  # only the legacy networkx path needs it; imported on first use
+
         labels = list(self.label_generator(n_vertices))
         G = nx.erdos_renyi_graph(n_vertices, p)
         relabel_mapping = {i: labels[i] for i in range(n_vertices)}
@@ -33,6 +137,8 @@ class GraphColoringGenerator:
 
     def chromatic_number(self, G):
         """Calculates the chromatic number using a greedy coloring algorithm."""
+        import networkx as nx
+
         coloring = nx.coloring.greedy_color(G, strategy="largest_first")
         return max(coloring.values()) + 1  # Colors start from 0
 
@@ -62,7 +168,66 @@ class GraphColoringGenerator:
                 # print(f"Generated graph with {n_vertices} vertices, chromatic number {chromatic_num}, saved to {file_name}")
 
         return chromatic_nums
+
+    def generate_dataset(self, n_graphs, n_vertices_list, p, seed=0, num_colors=None, solvable_fraction=1.0,
+                         processes=None, manifest="instances.csv"):
+        """
+        Generates instances in parallel and streams them to disk as they are produced.
+
+        Every instance is generated from its own seed derived from (seed, number of vertices,
+        index), so the dataset is the same whatever the number of processes. Graphs are sampled
+        in O(n + m), only .col files are written (no pickles), and the manifest gets one line per
+        instance as soon as it is written instead of results being collected in memory.
+
+        Args:
+            n_graphs (int): Number of graphs per size.
+            n_vertices_list (list of int): Graph sizes.
+            p (float): Edge probability.
+            seed (int): Base seed of the dataset.
+            num_colors (int, optional): Color budget k of the solvable/unsolvable mix. Solvable
+                instances are k-colorable by construction, unsolvable ones contain a (k+1)-clique (so
+                every size must exceed k unless solvable_fraction is 1.0).
+                Without it, instances are plain G(n, p) graphs and the budget is the greedy bound.
+            solvable_fraction (float): Share of solvable instances when num_colors is set
+                (1.0, 0.0 and 0.5 give the 100% solvable, 100% unsolvable and 50%-50% mixes).
+            processes (int, optional): Worker processes; defaults to the number of CPUs.
+            manifest (str): Manifest file name inside the output directory.
+
+        Returns:
+            str: The path of the manifest (file, vertices, edges, colors, solvable).
+        """
+        if num_colors is None and solvable_fraction != 1.0:
+            raise ValueError("An unsolvable share needs a color budget (num_colors)")
+        too_small = sorted(n for n in set(n_vertices_list) if n <= (num_colors or 0))
+        if solvable_fraction < 1.0 and too_small:
+            # An unsolvable instance needs room for its (k+1)-clique
+            raise ValueError(f"Unsolvable instances need more than {num_colors} vertices; sizes {too_small} are "
+                             f"always {num_colors}-colorable")
+        tasks = (
+            (self.output_dir, n, i, p, seed, num_colors, solvable_fraction)
+            for n in n_vertices_list for i in range(n_graphs)
+        )
+        manifest_path = os.path.join(self.output_dir, manifest)
+        with Pool(processes) as pool, open(manifest_path, "w") as f:
+            f.write("file,vertices,edges,colors,solvable\n")
+            for file_name, n_vertices, n_edges, colors, solvable in pool.imap_unordered(_generate_instance, tasks, chunksize=16):
+                f.write(f"{os.path.basename(file_name)},{n_vertices},{n_edges},{colors},{solvable}\n")
+                f.flush()
+        return manifest_path
+
+
 # Example usage:
 if __name__ == "__main__":
-    generator = GraphColoringGenerator()
-    generator.generate_and_save_graphs(100, [5,6,7,8,9,10,15,20,25,30,35,40,45,50], 0.4)
+    parser = argparse.ArgumentParser(description="Generate graph coloring instances.")
+    parser.add_argument("--graphs", type=int, default=100, help="graphs per size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 6, 7, 8, 9, 10, 15, 20, 25, 30, 35, 40, 45, 50])
+    parser.add_argument("--p", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--colors", type=int, default=None, help="color budget of a solvable/unsolvable mix")
+    parser.add_argument("--solvable-fraction", type=float, default=1.0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output-dir", default="graph_coloring_problems")
+    args = parser.parse_args()
+    generator = GraphColoringGenerator(args.output_dir)
+    print(generator.generate_dataset(args.graphs, args.sizes, args.p, seed=args.seed, num_colors=args.colors,
+                                     solvable_fraction=args.solvable_fraction, processes=args.processes))
@@ -1,87 +1,92 @@
 # imports app specific 
-import ollama
-from ollama import Client
 import streamlit as st
 
 # import general
-import re
 import os
-import signal
-import pickle
+import subprocess
+import sys
 import time
-import random
-import networkx as nx
-import matplotlib.pyplot as plt
-from collections import defaultdict
 
-# import specific functions
-from utils.episodic_memory import EpisodicMemory
-from validator.validate import GraphColoringValidator
-from utils.improvement_trend_evaluator import ImprovementTrendEvaluator
-from utils.example_generator import generate_example
-from solver.s2 import run_degree_of_saturation
-from utils.prompt_generator import prompt_generator
-from utils.util_functions import parse_graph, process_plan, save_run_to_file
-from problem_generator.generate import GraphColoringGenerator
-
-
-def model_res_generator(selected_model, messages):
-    # Simulate interaction with an LLM
-    stream = ollama.chat(
-        model=selected_model,
-        messages=messages,
-        stream=True,
-    )
-    response = ""
-    for chunk in stream:
-        response += chunk["message"]["content"]
-    return response
-
-def run_s2_with_timeout(graph_content):
-
-    result = run_degree_of_saturation(graph_content)
-    print(result)
-    return result, False
-
-def visualize_coloring(file_name, color_assignments, is_correct, feedback):
-    G = pickle.load(open(file_name, "rb"))
-    
-    unique_colors = sorted(set(color_assignments.values()))
-    color_palette = plt.cm.get_cmap('rainbow', len(unique_colors))
-    color_value_map = {color: color_palette(i) for i, color in enumerate(unique_colors)}
-    node_colors = [color_value_map[color_assignments[node]] if node in color_assignments else (0.5, 0.5, 0.5, 1.0) for node in G.nodes()]
-    
-    pos = nx.spring_layout(G, seed=42) if len(G.edges) > 0 else nx.circular_layout(G)
-
-    plt.figure(figsize=(8, 8))
-    nx.draw(G, pos, with_labels=True, node_color=node_colors, node_size=500, font_size=16)
-
-    if is_correct:
-        plt.title("Graph Coloring - Correct Solution", fontsize=20, color='green')
-    else:
-        plt.title(f"Graph Coloring - {feedback}", fontsize=20, color='red')
-
-    st.pyplot(plt)
-    plt.close()
+import numpy as np
 
+# import specific functions
+from utils.episodic_memory import RETRIEVAL_MODES
+from utils.graph import CompactGraph
+from solver.client import ServiceClient, ServiceError
+from utils.util_functions import process_plan
+from utils.visualization import BackgroundRenderer, LayoutCache
+
+
+PROMPT_TOKEN_BUDGET = 4096
+# The SOFAI loop runs in the solve service (python -m solver.service); "unix:/path" for a Unix socket
+SERVICE_URL = os.environ.get("SOFAI_SERVICE_URL", "http://127.0.0.1:8765")
+# S1 backend of a service started by the app; "fake" runs without a model server (solver/fake_llm.py)
+S1_BACKEND = os.environ.get("SOFAI_S1_BACKEND", "ollama")
+MODELS_TTL = 60  # seconds
+
+
+# Everything below that is decorated with st.cache_resource or st.cache_data is created once per
+# process and reused by every rerun and session; a rerun only redraws the widgets.
+@st.cache_resource
+def get_service(url):
+    """Connects to the solve service, starting a local one (once per process) if none answers."""
+    service = ServiceClient(url)
+    try:
+        service.health()
+        return service
+    except OSError:
+        if url.startswith("unix:"):
+            raise
+    port = url.rsplit(":", 1)[-1].strip("/")
+    # The service then starts the model server and pulls the model itself
+    subprocess.Popen([sys.executable, "-m", "solver.service", "--port", port, "--backend", S1_BACKEND])
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            service.health()
+            return service
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+@st.cache_data(ttl=MODELS_TTL, show_spinner=False)
+def list_models(url):
+    return get_service(url).models()
+
+
+@st.cache_resource
+def get_layout_cache():
+    """Layouts are computed once per instance (for every session); only node colors change between iterations."""
+    return LayoutCache()
 
-import subprocess
-process = subprocess.Popen(["ollama", "serve"])
 
-ollama.pull("mistral")
 st.title("CSP-SOFAI for Graph Coloring")
 
 # Initialize history
 if "messages" not in st.session_state:
     st.session_state["messages"] = []
 
+layout_cache = get_layout_cache()
+
 # Initialize model selection
 if "model" not in st.session_state:
     st.session_state["model"] = ""
 
-# Fetch available models
-models = [model["model"] for model in ollama.list()["models"]]
+# The service owns the model server, the episodic memory and the solution cache
+try:
+    service = get_service(SERVICE_URL)
+    # Fetch available models
+    models = list_models(SERVICE_URL)
+except (OSError, ServiceError) as e:
+    st.error(f"The solve service at {SERVICE_URL} is not available ({e}). Start it with: python -m solver.service")
+    st.stop()
 st.session_state["model"] = st.selectbox("Choose your model", models)
+retrieval_mode = st.selectbox("Episodic memory retrieval", RETRIEVAL_MODES)
+race_mode = st.checkbox("Race S1 and S2 (start S2 in the background as soon as the instance is loaded)")
+route_instances = st.checkbox("Route the instance to the cheapest solver tier likely to succeed")
+compact_prompt = st.checkbox(f"Compact prompts (adjacency lists, latest coloring only, at most {PROMPT_TOKEN_BUDGET} tokens)")
 
 # create layout with two columns
 col1, col2 = st.columns([1, 1])
@@ -95,112 +100,107 @@ with col1:
 if start_without_file:
 
     st.info("Generating a graph...")
-    generator = GraphColoringGenerator()
+    # Only needed once Start is pressed, so the generator is not imported on every rerun
+    from problem_generator.generate import GraphColoringGenerator, sparse_gnp_edges
+
     edg_prob = 0.6
     node_size = 5
-    num_probs = 1
-    chromatic_num = generator.generate_and_save_graphs(num_probs,[node_size], edg_prob)
-    file_path = f"graph_coloring_problems/graph_n{node_size}_graph0.col"
-    min_colors = chromatic_num[file_path]
-
-    # Assuming graph_generate() is defined elsewhere to generate a graph
-    # else:
-    #     st.warning("Please upload a file or press 'Start Without Uploading' to proceed.")
-    #     st.stop()
-
-    # initializing episodic memory, example generator, and trend evaluator
-    episodic_memory = EpisodicMemory()
-    trend_evaluator = ImprovementTrendEvaluator()
-
-    # Parse the graph
-    graph_content,num_edges,num_vertices, edges, vertices = parse_graph(file_path)
-
-
-    if episodic_memory.memory:
-        print("Episodic memory loaded.")
-        top_examples = episodic_memory.retrieve_similar(graph_content)
-        initial_prompt = prompt_generator(graph_content, min_colors, additional_examples=top_examples)
-    else:
-        print("No episodic memory found.")
-        initial_prompt = prompt_generator(graph_content, min_colors)
-
-    messages = [{"role": "user", "content": initial_prompt}]
-    st.session_state["messages"].append(messages[0])
-
-    # Display the modified input
-    with st.chat_message("user"):
-        st.write(initial_prompt)
-
-    iteration = 0
-    max_iterations = 5
-    s1_solved = False
-    s2_solved = False
-    timeout_occurred = False
-    start_time = time.time()
-
-    while iteration < max_iterations:
-        print(f"Starting iteration {iteration}...")
-        iteration += 1
-        s1_start_time = time.time()  
-        with st.chat_message("assistant"):
-            # Generate a response from the model
-            response = model_res_generator(st.session_state["model"], messages)
-            st.session_state["messages"].append(
-                {"role": "assistant", "content": response}
-            )
-            st.markdown(response)
-
-        print("message sent to model")
-        # print(response)
-        s1_time = time.time() - s1_start_time
-        messages.append({"role": "assistant", "content": response})
-        print(f"Iteration {iteration} complete. LLM responded in {s1_time:.2f} seconds.")
-
-        color_assignments = process_plan(response)
-        print(color_assignments)
-        validator = GraphColoringValidator(file_path)
-        coloring_correct, feedback = validator.validate_coloring(color_assignments)
-        print(feedback)
-        if feedback:
-            feedback_list = [f"adjacent vertices {edge[0]} and {edge[1]} have the same color" for edge in feedback]
-            feedback = " : ".join(feedback_list)
-        visualize_coloring(file_path.replace(".col",".pickle"), color_assignments, coloring_correct, feedback)
-        if coloring_correct:
-            st.success("The above coloring is correct!")
-            s1_solved = True
-            episodic_memory.add_memory(graph_content, response)
-            # save_run_to_file(output_filepath, f"Problem solved in {iteration} iterations.")
-            print("Problem solved by S1.")
-            break
-
-        trend_evaluator.update_feedback(feedback)
-        if iteration == max_iterations or trend_evaluator.get_no_improvement_flag():
-            st.warning("Reached maximum iterations without a correct coloring.")
-            st.info(
-                "System 1 solver could not solve the graph coloring problem in 5 turns, so invoking System 2 solver."
-            )
-            s2_start_time = time.time()
-            dos_result, timeout_occurred = run_s2_with_timeout(graph_content)
-            st.markdown(f"#### Coloring generated by Degree of Saturation algorithm:\n\n```\n{dos_result}\n```")
-            if not timeout_occurred:
-                dos_coloring, chromatic_number = dos_result
-                s2_time = time.time() - s2_start_time
-                s2_solved = True
-                episodic_memory.add_memory(graph_content, dos_coloring)
-                visualize_coloring(file_path.replace(".col",".pickle"), color_assignments, True, "Solution by DSATUR algorithm")
-                # save_run_to_file(output_filepath, "Solved by System 2.")
-                print(f"S2 solved the problem in {s2_time:.2f} seconds.")
-            break
-
-        if not coloring_correct and not timeout_occurred:
-            example = generate_example(graph_content)
-            full_feedback = f"Feedback: {feedback}. Example: {example}"
-            messages.append({"role": "user", "content": full_feedback})
-            st.error(f"The above coloring is not correct. Providing feedback:\n\n{full_feedback}")
+    labels = list(GraphColoringGenerator.label_generator(node_size))
+    graph_content = CompactGraph(labels, sparse_gnp_edges(node_size, edg_prob, np.random.default_rng())).to_dimacs()
+    # Without min_colors the service uses the size of a greedy coloring, like the generator
+    min_colors = None
+
+    # Built from the same text as the service's copy, so vertex ids in events match
+    graph = CompactGraph.from_dimacs(graph_content)
+    # Figures are drawn on a worker thread while the loop goes on, then shown in their placeholders
+    renderer = BackgroundRenderer(layout_cache)
+
+    def visualize_coloring(color_assignments, is_correct, feedback, conflicts=()):
+        renderer.submit(st.empty(), graph, color_assignments, is_correct, feedback, conflicts)
+        show_figures()
+
+    def show_figures(wait=False):
+        for placeholder, image in renderer.drain(wait=wait):
+            if image is None:
+                placeholder.caption("(figure skipped: superseded by a newer coloring)")
+            else:
+                placeholder.image(image)
+
+    def render(event, data):
+        """Shows the progress of the SOFAI loop in the app."""
+        show_figures()
+        if event == "route":
+            st.info(f"Routed to {data['tier']}: {data['reason']}")
+        elif event == "cache_hit":
+            st.success(f"Solved from the solution cache with {data['num_colors']} colors (isomorphic to a solved instance).")
+            visualize_coloring(data["coloring"], True, "Solution from cache")
+        elif event == "prompt":
+            st.session_state["messages"].append({"role": "user", "content": data["content"]})
+            # Display the modified input
+            with st.chat_message("user"):
+                st.write(data["content"])
+        elif event == "response":
+            st.session_state["messages"].append({"role": "assistant", "content": data["content"]})
+            with st.chat_message("assistant"):
+                st.markdown(data["content"])
+        elif event == "validation":
+            visualize_coloring(data["coloring"], data["correct"], data["feedback"], data["conflicts"])
+            if data["correct"]:
+                st.success("The above coloring is correct!")
+        elif event == "repair":
+            if data["success"]:
+                st.success(f"Local search repaired the coloring in {data['repair_time'] * 1000:.1f} ms "
+                           f"({data['iterations']} moves).")
+                visualize_coloring(data["coloring"], True, "Solution repaired by local search")
+            else:
+                st.info(f"Local search left {data['conflicts']} conflicts after {data['repair_time'] * 1000:.1f} ms.")
+        elif event == "feedback":
+            st.error(f"The above coloring is not correct. Providing feedback:\n\n{data['content']}")
             st.error("Generating a new coloring ...")
-            st.session_state["messages"].append({"role": "user", "content": full_feedback})
-
-    sofai_time = time.time() - start_time
-    # summary_line = f"{num_vertices},{example_index},{min_colors},{s1_solved},{s2_solved},{iteration},{num_edges},{s2_solved},{s1_time},{0 if timeout_occurred else s2_time if s2_solved else 0},{sofai_time}\n"
-    # f_summary.write(summary_line)
-    print("Summary updated for current example.")
\ No newline at end of file
+            st.session_state["messages"].append({"role": "user", "content": data["content"]})
+        elif event == "s2_start":
+            st.warning(f"Stopping System 1 after {data['iteration']} iterations: {data['reason']}.")
+            if data["trajectory"]:
+                st.table([{key: step[key] for key in ("iteration", "conflicts", "uncolored", "colors_used", "score")}
+                          for step in data["trajectory"]])
+            st.info("Invoking System 2 solver.")
+        elif event == "s2_result":
+            st.markdown(f"#### Coloring generated by Degree of Saturation algorithm:\n\n```\n{data['coloring']}\n```")
+            if not data["timeout_occurred"]:
+                visualize_coloring(process_plan(data["coloring"]), True, "Solution by DSATUR algorithm")
+            else:
+                st.warning(
+                    f"System 2 stopped before proving optimality. Best coloring found uses {data['num_colors']} colors; "
+                    f"the chromatic number is at least {data['lower_bound']}."
+                )
+                visualize_coloring(process_plan(data["coloring"]), True, "Best coloring by DSATUR within budget")
+        elif event == "race":
+            time_to_first_valid = data["time_to_first_valid"]
+            time_text = "n/a" if time_to_first_valid is None else f"{time_to_first_valid:.2f}s"
+            st.info(f"Race winner: {data['winner'] or 'none'}, time to first valid answer: {time_text}")
+
+    try:
+        job_id = service.submit(
+            graph_content, min_colors,
+            model=st.session_state["model"],
+            retrieval_mode=retrieval_mode,
+            race=race_mode,
+            token_budget=PROMPT_TOKEN_BUDGET if compact_prompt else None,
+            route=route_instances,
+        )
+        for record in service.events(job_id):
+            render(record["event"], record["data"])
+        job = service.status(job_id)
+    except (OSError, ServiceError) as e:
+        st.error(f"Lost the solve service: {e}")
+        st.stop()
+    show_figures(wait=True)
+    if job["status"] != "done":
+        st.error(f"Job {job_id} {job['status']}: {job['error']}")
+        st.stop()
+    summary = job["summary"]
+    with st.expander(f"Run trace {job_id} (appended to the service's trace)"):
+        st.table([{"phase": name, "calls": phase["count"], "seconds": round(phase["total"], 4)}
+                  for name, phase in sorted(job["phases"].items(), key=lambda item: -item[1]["total"])])
+    print(f"Run {job_id}: winner {summary['winner']} after {summary['iterations']} iterations "
+          f"in {summary['sofai_time']:.2f}s.")
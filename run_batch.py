@@ -0,0 +1,213 @@
+"""
+Headless batch mode: runs the SOFAI loop over every .col file of a problem directory.
+
+Instances are solved concurrently by a pool of threads. LLM calls go through a bounded
+semaphore so the model server is never asked for more generations than it can serve at once,
+and S2 searches run in a process pool. One CSV row is written per instance as soon as it
+completes, so a long sweep can be followed (and its partial results used) while it runs.
+
+Usage:
+    python run_batch.py --model mistral --workers 8 --llm-concurrency 2 --output summary.csv
+    python run_batch.py --backend fake --fake-modes conflicts correct --fake-token-rate 30 --output load.csv
+"""
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from solver.fake_llm import MODES as FAKE_MODES
+from solver.s1 import BACKENDS, make_client
+from solver.router import FEATURE_FIELDS, Router
+from solver.sofai import (
+    REPAIR_TIME_LIMIT, S2_MEMORY_LIMIT_MB, S2_TIME_LIMIT, greedy_min_colors, make_llm, make_s2_runner, solve_instance,
+)
+from utils.episodic_memory import EpisodicMemory, RETRIEVAL_MODES
+from utils.memory_store import SQLiteMemoryStore
+from utils.solution_cache import SolutionCache
+from utils.tracing import TraceWriter, Tracer
+from utils.graph_shards import is_dataset
+from utils.util_functions import load_graph, open_dataset
+
+SUMMARY_FIELDS = [
+    "file", "num_vertices", "num_edges", "min_colors", "cache_hit", "s1_solved", "s2_solved", "s2_optimal",
+    "timeout_occurred", "winner", "num_colors", "iterations", "s1_time", "s2_time", "sofai_time",
+    "time_to_first_valid", "s1_chunks", "prompt_tokens", "max_prompt_tokens",
+    "repair_attempts", "repair_successes", "repair_time", "route", *FEATURE_FIELDS,
+    "stop_reason", "trajectory",
+]
+
+
+def list_instances(problems_dir):
+    """Returns the paths of the instances of a directory of .col files or of a packed dataset."""
+    if is_dataset(problems_dir):
+        return [os.path.join(problems_dir, name) for name in open_dataset(problems_dir).names]
+    return sorted(glob.glob(os.path.join(problems_dir, "*.col")))
+
+
+def declared_colors(file_path):
+    """Returns the color budget written by GraphColoringGenerator.generate_dataset ("c colors k ..."), if any."""
+    directory, name = os.path.split(file_path)
+    if is_dataset(directory):
+        colors = open_dataset(directory).metadata(name)["colors"]
+        return colors if colors >= 0 else None
+    with open(file_path) as f:
+        parts = f.readline().split()
+    if len(parts) >= 3 and parts[:2] == ["c", "colors"]:
+        return int(parts[2])
+    return None
+
+
+def solve_file(file_path, llm, s2_runner, episodic_memory, solution_cache, router, trace_writer, args):
+    """Solves one instance and returns its summary row."""
+    graph = load_graph(file_path)
+    min_colors = declared_colors(file_path)
+    if min_colors is None:
+        min_colors = greedy_min_colors(graph)
+    tracer = Tracer(trace_writer, run_id=os.path.basename(file_path), profile_phases=args.profile_phases,
+                    profile_dir=args.profile_dir, trace_memory=args.trace_memory)
+    summary = solve_instance(
+        graph, min_colors, llm,
+        episodic_memory=episodic_memory,
+        solution_cache=solution_cache,
+        max_iterations=args.max_iterations,
+        retrieval_mode=args.retrieval_mode,
+        race=args.race,
+        s2_runner=s2_runner,
+        s2_time_limit=args.s2_time_limit,
+        s2_memory_limit_mb=args.s2_memory_limit_mb,
+        stop_on_conflict=args.stop_on_conflict,
+        token_budget=args.token_budget,
+        repair_time_limit=args.repair_time_limit,
+        router=router,
+        log_features=not args.no_features,
+        stopping_rules={
+            "plateau_window": args.plateau_window,
+            "stop_on_regression": not args.allow_regression,
+            "stop_on_repeat": not args.allow_repeat,
+            "projection": not args.no_projection,
+        },
+        tracer=tracer,
+    )
+    summary["file"] = os.path.basename(file_path)
+    summary["trajectory"] = json.dumps(summary["trajectory"], separators=(",", ":"))
+    return summary
+
+
+def run(args):
+    files = list_instances(args.problems_dir)
+    if args.limit:
+        files = files[:args.limit]
+    print(f"Solving {len(files)} instances from {args.problems_dir}")
+
+    store = SQLiteMemoryStore(args.memory_db, capacity=args.memory_capacity) if args.memory_db else None
+    episodic_memory = EpisodicMemory(store)
+    solution_cache = SolutionCache(args.cache_capacity) if args.cache_capacity else None
+    if args.backend == "fake":
+        client = make_client("fake", modes=args.fake_modes, conflicts=args.fake_conflicts,
+                             uncolored_fraction=args.fake_uncolored_fraction, tokens_per_second=args.fake_token_rate,
+                             first_token_latency=args.fake_first_token_latency)
+    else:
+        client = make_client("ollama")
+    llm = make_llm(args.model, threading.BoundedSemaphore(args.llm_concurrency), client)
+    router = None
+    if args.route:
+        router = Router.load(args.router_policy) if os.path.exists(args.router_policy) else Router()
+    trace_writer = TraceWriter(args.trace) if args.trace else None
+
+    start_time = time.time()
+    solved = 0
+    repair_attempts = repair_successes = 0
+    # Spawned, not forked: the instance threads may hold locks (logging, trace file, sqlite) at fork time
+    s2_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.s2_processes, mp_context=s2_context) as s2_pool, \
+            ThreadPoolExecutor(max_workers=args.workers) as instance_pool, \
+            open(args.output, "w", newline="") as f_summary:
+        writer = csv.DictWriter(f_summary, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        s2_runner = make_s2_runner(s2_pool, args.s2_time_limit, args.s2_memory_limit_mb)
+        futures = {
+            instance_pool.submit(solve_file, file_path, llm, s2_runner, episodic_memory, solution_cache, router, trace_writer, args): file_path
+            for file_path in files
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            file_path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"{file_path} failed: {e!r}")
+                continue
+            writer.writerow(summary)
+            f_summary.flush()
+            solved += summary["winner"] is not None
+            repair_attempts += summary["repair_attempts"]
+            repair_successes += summary["repair_successes"]
+            print(f"[{done}/{len(files)}] {summary['file']}: winner {summary['winner']}, "
+                  f"{summary['iterations']} iterations, {summary['sofai_time']:.2f}s")
+
+    print(f"Solved {solved}/{len(files)} instances in {time.time() - start_time:.1f}s; summary written to {args.output}")
+    if repair_attempts:
+        print(f"Repair solved {repair_successes}/{repair_attempts} invalid S1 colorings")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SOFAI loop over a directory of DIMACS instances.")
+    parser.add_argument("--problems-dir", default="graph_coloring_problems",
+                        help="directory of .col files, or a packed dataset (see utils/graph_shards.py)")
+    parser.add_argument("--model", default="mistral", help="ollama model used as S1")
+    parser.add_argument("--backend", choices=BACKENDS, default="ollama",
+                        help="S1 client: a local ollama server (started if needed) or the fake LLM of solver/fake_llm.py")
+    parser.add_argument("--fake-modes", nargs="+", choices=FAKE_MODES, default=["correct"],
+                        help="fake LLM answer per iteration (the last one repeats)")
+    parser.add_argument("--fake-conflicts", type=int, default=1, help="vertices spoiled in the fake 'conflicts' mode")
+    parser.add_argument("--fake-uncolored-fraction", type=float, default=0.2,
+                        help="share of vertices left out in the fake 'partial' mode")
+    parser.add_argument("--fake-token-rate", type=float, default=50.0, help="fake LLM tokens per second (0: no delay)")
+    parser.add_argument("--fake-first-token-latency", type=float, default=0.2, help="fake LLM seconds before the first chunk")
+    parser.add_argument("--output", default="summary.csv")
+    parser.add_argument("--workers", type=int, default=8, help="instances solved concurrently")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="maximum number of concurrent LLM generations")
+    parser.add_argument("--s2-processes", type=int, default=os.cpu_count(), help="S2 worker processes")
+    parser.add_argument("--max-iterations", type=int, default=5)
+    parser.add_argument("--plateau-window", type=int, default=2,
+                        help="abandon S1 after this many iterations without a lower conflict count")
+    parser.add_argument("--allow-regression", action="store_true",
+                        help="do not abandon S1 when the conflict count goes up")
+    parser.add_argument("--allow-repeat", action="store_true",
+                        help="do not abandon S1 when the model repeats an earlier coloring")
+    parser.add_argument("--no-projection", action="store_true",
+                        help="do not abandon S1 when its improvement rate cannot reach a valid coloring in time")
+    parser.add_argument("--retrieval-mode", choices=RETRIEVAL_MODES, default="bm25")
+    parser.add_argument("--race", action="store_true", help="start S2 in the background for every instance")
+    parser.add_argument("--stop-on-conflict", action="store_true",
+                        help="stop a generation at the first conflicting pair instead of the complete coloring")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="build compact S1 prompts of at most this many (estimated) tokens")
+    parser.add_argument("--repair-time-limit", type=float, default=REPAIR_TIME_LIMIT,
+                        help="local search budget in seconds per invalid S1 coloring (0 disables repair)")
+    parser.add_argument("--route", action="store_true",
+                        help="pick the first solver tier per instance from its features (see solver/router.py)")
+    parser.add_argument("--router-policy", default="router_policy.json",
+                        help="policy table fitted with 'python -m solver.router fit'; rules only if missing")
+    parser.add_argument("--no-features", action="store_true",
+                        help="do not compute the instance features of unrouted runs (the router cannot be fitted from them)")
+    parser.add_argument("--s2-time-limit", type=float, default=S2_TIME_LIMIT)
+    parser.add_argument("--s2-memory-limit-mb", type=int, default=S2_MEMORY_LIMIT_MB)
+    parser.add_argument("--memory-db", default="episodic_memory.db", help="episodic memory database ('' for in-process only)")
+    parser.add_argument("--memory-capacity", type=int, default=10000)
+    parser.add_argument("--cache-capacity", type=int, default=4096, help="solution cache size (0 disables it)")
+    parser.add_argument("--trace", default="traces.jsonl", help="JSONL trace of every run's phases ('' to disable)")
+    parser.add_argument("--profile-phases", nargs="*", default=[],
+                        help="phases to run under cProfile, e.g. llm validate s2 (see utils/tracing.py)")
+    parser.add_argument("--profile-dir", default="profiles", help="where the .prof files of --profile-phases go")
+    parser.add_argument("--trace-memory", action="store_true", help="record the tracemalloc peak of every phase")
+    parser.add_argument("--limit", type=int, default=0, help="only solve the first LIMIT instances")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
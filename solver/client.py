@@ -0,0 +1,108 @@
+"""
+Client of the solve service (solver/service.py).
+
+Only the standard library is imported, so a thin front end such as the app starts without
+loading the solver.
+"""
+import http.client
+import json
+import socket
+from urllib.parse import urlsplit
+
+DEFAULT_PORT = 8765
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ServiceError(Exception):
+    """An error response of the service."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class ServiceClient:
+    """Blocking client of the service, for the app and scripts."""
+
+    def __init__(self, url=f"http://127.0.0.1:{DEFAULT_PORT}", timeout=30.0):
+        """
+        Args:
+            url (str): "http://host:port" or "unix:/path/to/socket".
+            timeout (float): Socket timeout in seconds; event streams wait as long as the job's deadline.
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def _connection(self, timeout):
+        if self.url.startswith("unix:"):
+            return UnixHTTPConnection(self.url[len("unix:"):], timeout=timeout)
+        parts = urlsplit(self.url)
+        return http.client.HTTPConnection(parts.hostname, parts.port or DEFAULT_PORT, timeout=timeout)
+
+    def _request(self, method, path, payload=None, timeout=-1):
+        connection = self._connection(self.timeout if timeout == -1 else timeout)
+        body = None if payload is None else json.dumps(payload).encode()
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status >= 400:
+            message = json.loads(response.read() or b"{}").get("error", response.reason)
+            connection.close()
+            raise ServiceError(response.status, message)
+        return connection, response
+
+    def _json(self, method, path, payload=None):
+        connection, response = self._request(method, path, payload)
+        try:
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+    def health(self):
+        return self._json("GET", "/health")
+
+    def models(self):
+        return self._json("GET", "/models")["models"]
+
+    def submit(self, graph, min_colors=None, **options):
+        """
+        Submits an instance.
+
+        Args:
+            graph (str): The instance as DIMACS text.
+            min_colors (int, optional): The color budget.
+            **options: Job options (see JOB_OPTIONS).
+
+        Returns:
+            str: The job id.
+        """
+        return self._json("POST", "/jobs", {"graph": graph, "min_colors": min_colors, "options": options})["id"]
+
+    def status(self, job_id):
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def events(self, job_id, start=0):
+        """Yields the job's events ({"event", "data", "time"}) as they happen, up to its final status."""
+        # S2 may run for minutes without an event
+        connection, response = self._request("GET", f"/jobs/{job_id}/events?from={start}", timeout=None)
+        try:
+            for line in response:
+                yield json.loads(line)
+        finally:
+            connection.close()
+
+    def solve(self, graph, min_colors=None, **options):
+        """Submits an instance, waits for the end of the job and returns its status."""
+        job_id = self.submit(graph, min_colors, **options)
+        for _ in self.events(job_id):
+            pass
+        return self.status(job_id)
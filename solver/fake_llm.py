@@ -0,0 +1,156 @@
+"""
+Deterministic stand-in for the S1 model, for offline load and latency testing.
+
+FakeLLMClient speaks the same streaming protocol as the ollama client (see solver/s1.py): chat()
+returns a closable iterator of {"message": {"content": ...}} chunks. It reads the graph from the
+prompt (DIMACS or compact adjacency lists), colors it with DSATUR and streams the coloring at a
+configurable token rate after a configurable first-token latency, so throughput and
+orchestration can be measured on a CPU-only machine without a model server.
+"""
+import random
+import re
+import threading
+import time
+
+from solver.s2 import dsatur_coloring
+from utils.graph import CompactGraph
+from utils.prompt_generator import count_tokens
+
+MODES = ("correct", "conflicts", "partial")
+ADJACENCY_LINE = re.compile(r"^(\w+):((?:\s+\w+)*)\s*$")
+
+
+def prompt_graph(content):
+    """
+    Reads the instance from the first prompt of a conversation.
+
+    Args:
+        content (str): The prompt of prompt_generator (DIMACS edges) or of PromptBuilder (adjacency lists).
+
+    Returns:
+        CompactGraph: The instance; episodic memory examples in the prompt are ignored.
+    """
+    if "Objective:" in content:
+        # Examples from episodic memory come after the objective
+        return CompactGraph.from_dimacs(content.split("Objective:")[0])
+    labels, index, edges = [], {}, []
+    in_graph = False
+    for line in content.splitlines():
+        if line.startswith("Graph ("):
+            in_graph = True
+            continue
+        if not in_graph:
+            continue
+        match = ADJACENCY_LINE.match(line)
+        if match is None:
+            break
+        for label in [match.group(1), *match.group(2).split()]:
+            if label not in index:
+                index[label] = len(labels)
+                labels.append(label)
+        edges.extend((index[match.group(1)], index[v]) for v in match.group(2).split())
+    return CompactGraph(labels, edges)
+
+
+class FakeStream:
+    """Iterator of response chunks with the close() of a streaming HTTP response."""
+
+    def __init__(self, pieces, first_token_latency, seconds_per_token):
+        self._pieces = pieces
+        self._first_token_latency = first_token_latency
+        self._seconds_per_token = seconds_per_token
+        self.closed = False
+        self.sent = 0
+
+    def __iter__(self):
+        if self._first_token_latency:
+            time.sleep(self._first_token_latency)
+        for text, tokens in self._pieces:
+            if self.closed:
+                return
+            if self._seconds_per_token:
+                time.sleep(tokens * self._seconds_per_token)
+            self.sent += 1
+            yield {"message": {"role": "assistant", "content": text}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeLLMClient:
+    """
+    S1 client that answers coloring prompts with a DSATUR coloring, optionally spoiled.
+
+    The mode of each answer is taken from modes by the number of earlier requests with the same
+    first prompt (the last mode repeats), so for example ("conflicts", "correct") fails once and
+    succeeds on the first retry, whether the conversation grows or is rebuilt by PromptBuilder.
+    """
+
+    def __init__(self, modes=("correct",), conflicts=1, uncolored_fraction=0.2, tokens_per_second=50.0,
+                 first_token_latency=0.2, tokens_per_chunk=1, seed=0):
+        """
+        Args:
+            modes (str or sequence of str): "correct", "conflicts" (conflicts vertices recolored to a
+                neighbour's color) or "partial" (uncolored_fraction of the vertices left out).
+            conflicts (int): Vertices spoiled in "conflicts" mode.
+            uncolored_fraction (float): Share of vertices missing in "partial" mode.
+            tokens_per_second (float): Generation rate (0 for no delay).
+            first_token_latency (float): Seconds before the first chunk.
+            tokens_per_chunk (int): Tokens per streamed chunk (see count_tokens).
+            seed (int): Seed of the spoiled vertices; the same prompt always gets the same answer.
+        """
+        modes = (modes,) if isinstance(modes, str) else tuple(modes)
+        for mode in modes:
+            if mode not in MODES:
+                raise ValueError(f"Unknown fake LLM mode {mode!r}; expected one of {MODES}")
+        self.modes = modes
+        self.conflicts = conflicts
+        self.uncolored_fraction = uncolored_fraction
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.tokens_per_chunk = tokens_per_chunk
+        self.seed = seed
+        self.calls = 0
+        self._turns = {}  # first prompt -> requests answered so far
+        self._lock = threading.Lock()
+
+    def list_models(self):
+        return ["fake"]
+
+    def response(self, messages):
+        """Returns the full response text for a conversation."""
+        first = next(message["content"] for message in messages if message["role"] == "user")
+        graph = prompt_graph(first)
+        with self._lock:
+            self.calls += 1
+            turn = self._turns.get(first, 0)
+            self._turns[first] = turn + 1
+        mode = self.modes[min(turn, len(self.modes) - 1)]
+        rng = random.Random(f"{self.seed}:{turn}:{graph.to_dimacs()}")
+        colors = dsatur_coloring(graph.adjacency_bitsets())
+        vertices = list(range(graph.num_vertices))
+        if mode == "conflicts":
+            spoilable = [v for v in vertices if len(graph.neighbours(v))]
+            for v in rng.sample(spoilable, min(self.conflicts, len(spoilable))):
+                colors[v] = colors[rng.choice(graph.neighbours(v).tolist())]
+        elif mode == "partial":
+            missing = set(rng.sample(vertices, int(len(vertices) * self.uncolored_fraction)))
+            vertices = [v for v in vertices if v not in missing]
+        return "\n".join(f"({graph.labels[v]} {colors[v]})" for v in vertices)
+
+    def chat(self, model, messages):
+        """Streams the response in chunks of tokens_per_chunk tokens, like ollama.chat(stream=True)."""
+        text = self.response(messages)
+        pieces = []
+        # Whitespace counts as no token and travels with the following chunk
+        buffer, tokens = "", 0
+        for token in re.findall(r"\w+|[^\w]", text):
+            buffer += token
+            tokens += count_tokens(token)
+            if tokens >= self.tokens_per_chunk:
+                pieces.append((buffer, tokens))
+                buffer, tokens = "", 0
+        if buffer:
+            pieces.append((buffer, max(tokens, 1)))
+        seconds_per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        return FakeStream(pieces, self.first_token_latency, seconds_per_token)
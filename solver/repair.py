@@ -0,0 +1,116 @@
+import random
+import time
+
+from utils.graph import CompactGraph
+
+
+def _initial_colors(graph, coloring, num_colors):
+    """
+    Maps a {label: color} assignment onto colors 0..num_colors-1.
+
+    The num_colors most used colors of the assignment keep their classes; vertices with another
+    color or no color at all get the color with the fewest conflicts among their neighbours.
+    """
+    counts = {}
+    for color in coloring.values():
+        counts[color] = counts.get(color, 0) + 1
+    kept = sorted(counts, key=lambda c: (-counts[c], c))[:num_colors]
+    remap = {color: i for i, color in enumerate(kept)}
+    colors = [remap.get(coloring.get(label), -1) for label in graph.labels]
+    for v, c in enumerate(colors):
+        if c < 0:
+            used = [0] * num_colors
+            for u in graph.neighbours(v).tolist():
+                if colors[u] >= 0:
+                    used[colors[u]] += 1
+            colors[v] = min(range(num_colors), key=lambda c: used[c])
+    return colors
+
+
+def tabucol(graph, coloring, num_colors, time_limit=0.05, max_iterations=100000, seed=0):
+    """
+    Repairs a coloring with TabuCol local search within a fixed number of colors.
+
+    Starting from the given (possibly invalid or partial) assignment, every step moves one
+    conflicting vertex to the color that removes the most conflicts. Undoing a move is tabu for a
+    number of steps that grows with the number of conflicts, unless it yields the best
+    assignment seen so far.
+
+    :param graph: The instance, as a CompactGraph.
+    :param coloring: The starting {vertex label: color} assignment, e.g. from process_plan.
+    :param num_colors: The color budget.
+    :param time_limit: Wall-clock budget in seconds.
+    :param max_iterations: Maximum number of moves.
+    :param seed: Seed of the tabu tenure randomisation.
+    :return: A tuple (coloring, num_conflicts, iterations) where coloring maps every vertex label
+             to a color in 1..num_colors and num_conflicts is the number of conflicting edges
+             left (0 when the repair succeeded).
+    """
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_dimacs(graph)
+    n = graph.num_vertices
+    if n == 0 or num_colors < 1:
+        return {}, 0 if n == 0 else graph.num_edges, 0
+    rng = random.Random(seed)
+    neighbours = [graph.neighbours(v).tolist() for v in range(n)]
+    colors = _initial_colors(graph, coloring, num_colors)
+
+    # gamma[v][c]: number of neighbours of v with color c
+    gamma = [[0] * num_colors for _ in range(n)]
+    for v in range(n):
+        row = gamma[v]
+        for u in neighbours[v]:
+            row[colors[u]] += 1
+    conflicts = sum(gamma[v][colors[v]] for v in range(n)) // 2
+    conflicting = {v for v in range(n) if gamma[v][colors[v]]}
+    best, best_colors = conflicts, list(colors)
+    tabu = {}  # (vertex, color) -> first iteration at which the move is allowed again
+    deadline = time.monotonic() + time_limit
+
+    iteration = 0
+    while conflicts and iteration < max_iterations:
+        if iteration % 64 == 0 and time.monotonic() > deadline:
+            break
+        iteration += 1
+        move, move_delta, ties = None, None, 0
+        for v in conflicting:
+            row = gamma[v]
+            current = row[colors[v]]
+            for c in range(num_colors):
+                if c == colors[v]:
+                    continue
+                delta = row[c] - current
+                if tabu.get((v, c), 0) > iteration and conflicts + delta >= best:
+                    continue
+                if move is None or delta < move_delta:
+                    move, move_delta, ties = (v, c), delta, 1
+                elif delta == move_delta:
+                    # Uniform choice among the equally good moves
+                    ties += 1
+                    if rng.randrange(ties) == 0:
+                        move = (v, c)
+        if move is None:
+            # Every move is tabu; let the oldest restrictions lapse
+            tabu.clear()
+            continue
+        v, c = move
+        old = colors[v]
+        for u in neighbours[v]:
+            gamma[u][old] -= 1
+            gamma[u][c] += 1
+            if gamma[u][colors[u]]:
+                conflicting.add(u)
+            else:
+                conflicting.discard(u)
+        colors[v] = c
+        if gamma[v][c]:
+            conflicting.add(v)
+        else:
+            conflicting.discard(v)
+        conflicts += move_delta
+        tabu[(v, old)] = iteration + rng.randrange(10) + int(0.6 * len(conflicting)) + 1
+        if conflicts < best:
+            best, best_colors = conflicts, list(colors)
+
+    labels = graph.labels
+    return {labels[v]: c + 1 for v, c in enumerate(best_colors)}, best, iteration
@@ -0,0 +1,201 @@
+"""
+Metacognitive router: picks the solver tier for an instance before any solver runs.
+
+Cheap features (size, density, degeneracy, greedy clique and DSATUR bounds) place an instance
+in a cell of a policy table. Each cell records how often every tier succeeded on past instances
+of that cell, and how long it took; the router picks the tier with the lowest expected time to a
+valid answer. Cells without enough data fall back to rules on the bounds.
+
+The table is fitted from the summary CSVs written by run_batch.py:
+
+    python -m solver.router fit summary.csv --output router_policy.json
+"""
+import argparse
+import bisect
+import csv
+import json
+
+from solver.s2 import dsatur_coloring, greedy_clique
+
+TIERS = ("S1", "repair", "S2")
+SIZE_BINS = [10, 20, 30, 40, 50, 75, 100, 150, 200, 500]
+DENSITY_BINS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8]
+FEATURE_FIELDS = ["density", "max_degree", "degeneracy", "clique_bound", "dsatur_bound"]
+
+
+def degeneracy(graph):
+    """Returns the degeneracy of graph (the largest minimum degree of any subgraph), by repeatedly removing a minimum degree vertex."""
+    degree = graph.degrees().tolist()
+    buckets = {}
+    for v, d in enumerate(degree):
+        buckets.setdefault(d, set()).add(v)
+    removed = [False] * graph.num_vertices
+    result = 0
+    d = 0
+    for _ in range(graph.num_vertices):
+        d = max(d - 1, 0)
+        while not buckets.get(d):
+            d += 1
+        v = buckets[d].pop()
+        removed[v] = True
+        result = max(result, d)
+        for u in graph.neighbours(v).tolist():
+            if not removed[u]:
+                buckets[degree[u]].discard(u)
+                degree[u] -= 1
+                buckets.setdefault(degree[u], set()).add(u)
+    return result
+
+
+def instance_features(graph):
+    """
+    Computes the routing features of an instance.
+
+    Args:
+        graph (CompactGraph): The instance.
+
+    Returns:
+        dict: density, max_degree, degeneracy, clique_bound (size of a greedy clique, a lower bound
+              on the chromatic number) and dsatur_bound (colors of the DSATUR coloring, an upper bound).
+    """
+    n, m = graph.num_vertices, graph.num_edges
+    adjacency = graph.adjacency_bitsets()
+    return {
+        "density": 2 * m / (n * (n - 1)) if n > 1 else 0.0,
+        "max_degree": int(graph.degrees().max()) if n else 0,
+        "degeneracy": degeneracy(graph),
+        "clique_bound": len(greedy_clique(adjacency)),
+        "dsatur_bound": max(dsatur_coloring(adjacency), default=0),
+    }
+
+
+def cell_key(num_vertices, density, min_colors, clique_bound, dsatur_bound):
+    """
+    Returns the policy table cell of an instance.
+
+    The color budget is compared with the bounds: "infeasible" when a clique needs more colors,
+    "easy" when DSATUR already fits in the budget, "tight" otherwise.
+    """
+    if clique_bound > min_colors:
+        gap = "infeasible"
+    elif dsatur_bound <= min_colors:
+        gap = "easy"
+    else:
+        gap = "tight"
+    return f"{bisect.bisect_left(SIZE_BINS, num_vertices)}|{bisect.bisect_left(DENSITY_BINS, density)}|{gap}"
+
+
+def _outcomes(row):
+    """Yields (tier, succeeded, seconds) for every tier that ran in a summary row of run_batch.py."""
+    route = row.get("route") or "S1"
+    winner = row.get("winner") or ""
+    s2_ran = winner == "S2" or row.get("s2_solved") == "True" or row.get("timeout_occurred") == "True"
+    if route == "S1":
+        # The S1 tier includes the repair of its colorings between iterations
+        yield "S1", winner in ("S1", "repair"), float(row["s1_time"] or 0) + float(row.get("repair_time") or 0)
+    elif route == "repair":
+        yield "repair", winner == "repair", float(row.get("repair_time") or 0)
+    if s2_ran:
+        yield "S2", row.get("s2_solved") == "True", float(row["s2_time"] or 0)
+
+
+class Router:
+    """
+    Chooses "S1", "repair" or "S2" for an instance from its features and a fitted policy table.
+
+    The expected cost of a tier is its mean time plus, when it fails, the mean time of S2, which
+    always answers. The solution cache is not routed: a lookup is cheaper than the features and
+    always comes first.
+    """
+
+    def __init__(self, cells=None, min_samples=3):
+        """
+        Args:
+            cells (dict, optional): {cell key: {tier: {"attempts", "successes", "time"}}}, see fit().
+            min_samples (int): Attempts a tier needs in a cell before its statistics are used.
+        """
+        self.cells = cells or {}
+        self.min_samples = min_samples
+
+    @classmethod
+    def fit(cls, rows, min_samples=3):
+        """
+        Builds the policy table from run logs.
+
+        Args:
+            rows (iterable of dict): Summary rows of run_batch.py (with the feature columns).
+            min_samples (int): See __init__.
+
+        Returns:
+            Router: The fitted router.
+        """
+        cells = {}
+        for row in rows:
+            if row.get("cache_hit") == "True" or not row.get("clique_bound"):
+                continue
+            key = cell_key(int(row["num_vertices"]), float(row["density"]), int(row["min_colors"]),
+                           int(row["clique_bound"]), int(row["dsatur_bound"]))
+            for tier, succeeded, seconds in _outcomes(row):
+                stats = cells.setdefault(key, {}).setdefault(tier, {"attempts": 0, "successes": 0, "time": 0.0})
+                stats["attempts"] += 1
+                stats["successes"] += succeeded
+                stats["time"] += seconds
+        return cls(cells, min_samples)
+
+    @classmethod
+    def load(cls, path, min_samples=3):
+        with open(path) as f:
+            policy = json.load(f)
+        return cls(policy["cells"], min_samples)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"size_bins": SIZE_BINS, "density_bins": DENSITY_BINS, "cells": self.cells}, f, indent=2)
+
+    def route(self, num_vertices, min_colors, features):
+        """
+        Picks the tier for an instance.
+
+        Args:
+            num_vertices (int): Number of vertices.
+            min_colors (int): The color budget.
+            features (dict): As returned by instance_features.
+
+        Returns:
+            tuple: (tier, reason) where reason is a short explanation for logs and the UI.
+        """
+        key = cell_key(num_vertices, features["density"], min_colors, features["clique_bound"],
+                       features["dsatur_bound"])
+        stats = {tier: s for tier, s in self.cells.get(key, {}).items() if s["attempts"] >= self.min_samples}
+        if "S2" in stats:
+            s2_cost = stats["S2"]["time"] / stats["S2"]["attempts"]
+            costs = {"S2": s2_cost}
+            for tier in ("S1", "repair"):
+                if tier in stats:
+                    s = stats[tier]
+                    success_rate = s["successes"] / s["attempts"]
+                    costs[tier] = s["time"] / s["attempts"] + (1 - success_rate) * s2_cost
+            tier = min(costs, key=costs.get)
+            return tier, f"cell {key}: expected {costs[tier]:.2f}s (" + ", ".join(
+                f"{t} {c:.2f}s" for t, c in sorted(costs.items())) + ")"
+        # No data for this cell: decide on the bounds alone
+        if features["clique_bound"] > min_colors:
+            return "S2", f"cell {key}: a clique of {features['clique_bound']} vertices exceeds the {min_colors} color budget"
+        if features["dsatur_bound"] <= min_colors:
+            return "repair", f"cell {key}: DSATUR already fits in {min_colors} colors"
+        return "S1", f"cell {key}: no data, default order"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the router policy table from run_batch.py summaries.")
+    parser.add_argument("command", choices=["fit"])
+    parser.add_argument("summaries", nargs="+", help="summary CSV files written by run_batch.py")
+    parser.add_argument("--output", default="router_policy.json")
+    args = parser.parse_args()
+    rows = []
+    for path in args.summaries:
+        with open(path, newline="") as f:
+            rows.extend(csv.DictReader(f))
+    router = Router.fit(rows)
+    router.save(args.output)
+    print(f"Fitted {len(router.cells)} cells from {len(rows)} runs into {args.output}")
@@ -1,13 +1,131 @@
-import ollama
-
-def model_res_generator(selected_model, messages):
-    # Simulate interaction with an LLM
-    stream = ollama.chat(
-        model=selected_model,
-        messages=messages,
-        stream=True,
-    )
+"""
+System 1: the LLM.
+
+S1 talks to its model through a client object with two methods:
+
+    chat(model, messages)  returns an iterable of {"message": {"content": str}} chunks that has a
+                           close() method to abandon the generation (the ollama streaming protocol);
+    list_models()          returns the names of the models that can be used.
+
+OllamaClient is the real backend; solver/fake_llm.FakeLLMClient is a local stand-in with
+configurable answers and latency, for load tests without a model server.
+"""
+import subprocess
+import time
+
+BACKENDS = ("ollama", "fake")
+DEFAULT_MODEL = "mistral"
+
+
+class OllamaClient:
+    """
+    Client of a local ollama server. The ollama package is imported and the server started on
+    first use, so importing this module (or using another backend) costs nothing.
+    """
+
+    def __init__(self, start_server=True):
+        """
+        Args:
+            start_server (bool): Spawn "ollama serve" if no server answers.
+        """
+        self.start_server = start_server
+        self.server = None  # the spawned "ollama serve" process, if any
+        self._ollama = None
+
+    def _client(self):
+        if self._ollama is None:
+            import ollama
+
+            self._ollama = ollama
+            self.ensure_server()
+        return self._ollama
+
+    def ensure_server(self, timeout=10.0):
+        """Starts "ollama serve" unless a server is already running, and waits until it answers."""
+        import ollama
+
+        try:
+            ollama.list()
+            return
+        except Exception:
+            if not self.start_server:
+                raise
+        self.server = subprocess.Popen(["ollama", "serve"])
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ollama.list()
+                return
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def list_models(self):
+        return [model["model"] for model in self._client().list()["models"]]
+
+    def pull(self, model):
+        """Downloads model unless the server already has it."""
+        if not any(name.split(":")[0] == model.split(":")[0] for name in self.list_models()):
+            self._client().pull(model)
+
+    def chat(self, model, messages):
+        return self._client().chat(model=model, messages=messages, stream=True)
+
+
+def make_client(backend="ollama", **options):
+    """
+    Returns an S1 client.
+
+    Args:
+        backend (str): "ollama" or "fake".
+        **options: Keyword arguments of the client (see FakeLLMClient for the fake backend).
+    """
+    if backend == "ollama":
+        return OllamaClient(**options)
+    if backend == "fake":
+        from solver.fake_llm import FakeLLMClient
+
+        return FakeLLMClient(**options)
+    raise ValueError(f"Unknown S1 backend {backend!r}; expected one of {BACKENDS}")
+
+
+_default_client = None
+
+
+def default_client():
+    """The OllamaClient shared by callers that do not pass a client."""
+    global _default_client
+    if _default_client is None:
+        _default_client = OllamaClient()
+    return _default_client
+
+
+def model_res_generator(selected_model, messages, should_stop=None, parser=None, client=None):
+    """
+    Streams a response from the model.
+
+    Args:
+        selected_model (str): The model name.
+        messages (list): The chat messages.
+        should_stop (callable, optional): Checked after every chunk; the generation is abandoned once it returns True.
+        parser (StreamingPlanParser, optional): Fed every chunk; the generation stops as soon as it has
+            the whole coloring (or a conflict, if it was created with stop_on_conflict).
+        client (optional): The S1 client (see the module docstring); the shared OllamaClient by default.
+
+    Returns:
+        str: The response text received so far.
+    """
+    if client is None:
+        client = default_client()
+    stream = client.chat(selected_model, messages)
     response = ""
     for chunk in stream:
-        response += chunk["message"]["content"]
-    return response
\ No newline at end of file
+        content = chunk["message"]["content"]
+        response += content
+        # Abandon the generation when the caller no longer needs it (e.g. S2 won the race)
+        # or when the rest of the response cannot change the parsed coloring any more
+        if (parser is not None and parser.feed(content)) or (should_stop is not None and should_stop()):
+            stream.close()
+            break
+    return response
@@ -1,133 +1,454 @@
+import os
 import re
-from collections import defaultdict
+import time
+import queue
+import multiprocessing
 
-def run_degree_of_saturation(graph_content, sorted_vertices=None):
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from utils.graph import CompactGraph
+
+EDGE_LINE = re.compile(r"e\s+(\w+)\s+(\w+)")
+
+
+def parse_dimacs_bitsets(graph_content, sorted_vertices=None):
     """
-    Implements the Degree of Saturation (DSATUR) algorithm for graph coloring 
-    with iterative backtracking to ensure the optimal chromatic number.
-    
-    :param graph_content: The graph definition in DIMACS format as a string.
-    :param sorted_vertices: Pre-sorted vertices by degree (optional). If not provided, it will be computed.
-    :return: A string representing the coloring of the graph and the chromatic number.
+    Parses DIMACS graph content into integer-indexed vertices with adjacency bitmasks.
+
+    :param graph_content: The graph definition in DIMACS format as a string, or a CompactGraph.
+    :param sorted_vertices: Optional vertex ordering; vertices are numbered in this order.
+    :return: A tuple (labels, adjacency) where labels[i] is the label of vertex i and
+             adjacency[i] is an int whose bit j is set when i and j share an edge.
     """
-    vertices = set()
-    edges = defaultdict(list)
+    if isinstance(graph_content, CompactGraph):
+        if sorted_vertices is None:
+            return list(graph_content.labels), graph_content.adjacency_bitsets()
+        graph_content = graph_content.to_dimacs()
 
-    # Parse the DIMACS graph content to extract vertices and edges
+    index = {}
+    labels = []
+    if sorted_vertices is not None:
+        for v in sorted_vertices:
+            if v not in index:
+                index[v] = len(labels)
+                labels.append(v)
+
+    edges = []
     for line in graph_content.strip().splitlines():
         line = line.strip()
         # Skip comment lines or problem line
         if line.startswith('c') or line.startswith('p'):
             continue
-        
+
         # Parse the edges: "e u v" where u and v are vertex labels (strings or numbers)
-        match = re.match(r"e\s+(\w+)\s+(\w+)", line)
+        match = EDGE_LINE.match(line)
         if match:
-            v1, v2 = match.groups()
-            vertices.add(v1)
-            vertices.add(v2)
-            edges[v1].append(v2)
-            edges[v2].append(v1)
-
-    # Function to check if the current coloring is valid
-    def is_valid_coloring(vertex, color, forbidden_colors):
-        return color not in forbidden_colors[vertex]
-
-    # Iterative backtracking to find the optimal chromatic number
-    def iterative_backtrack(sorted_vertices, chromatic_number, edges):
-        stack = [({}, 0, {v: set() for v in sorted_vertices})]  # Add forbidden colors to the stack
-        min_colors = chromatic_number
-
-        while stack:
-            current_colors, index, forbidden_colors = stack.pop()
-            if index == len(sorted_vertices):
-                # Check the number of unique colors used
-                num_colors = len(set(current_colors.values()))
-                if num_colors < min_colors:
-                    min_colors = num_colors
-                continue
+            for v in match.groups():
+                if v not in index:
+                    index[v] = len(labels)
+                    labels.append(v)
+            edges.append((index[match.group(1)], index[match.group(2)]))
 
-            vertex = sorted_vertices[index]
-            for color in range(1, min_colors + 1):
-                if is_valid_coloring(vertex, color, forbidden_colors):
-                    current_colors[vertex] = color  # Assign the color
+    adjacency = [0] * len(labels)
+    for u, v in edges:
+        if u != v:
+            adjacency[u] |= 1 << v
+            adjacency[v] |= 1 << u
+    return labels, adjacency
 
-                    # Update forbidden colors for neighbors
-                    new_forbidden_colors = {v: set(fc) for v, fc in forbidden_colors.items()}
-                    for neighbor in edges[vertex]:
-                        new_forbidden_colors[neighbor].add(color)
 
-                    stack.append((current_colors.copy(), index + 1, new_forbidden_colors))
-                    del current_colors[vertex]  # Unassign the color after backtracking
+def _bits(mask):
+    """Yields the indices of the set bits of mask in increasing order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
 
-        return min_colors
 
-    # Initialize data structures for DSATUR
-    colors = {}
-    saturation_degree = {v: 0 for v in vertices}
-    degree = {v: len(edges[v]) for v in vertices}
+def greedy_clique(adjacency):
+    """
+    Finds a large clique greedily; its size is a lower bound on the chromatic number.
 
-    # Sort vertices by degree (to reduce the search space in backtracking) if not provided
-    if sorted_vertices is None:
-        sorted_vertices = sorted(vertices, key=lambda v: degree[v], reverse=True)
+    Every vertex is tried as a seed, and the clique is grown by repeatedly adding the
+    candidate with the most neighbours among the remaining candidates.
 
-    # Perform DSATUR to get an initial estimate of the chromatic number
-    while len(colors) < len(vertices):
-        # Select the vertex with the highest saturation degree (ties broken by highest degree)
-        candidate_vertex = max(
-            vertices - colors.keys(),
-            key=lambda v: (saturation_degree[v], degree[v])
-        )
+    :param adjacency: Adjacency bitmasks as returned by parse_dimacs_bitsets.
+    :return: A list of vertex indices forming a clique.
+    """
+    best = []
+    for seed in range(len(adjacency)):
+        if adjacency[seed].bit_count() < len(best):
+            continue
+        clique = [seed]
+        candidates = adjacency[seed]
+        while candidates:
+            v = max(_bits(candidates), key=lambda u: (adjacency[u] & candidates).bit_count())
+            clique.append(v)
+            candidates &= adjacency[v]
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+
+def dsatur_coloring(adjacency):
+    """
+    Colors the graph with the DSATUR heuristic; the result is an upper bound on the chromatic number.
 
+    :param adjacency: Adjacency bitmasks as returned by parse_dimacs_bitsets.
+    :return: A list where entry i is the color (starting at 1) of vertex i.
+    """
+    n = len(adjacency)
+    colors = [0] * n
+    forbidden = [0] * n  # bit c set when color c appears in the neighbourhood
+    degree = [adj.bit_count() for adj in adjacency]
+    uncolored = set(range(n))
+    while uncolored:
+        # Select the vertex with the highest saturation degree (ties broken by highest degree)
+        v = max(uncolored, key=lambda u: (forbidden[u].bit_count(), degree[u]))
         # Assign the smallest possible color
-        forbidden_colors = {colors[neighbor] for neighbor in edges[candidate_vertex] if neighbor in colors}
-        color = 1
-        while color in forbidden_colors:
-            color += 1
+        free = ~forbidden[v] & ~1
+        color = (free & -free).bit_length() - 1
+        colors[v] = color
+        uncolored.discard(v)
+        for u in _bits(adjacency[v]):
+            forbidden[u] |= 1 << color
+    return colors
+
+
+def branch_and_bound(adjacency, deadline=None, on_improve=None):
+    """
+    Exact DSATUR branch-and-bound over adjacency bitmasks.
+
+    The search starts from the DSATUR coloring as the incumbent, pre-colors a greedy clique
+    (which also breaks color symmetry) and only looks for colorings that use fewer colors
+    than the incumbent. It stops as soon as the incumbent meets the clique lower bound.
+
+    :param adjacency: Adjacency bitmasks as returned by parse_dimacs_bitsets.
+    :param deadline: Optional time.monotonic() value after which the search gives up.
+    :param on_improve: Optional callback called with (colors, num_colors, lower_bound)
+                       every time a better coloring is found, including the initial one.
+    :return: A tuple (colors, num_colors, lower_bound, optimal) where colors[i] is the color
+             of vertex i and optimal tells whether num_colors was proven minimal.
+    """
+    n = len(adjacency)
+    if n == 0:
+        return [], 0, 0, True
+
+    clique = greedy_clique(adjacency)
+    lower_bound = len(clique)
+    best_colors = dsatur_coloring(adjacency)
+    best = max(best_colors)
+    if on_improve is not None:
+        on_improve(list(best_colors), best, lower_bound)
+    if best <= lower_bound:
+        return best_colors, best, lower_bound, True
 
-        colors[candidate_vertex] = color
+    neighbours = [list(_bits(adj)) for adj in adjacency]
+    color = [0] * n
+    # count[v][c] is the number of colored neighbours of v that use color c
+    count = [[0] * (best + 1) for _ in range(n)]
+    forbidden = [0] * n
+    free_degree = [len(nbrs) for nbrs in neighbours]
+    uncolored = set(range(n))
 
-        # Update saturation degree for neighbors
-        for neighbor in edges[candidate_vertex]:
-            if neighbor not in colors:
-                saturation_degree[neighbor] += 1
+    def assign(v, c):
+        color[v] = c
+        uncolored.discard(v)
+        for u in neighbours[v]:
+            if not color[u]:
+                row = count[u]
+                if not row[c]:
+                    forbidden[u] |= 1 << c
+                row[c] += 1
+                free_degree[u] -= 1
 
-    # Initial chromatic number estimate from DSATUR
-    chromatic_number = max(colors.values())
+    def unassign(v):
+        c = color[v]
+        color[v] = 0
+        uncolored.add(v)
+        for u in neighbours[v]:
+            if not color[u]:
+                row = count[u]
+                row[c] -= 1
+                if not row[c]:
+                    forbidden[u] &= ~(1 << c)
+                free_degree[u] += 1
 
-    # Use iterative backtracking to minimize the chromatic number
-    optimal_chromatic_number = iterative_backtrack(sorted_vertices, chromatic_number, edges)
+    for c, v in enumerate(clique, start=1):
+        assign(v, c)
+
+    # Each frame is [vertex, colors still to try, colors used before the vertex was colored]
+    stack = []
+    used = lower_bound
+    nodes = 0
+    timed_out = False
+    descend = True
+    while True:
+        if descend:
+            if not uncolored:
+                best = used
+                best_colors = list(color)
+                if on_improve is not None:
+                    on_improve(list(best_colors), best, lower_bound)
+                if best <= lower_bound:
+                    break
+                descend = False
+                continue
+            v = max(uncolored, key=lambda u: (forbidden[u].bit_count(), free_degree[u]))
+            limit = min(used + 1, best - 1)
+            candidates = ((1 << (limit + 1)) - 2) & ~forbidden[v]
+            stack.append([v, candidates, used])
+        if not stack:
+            break
+        frame = stack[-1]
+        v, candidates, prev_used = frame
+        if color[v]:
+            unassign(v)
+        # A better incumbent may have been found since the frame was pushed
+        candidates &= (1 << best) - 2
+        if not candidates:
+            stack.pop()
+            descend = False
+            continue
+        low = candidates & -candidates
+        frame[1] = candidates ^ low
+        c = low.bit_length() - 1
+        assign(v, c)
+        used = max(prev_used, c)
+        descend = True
+
+        nodes += 1
+        if deadline is not None and nodes % 1024 == 0 and time.monotonic() > deadline:
+            timed_out = True
+            break
+
+    if timed_out:
+        return best_colors, best, lower_bound, False
+    return best_colors, best, best, True
+
+
+def run_degree_of_saturation(graph_content, sorted_vertices=None):
+    """
+    Finds an optimal coloring with DSATUR followed by an exact bitset branch-and-bound.
 
-    # Re-color the graph using the optimal chromatic number
-    final_colors = {}
-    iterative_backtrack(sorted_vertices, optimal_chromatic_number, edges)
+    DSATUR gives the initial estimate of the chromatic number and a greedy clique gives
+    a lower bound; the branch-and-bound then searches for colorings with fewer colors
+    and stops as soon as the two bounds meet.
+    
+    :param graph_content: The graph definition in DIMACS format as a string, or a CompactGraph.
+    :param sorted_vertices: Pre-sorted vertices by degree (optional). Used as the vertex numbering,
+                            which decides how ties are broken during the search.
+    :return: A string representing the coloring of the graph and the chromatic number.
+    """
+    labels, adjacency = parse_dimacs_bitsets(graph_content, sorted_vertices)
+    colors, chromatic_number, _, _ = branch_and_bound(adjacency)
 
     # Format the output in the expected (vertex color) format
-    coloring_output = "\n".join([f"({v} {c})" for v, c in final_colors.items()])
-    return coloring_output, optimal_chromatic_number
+    coloring_output = "\n".join([f"({labels[i]} {c})" for i, c in enumerate(colors)])
+    return coloring_output, chromatic_number
+
+def _limit_memory(memory_limit_mb):
+    """Caps the address space of the current process at its current size plus memory_limit_mb."""
+    if resource is None or not memory_limit_mb:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        # A worker starts with the interpreter's mappings (or, if forked, its parent's), so budget on top of them
+        with open("/proc/self/statm") as f:
+            limit += int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _anytime_worker(adjacency, time_limit, memory_limit_mb, results):
+    """Runs branch_and_bound in a worker process and streams every improvement back."""
+    _limit_memory(memory_limit_mb)
+    deadline = time.monotonic() + time_limit
+    try:
+        colors, num_colors, lower_bound, optimal = branch_and_bound(
+            adjacency,
+            deadline=deadline,
+            on_improve=lambda c, k, lb: results.put(("improve", c, k, lb)),
+        )
+        results.put(("done", colors, num_colors, lower_bound, optimal))
+    except MemoryError:
+        results.put(("error", "memory limit exceeded"))
+
+
+def run_degree_of_saturation_budgeted(labels, adjacency, time_limit=30.0, memory_limit_mb=None):
+    """
+    Runs the exact S2 search in the calling process with a cooperative deadline.
+
+    Meant for long-lived pool workers (see run_batch.py), where starting one process per
+    instance as S2Job does would be wasted work. On timeout or when the memory budget is
+    exhausted the best coloring found so far is returned.
+
+    :param labels: Vertex labels as returned by parse_dimacs_bitsets.
+    :param adjacency: Adjacency bitmasks as returned by parse_dimacs_bitsets.
+    :param time_limit: Wall-clock budget in seconds.
+    :param memory_limit_mb: Extra address space this process may allocate, in megabytes (None for no limit).
+    :return: A tuple (coloring_output, num_colors, lower_bound, timed_out) as for run_degree_of_saturation_anytime.
+    """
+    _limit_memory(memory_limit_mb)
+    best = []
+
+    def keep(colors, num_colors, lower_bound):
+        best[:] = [list(colors), num_colors, lower_bound]
+
+    try:
+        colors, num_colors, lower_bound, optimal = branch_and_bound(
+            adjacency, deadline=time.monotonic() + time_limit, on_improve=keep
+        )
+    except MemoryError:
+        if best:
+            colors, num_colors, lower_bound = best
+        else:
+            colors = dsatur_coloring(adjacency)
+            num_colors, lower_bound = max(colors, default=0), len(greedy_clique(adjacency))
+        optimal = False
+    coloring_output = "\n".join([f"({labels[i]} {c})" for i, c in enumerate(colors)])
+    return coloring_output, num_colors, lower_bound, not optimal
+
+
+class S2Job:
+    """
+    Handle on an exact S2 search running in a killable background worker process.
+
+    The worker streams every improved coloring back, so the caller can poll for the best coloring
+    found so far while doing other work (for example S1 iterations), wait for the result, or
+    cancel the search as soon as it is no longer needed.
+    """
+
+    def __init__(self, graph_content, time_limit=30.0, memory_limit_mb=1024):
+        """
+        :param graph_content: The graph definition in DIMACS format as a string, or a CompactGraph.
+        :param time_limit: Wall-clock budget in seconds, counted from start().
+        :param memory_limit_mb: Extra address space the worker may allocate, in megabytes (None for no limit).
+        """
+        self.labels, self.adjacency = parse_dimacs_bitsets(graph_content)
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.best_colors = None
+        self.num_colors = None
+        self.lower_bound = 0
+        self.optimal = False
+        self.done = False
+        self.started_at = None
+        self.finished_at = None  # monotonic time the worker reported its end (or was found dead)
+        self.error = None  # why the worker stopped early (e.g. "memory limit exceeded"), if it did
+        self.improvements = []  # (seconds since start() when received, num_colors) per reported coloring
+        self._results = None
+        self._worker = None
+
+    def start(self):
+        # Jobs are started from worker threads (run_batch.py, solver/service.py); forking would copy
+        # the locks those threads hold into the worker
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        self._worker = context.Process(
+            target=_anytime_worker,
+            args=(self.adjacency, self.time_limit, self.memory_limit_mb, self._results),
+            daemon=True,
+        )
+        self.started_at = time.monotonic()
+        self._worker.start()
+        return self
+
+    def _handle(self, message):
+        if message[0] == "improve":
+            _, self.best_colors, self.num_colors, self.lower_bound = message
+        elif message[0] == "done":
+            _, self.best_colors, self.num_colors, self.lower_bound, self.optimal = message
+            self.done = True
+            self.finished_at = time.monotonic()
+        else:
+            self.error = message[1]
+            self.done = True
+            self.finished_at = time.monotonic()
+        if message[0] != "error" and (not self.improvements or self.improvements[-1][1] != self.num_colors):
+            self.improvements.append((time.monotonic() - self.started_at, self.num_colors))
+
+    def poll(self, timeout=0.0):
+        """Collects the reports sent so far, waiting up to timeout seconds for the first one; returns done."""
+        block = timeout > 0
+        while not self.done:
+            try:
+                message = self._results.get(timeout=timeout) if block else self._results.get_nowait()
+            except queue.Empty:
+                if not self._worker.is_alive() and self._results.empty():
+                    self.done = True
+                    self.finished_at = time.monotonic()
+                break
+            self._handle(message)
+            block = False
+        return self.done
+
+    def time_to_colors(self, num_colors):
+        """Seconds from start() until a coloring with at most num_colors colors was received, or None."""
+        for elapsed, reported in self.improvements:
+            if reported <= num_colors:
+                return elapsed
+        return None
+
+    def wait(self):
+        """Blocks until the search finishes or its budget is spent, then stops the worker."""
+        deadline = self.started_at + self.time_limit
+        while not self.done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.poll(timeout=min(remaining, 0.1))
+        self.cancel()
+        return self.result()
+
+    def cancel(self):
+        """Stops the worker; the best coloring reported so far stays available."""
+        if self._worker is not None:
+            self.poll()
+            if self._worker.is_alive():
+                self._worker.terminate()
+            self._worker.join()
+        self.done = True
+
+    def result(self):
+        """
+        :return: A tuple (coloring_output, num_colors, lower_bound, timed_out) for the best coloring so far.
+                 timed_out is True when num_colors was not proven optimal.
+        """
+        best_colors = self.best_colors
+        num_colors, lower_bound = self.num_colors, self.lower_bound
+        if best_colors is None:
+            # The worker was stopped before its first report; fall back to the plain heuristic
+            best_colors = dsatur_coloring(self.adjacency)
+            num_colors = max(best_colors, default=0)
+            lower_bound = len(greedy_clique(self.adjacency))
+        coloring_output = "\n".join([f"({self.labels[i]} {c})" for i, c in enumerate(best_colors)])
+        return coloring_output, num_colors, lower_bound, not self.optimal
+
+
+def run_degree_of_saturation_anytime(graph_content, time_limit=30.0, memory_limit_mb=1024):
+    """
+    Runs the exact S2 search in a killable worker process with a wall-clock and memory budget.
+
+    The worker reports every improved coloring as it is found, so when the budget runs out
+    the best valid coloring so far is returned together with its proven lower bound.
+
+    :param graph_content: The graph definition in DIMACS format as a string, or a CompactGraph.
+    :param time_limit: Wall-clock budget in seconds.
+    :param memory_limit_mb: Extra address space the worker may allocate, in megabytes (None for no limit).
+    :return: A tuple (coloring_output, num_colors, lower_bound, timed_out). timed_out is True when
+             the search did not prove num_colors optimal within the budget.
+    """
+    return S2Job(graph_content, time_limit, memory_limit_mb).start().wait()
 
 # Example function to load the generated graph content
 def load_graph_from_file(file_path):
     with open(file_path, 'r') as f:
         return f.read()
-
-# # Example usage (if CSP is not solved by the LLM):
-# graph_content = load_graph_from_file("/work/vedant/2024/final_cpde/coling-CODE/problem_generator/graph_coloring_problems/graph_n20_graph0.col")
-# sorted_vertices = None  # Optionally pre-compute and pass sorted vertices for performance optimization
-# import time
-# start = time.time()
-# dos_coloring, chromatic_number = run_degree_of_saturation(graph_content, sorted_vertices)
-# print(time.time()-start)
-# # Output the coloring and the chromatic number
-# print(f"Coloring:\n{dos_coloring}")
-# print(f"Chromatic Number: {chromatic_number}")
-
-# graph_content = load_graph_from_file("/work/vedant/2024/final_cpde/coling-CODE/problem_generator/graph_coloring_problems/graph_n10_graph0.col")
-# sorted_vertices = None  # Optionally pre-compute and pass sorted vertices for performance optimization
-# import time
-# start = time.time()
-# dos_coloring, chromatic_number = run_degree_of_saturation(graph_content, sorted_vertices)
-# print(time.time()-start)
-# # Output the coloring and the chromatic number
-# print(f"Coloring:\n{dos_coloring}")
-# print(f"Chromatic Number: {chromatic_number}")
\ No newline at end of file
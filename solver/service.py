@@ -0,0 +1,537 @@
+"""
+Headless SOFAI solve service: a job queue behind a small HTTP API, over TCP or a Unix socket.
+
+Jobs are queued on an asyncio queue and taken by a fixed number of workers, each running the
+SOFAI loop (solver/sofai.solve_instance) on a thread. As in run_batch.py, LLM generations go
+through a bounded semaphore and S2 searches run in a process pool; the episodic memory, the
+solution cache, the router and the trace file are shared by every job. A full queue rejects new
+jobs with 503 instead of growing without bound, and every job has a deadline after which its
+generation is abandoned, its S2 budget is cut and the job is marked expired.
+
+API (JSON bodies; every response closes the connection):
+
+    POST /jobs                    {"graph": "<DIMACS>", "min_colors": 3, "options": {...}} -> 202 {"id": ...}
+    GET  /jobs/<id>               status, summary, per-phase times and error of a job
+    GET  /jobs/<id>/events?from=N progress events (those of on_event) as NDJSON, streamed until the job ends
+    GET  /models                  models offered by the S1 backend
+    GET  /health                  queue and worker counts
+
+solver/client.ServiceClient is the client side, without the solver's imports.
+
+Usage:
+    python -m solver.service --port 8765 --workers 8 --llm-concurrency 2
+    python -m solver.service --unix /tmp/sofai.sock --backend fake
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from solver.client import DEFAULT_PORT
+from solver.fake_llm import MODES as FAKE_MODES
+from solver.router import Router
+from solver.s1 import BACKENDS, DEFAULT_MODEL, make_client, model_res_generator
+from solver.sofai import (
+    REPAIR_TIME_LIMIT, S2_MEMORY_LIMIT_MB, S2_TIME_LIMIT, greedy_min_colors, make_s2_runner, solve_instance,
+)
+from utils.episodic_memory import EpisodicMemory, RETRIEVAL_MODES
+from utils.graph import CompactGraph
+from utils.improvement_trend_evaluator import STOPPING_RULES
+from utils.memory_store import SQLiteMemoryStore
+from utils.solution_cache import SolutionCache
+from utils.tracing import TraceWriter, Tracer
+
+DEFAULT_DEADLINE = 300.0  # seconds from submission
+MODELS_TTL = 60.0  # seconds a model listing is reused
+FINISHED = ("done", "failed", "expired")
+# Options a job may set; the rest of solve_instance's arguments belong to the service
+JOB_OPTIONS = {
+    "model": str, "max_iterations": int, "retrieval_mode": str, "race": bool, "stop_on_conflict": bool,
+    "token_budget": int, "repair_time_limit": float, "route": bool, "s2_time_limit": float,
+    "stopping_rules": dict, "deadline": float,
+}
+# Numeric options that must be greater than zero (a repair_time_limit of 0 disables repair)
+POSITIVE_OPTIONS = ("max_iterations", "token_budget", "s2_time_limit", "deadline")
+NON_NEGATIVE_OPTIONS = ("repair_time_limit",)
+POSITIVE_STOPPING_RULES = ("plateau_window", "max_iterations")
+STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               503: "Service Unavailable"}
+
+
+class DeadlineExceeded(Exception):
+    """Raised inside a job that ran past its deadline."""
+
+
+def to_json(value):
+    """json.dumps default for the sets, tuples and numpy scalars found in events and summaries."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(value):
+    return json.dumps(value, default=to_json)
+
+
+class Job:
+    """One submitted instance: its options, progress events and outcome."""
+
+    def __init__(self, graph, min_colors, options, deadline):
+        """min_colors may be None until a worker computes the default budget (see SolveService.submit)."""
+        self.id = uuid.uuid4().hex[:12]
+        self.graph = graph
+        self.min_colors = min_colors
+        self.options = options
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.deadline = time.monotonic() + deadline
+        self.events = []
+        self.summary = None
+        self.error = None
+        self.phases = {}
+        self._waiters = []  # futures of event streams waiting for the next event
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def publish(self, event, data=None):
+        """Appends an event and wakes the streams; only called on the event loop."""
+        self.events.append({"event": event, "data": data, "time": time.time() - self.submitted})
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def wait_events(self, start):
+        """Waits until there is an event after the first start ones, or the job has finished."""
+        while len(self.events) <= start and self.status not in FINISHED:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    def finish(self, status, summary=None, error=None):
+        self.status = status
+        self.summary = summary
+        self.error = error
+        self.finished = time.time()
+        self.graph = None  # the instance is no longer needed once the job is over
+        self.publish(status, {"summary": summary, "error": error})
+
+    def to_dict(self):
+        return {
+            "id": self.id, "status": self.status, "min_colors": self.min_colors, "options": self.options,
+            "submitted": self.submitted, "started": self.started, "finished": self.finished,
+            "events": len(self.events), "summary": self.summary, "error": self.error, "phases": self.phases,
+        }
+
+
+class SolveService:
+    """
+    The job queue and the worker pools. Jobs run concurrently on workers threads; S1 generations
+    are limited to llm_concurrency at a time and S2 searches to s2_processes processes.
+    """
+
+    def __init__(self, client, model=DEFAULT_MODEL, workers=8, llm_concurrency=2, s2_processes=None,
+                 queue_size=64, deadline=DEFAULT_DEADLINE, episodic_memory=None, solution_cache=None,
+                 router=None, trace_writer=None, s2_time_limit=S2_TIME_LIMIT,
+                 s2_memory_limit_mb=S2_MEMORY_LIMIT_MB, retain_jobs=1000):
+        """
+        Args:
+            client: The S1 client (see solver/s1.py).
+            model (str): Model used by jobs that do not name one.
+            workers (int): Jobs solved concurrently.
+            llm_concurrency (int): Maximum number of concurrent LLM generations.
+            s2_processes (int, optional): S2 worker processes; one per CPU by default.
+            queue_size (int): Jobs waiting for a worker before submissions are rejected.
+            deadline (float): Default seconds from submission to the end of a job.
+            episodic_memory (EpisodicMemory, optional): Shared by every job.
+            solution_cache (SolutionCache, optional): Shared by every job.
+            router (Router, optional): Used by jobs submitted with the "route" option.
+            trace_writer (TraceWriter, optional): Where the trace of every job is appended.
+            s2_time_limit (float): Default S2 budget in seconds (always cut to the job's deadline).
+            s2_memory_limit_mb (int): S2 memory budget in megabytes.
+            retain_jobs (int): Finished jobs kept for status queries; the oldest are forgotten first.
+        """
+        self.client = client
+        self.model = model
+        self.workers = workers
+        self.deadline = deadline
+        self.episodic_memory = episodic_memory
+        self.solution_cache = solution_cache
+        self.router = router
+        self.trace_writer = trace_writer
+        self.s2_time_limit = s2_time_limit
+        self.s2_memory_limit_mb = s2_memory_limit_mb
+        self.retain_jobs = retain_jobs
+        self.jobs = OrderedDict()
+        self.running = 0
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.limiter = threading.BoundedSemaphore(llm_concurrency)
+        self.solver_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sofai-job")
+        # Forking this process would copy its threads' locks and open connections into the workers
+        self.s2_pool = ProcessPoolExecutor(max_workers=s2_processes, mp_context=multiprocessing.get_context("spawn"))
+        self._workers = []
+        self._loop = None
+        self._models = None  # (listing, monotonic time)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self.solver_pool.shutdown(wait=False, cancel_futures=True)
+        self.s2_pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, graph, min_colors=None, options=None):
+        """
+        Queues a job.
+
+        Args:
+            graph (CompactGraph): The instance.
+            min_colors (int, optional): The color budget; by default a greedy coloring's size, computed
+                by the worker that takes the job so that submitting never blocks the event loop.
+            options (dict, optional): See JOB_OPTIONS.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            asyncio.QueueFull: When the queue is full.
+        """
+        options = dict(options or {})
+        job = Job(graph, min_colors, options, options.get("deadline", self.deadline))
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._forget_finished()
+        job.publish("queued", {"position": self.queue.qsize()})
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self.retain_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def list_models(self):
+        """The backend's models, listed at most once per MODELS_TTL seconds."""
+        if self._models is None or time.monotonic() - self._models[1] > MODELS_TTL:
+            self._models = (self.client.list_models(), time.monotonic())
+        return self._models[0]
+
+    def health(self):
+        return {"status": "ok", "queued": self.queue.qsize(), "queue_size": self.queue.maxsize,
+                "running": self.running, "workers": self.workers, "jobs": len(self.jobs)}
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.remaining() <= 0:
+                    job.finish("expired", error="deadline passed while queued")
+                    continue
+                self.running += 1
+                job.status = "running"
+                job.started = time.time()
+                job.publish("running", {"waited": job.started - job.submitted})
+                try:
+                    summary = await self._loop.run_in_executor(self.solver_pool, self._solve, job)
+                    job.finish("done", summary)
+                except DeadlineExceeded as e:
+                    job.finish("expired", error=str(e))
+                except Exception as e:
+                    print(f"Job {job.id} failed: {e!r}")
+                    job.finish("failed", error=repr(e))
+                finally:
+                    self.running -= 1
+            finally:
+                self.queue.task_done()
+
+    def _solve(self, job):
+        """Runs the SOFAI loop of a job on a solver thread."""
+        options = job.options
+        model = options.get("model", self.model)
+        tracer = Tracer(self.trace_writer, run_id=job.id)
+        if job.min_colors is None:
+            job.min_colors = greedy_min_colors(job.graph)
+
+        def on_event(event, data):
+            self._loop.call_soon_threadsafe(job.publish, event, data)
+
+        def check_deadline():
+            if job.remaining() <= 0:
+                raise DeadlineExceeded(f"deadline passed after {time.time() - job.submitted:.1f}s")
+
+        def llm(messages, should_stop=None, parser=None):
+            def stop():
+                return job.remaining() <= 0 or (should_stop is not None and should_stop())
+
+            check_deadline()
+            with self.limiter:
+                check_deadline()
+                response = model_res_generator(model, messages, should_stop=stop, parser=parser, client=self.client)
+            check_deadline()
+            return response
+
+        s2_time_limit = options.get("s2_time_limit", self.s2_time_limit)
+
+        def s2_runner(graph):
+            # The search gets what is left of the job's time, and returns its best coloring by then
+            check_deadline()
+            time_limit = min(s2_time_limit, job.remaining())
+            return make_s2_runner(self.s2_pool, time_limit, self.s2_memory_limit_mb)(graph)
+
+        try:
+            return solve_instance(
+                job.graph, job.min_colors, llm,
+                episodic_memory=self.episodic_memory,
+                solution_cache=self.solution_cache,
+                max_iterations=options.get("max_iterations", 5),
+                retrieval_mode=options.get("retrieval_mode", "bm25"),
+                race=options.get("race", False),
+                s2_runner=s2_runner,
+                s2_time_limit=min(s2_time_limit, max(job.remaining(), 0)),
+                s2_memory_limit_mb=self.s2_memory_limit_mb,
+                stop_on_conflict=options.get("stop_on_conflict", False),
+                token_budget=options.get("token_budget"),
+                repair_time_limit=options.get("repair_time_limit", REPAIR_TIME_LIMIT),
+                router=(self.router or Router()) if options.get("route") else None,
+                stopping_rules=options.get("stopping_rules"),
+                tracer=tracer,
+                on_event=on_event,
+            )
+        finally:
+            # A copy taken once the run is over: the tracer's own dicts are updated on this thread
+            # while HTTP handlers read the job
+            job.phases = {name: dict(phase) for name, phase in tracer.phases.items()}
+
+
+def check_options(options, types, kind, positive=(), non_negative=()):
+    """
+    Raises ValueError unless options is a dict of known names with values of their types (or None),
+    greater than zero for the names in positive and not negative for those in non_negative.
+    """
+    if not isinstance(options, dict):
+        raise ValueError(f"expected a JSON object of {kind}s")
+    for name, value in options.items():
+        if name not in types:
+            raise ValueError(f"unknown {kind} {name!r}; expected one of {sorted(types)}")
+        expected = types[name]
+        accepted = (int, float) if expected is float else expected
+        # JSON true/false must not pass for numbers
+        if value is not None and (not isinstance(value, accepted) or (expected is not bool and isinstance(value, bool))):
+            raise ValueError(f"{kind} {name!r} must be {expected.__name__}")
+        if value is not None and name in positive and value <= 0:
+            raise ValueError(f"{kind} {name!r} must be positive")
+        if value is not None and name in non_negative and value < 0:
+            raise ValueError(f"{kind} {name!r} must not be negative")
+
+
+def parse_job_request(body):
+    """
+    Reads a POST /jobs body.
+
+    Returns:
+        tuple: (graph, min_colors, options).
+
+    Raises:
+        ValueError: If the body is not a valid job.
+    """
+    try:
+        request = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}")
+    if not isinstance(request, dict) or not isinstance(request.get("graph"), str):
+        raise ValueError('expected {"graph": "<DIMACS text>", "min_colors": int, "options": {...}}')
+    graph = CompactGraph.from_dimacs(request["graph"])
+    if not graph.num_vertices:
+        raise ValueError("the graph has no vertices")
+    min_colors = request.get("min_colors")
+    if min_colors is not None and (not isinstance(min_colors, int) or isinstance(min_colors, bool) or min_colors < 1):
+        raise ValueError("min_colors must be a positive integer")
+    options = request.get("options") or {}
+    check_options(options, JOB_OPTIONS, "option", POSITIVE_OPTIONS, NON_NEGATIVE_OPTIONS)
+    # Checked here rather than when a worker builds the ImprovementTrendEvaluator
+    check_options(options.get("stopping_rules") or {}, STOPPING_RULES, "stopping rule", POSITIVE_STOPPING_RULES)
+    if options.get("retrieval_mode", "bm25") not in RETRIEVAL_MODES:
+        raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}")
+    return graph, min_colors, options
+
+
+class HTTPServer:
+    """A minimal HTTP/1.1 front end of a SolveService: one request per connection."""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unix=None):
+        if unix:
+            if os.path.exists(unix):
+                os.unlink(unix)
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+            print(f"SOFAI service listening on unix:{unix}")
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"SOFAI service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return
+            method, target = request_line[0], urlsplit(request_line[1])
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            await self.route(method, target.path.rstrip("/"), parse_qs(target.query), body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # A process forked while this connection was open would hold a copy of its socket, so
+            # closing it would not end the response; shutting down the write side always does
+            if writer.can_write_eof() and not writer.is_closing():
+                writer.write_eof()
+            writer.close()
+
+    async def route(self, method, path, query, body, writer):
+        service = self.service
+        parts = path.strip("/").split("/")
+        if path == "/health":
+            return await self.respond(writer, 200, service.health())
+        if path == "/models":
+            models = await asyncio.get_running_loop().run_in_executor(None, service.list_models)
+            return await self.respond(writer, 200, {"models": models, "default": service.model})
+        if path == "/jobs":
+            if method != "POST":
+                return await self.respond(writer, 405, {"error": "use POST to submit a job"})
+            try:
+                # Parsing a large instance would stall every other connection
+                request = await asyncio.get_running_loop().run_in_executor(None, parse_job_request, body)
+                job = service.submit(*request)
+            except ValueError as e:
+                return await self.respond(writer, 400, {"error": str(e)})
+            except asyncio.QueueFull:
+                return await self.respond(writer, 503, {"error": "the job queue is full"}, {"Retry-After": "1"})
+            return await self.respond(writer, 202, {"id": job.id, "status": job.status})
+        if parts[0] == "jobs" and len(parts) in (2, 3):
+            job = service.jobs.get(parts[1])
+            if job is None:
+                return await self.respond(writer, 404, {"error": f"no job {parts[1]}"})
+            if len(parts) == 2:
+                return await self.respond(writer, 200, job.to_dict())
+            if parts[2] == "events":
+                return await self.stream_events(writer, job, int(query.get("from", ["0"])[0]))
+        return await self.respond(writer, 404, {"error": f"no route {method} {path}"})
+
+    async def respond(self, writer, status, payload, headers=None):
+        body = dumps(payload).encode()
+        head = {"Content-Type": "application/json", "Content-Length": str(len(body)), **(headers or {})}
+        writer.write(self._head(status, head) + body)
+        await writer.drain()
+
+    async def stream_events(self, writer, job, start):
+        """Sends the job's events from index start as NDJSON lines until the job has finished."""
+        writer.write(self._head(200, {"Content-Type": "application/x-ndjson"}))
+        position = max(start, 0)
+        while True:
+            await job.wait_events(position)
+            lines = [dumps(event) + "\n" for event in job.events[position:]]
+            position += len(lines)
+            writer.write("".join(lines).encode())
+            await writer.drain()
+            if job.status in FINISHED and position >= len(job.events):
+                return
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", "Connection: close",
+                 *(f"{name}: {value}" for name, value in headers.items())]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def serve(args):
+    if args.backend == "fake":
+        client = make_client("fake", modes=args.fake_modes, conflicts=args.fake_conflicts,
+                             uncolored_fraction=args.fake_uncolored_fraction, tokens_per_second=args.fake_token_rate,
+                             first_token_latency=args.fake_first_token_latency)
+    else:
+        client = make_client("ollama")
+        client.pull(args.model)
+    store = SQLiteMemoryStore(args.memory_db, capacity=args.memory_capacity) if args.memory_db else None
+    router = None
+    if args.route:
+        router = Router.load(args.router_policy) if os.path.exists(args.router_policy) else Router()
+    service = SolveService(
+        client, model=args.model, workers=args.workers, llm_concurrency=args.llm_concurrency,
+        s2_processes=args.s2_processes, queue_size=args.queue_size, deadline=args.deadline,
+        episodic_memory=EpisodicMemory(store),
+        solution_cache=SolutionCache(args.cache_capacity) if args.cache_capacity else None,
+        router=router, trace_writer=TraceWriter(args.trace) if args.trace else None,
+        s2_time_limit=args.s2_time_limit, s2_memory_limit_mb=args.s2_memory_limit_mb,
+        retain_jobs=args.retain_jobs,
+    )
+    await service.start()
+    try:
+        await HTTPServer(service).serve(args.host, args.port, args.unix)
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the SOFAI loop over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model used by jobs that do not name one")
+    parser.add_argument("--backend", choices=BACKENDS, default="ollama",
+                        help="S1 client: a local ollama server (started if needed) or the fake LLM of solver/fake_llm.py")
+    parser.add_argument("--fake-modes", nargs="+", choices=FAKE_MODES, default=["correct"],
+                        help="fake LLM answer per iteration (the last one repeats)")
+    parser.add_argument("--fake-conflicts", type=int, default=1, help="vertices spoiled in the fake 'conflicts' mode")
+    parser.add_argument("--fake-uncolored-fraction", type=float, default=0.2,
+                        help="share of vertices left out in the fake 'partial' mode")
+    parser.add_argument("--fake-token-rate", type=float, default=50.0, help="fake LLM tokens per second (0: no delay)")
+    parser.add_argument("--fake-first-token-latency", type=float, default=0.2, help="fake LLM seconds before the first chunk")
+    parser.add_argument("--workers", type=int, default=8, help="jobs solved concurrently")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="maximum number of concurrent LLM generations")
+    parser.add_argument("--s2-processes", type=int, default=os.cpu_count(), help="S2 worker processes")
+    parser.add_argument("--queue-size", type=int, default=64, help="queued jobs before submissions get 503")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, help="default seconds allowed per job")
+    parser.add_argument("--retain-jobs", type=int, default=1000, help="finished jobs kept for status queries")
+    parser.add_argument("--s2-time-limit", type=float, default=S2_TIME_LIMIT)
+    parser.add_argument("--s2-memory-limit-mb", type=int, default=S2_MEMORY_LIMIT_MB)
+    parser.add_argument("--memory-db", default="episodic_memory.db", help="episodic memory database ('' for in-process only)")
+    parser.add_argument("--memory-capacity", type=int, default=10000)
+    parser.add_argument("--cache-capacity", type=int, default=4096, help="solution cache size (0 disables it)")
+    parser.add_argument("--route", action="store_true",
+                        help="load the router policy for jobs submitted with the 'route' option")
+    parser.add_argument("--router-policy", default="router_policy.json",
+                        help="policy table fitted with 'python -m solver.router fit'; rules only if missing")
+    parser.add_argument("--trace", default="traces.jsonl", help="JSONL trace of every job's phases ('' to disable)")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+import time
+
+from solver.repair import tabucol
+from solver.router import instance_features
+from solver.s1 import model_res_generator
+from solver.s2 import (
+    S2Job, dsatur_coloring, parse_dimacs_bitsets, run_degree_of_saturation_anytime, run_degree_of_saturation_budgeted,
+)
+from utils.example_generator import ExamplePool, greedy_color
+from utils.improvement_trend_evaluator import ImprovementTrendEvaluator
+from utils.prompt_generator import PromptBuilder, format_coloring, messages_tokens, prompt_generator
+from utils.tracing import Tracer
+from utils.util_functions import StreamingPlanParser, parse_graph, process_plan
+from validator.validate import GraphColoringValidator, ValidationSession
+
+S2_TIME_LIMIT = 60  # seconds
+S2_MEMORY_LIMIT_MB = 2048
+REPAIR_TIME_LIMIT = 0.05  # seconds
+
+
+def run_s2_with_timeout(graph_content, time_limit=S2_TIME_LIMIT, memory_limit_mb=S2_MEMORY_LIMIT_MB):
+    """Runs S2 in a worker process; on timeout the best coloring found so far is returned."""
+    coloring, num_colors, lower_bound, timeout_occurred = run_degree_of_saturation_anytime(
+        graph_content, time_limit=time_limit, memory_limit_mb=memory_limit_mb
+    )
+    result = (coloring, num_colors, lower_bound)
+    print(result)
+    return result, timeout_occurred
+
+
+def s2_won_race(s2_job, min_colors):
+    """
+    True once the background S2 job has reported a valid coloring within the color budget, or has
+    finished: once it has proved the optimum above the budget (or run out of time or memory), no
+    S1 answer can be better than its result.
+    """
+    s2_job.poll()
+    return s2_job.done or (s2_job.num_colors is not None and s2_job.num_colors <= min_colors)
+
+
+def format_feedback(conflict_edges, uncolored_vertices, num_colors=None, min_colors=None):
+    """Turns the validator output (and a color count over the min_colors budget) into the feedback sentence sent back to the LLM."""
+    feedback_list = [f"adjacent vertices {edge[0]} and {edge[1]} have the same color" for edge in conflict_edges]
+    if uncolored_vertices:
+        feedback_list.append(f"vertices {', '.join(uncolored_vertices)} are not colored")
+    if num_colors is not None and num_colors > min_colors:
+        feedback_list.append(f"the coloring uses {num_colors} colors but at most {min_colors} are allowed")
+    return " : ".join(feedback_list)
+
+
+def greedy_min_colors(graph):
+    """The color budget given to S1: the size of a largest-first greedy coloring, as the problem generator reports."""
+    coloring = greedy_color(graph, list(range(graph.num_vertices)))
+    return max(coloring.values(), default=-1) + 1
+
+
+def make_llm(model, limiter, client=None):
+    """Returns an llm(messages, should_stop, parser) callable that holds a limiter slot for each generation."""
+    def llm(messages, should_stop=None, parser=None):
+        with limiter:
+            return model_res_generator(model, messages, should_stop=should_stop, parser=parser, client=client)
+    return llm
+
+
+def make_s2_runner(pool, time_limit, memory_limit_mb):
+    """Returns an s2_runner(graph) for solve_instance that runs the search in the process pool."""
+    def s2_runner(graph):
+        labels, adjacency = parse_dimacs_bitsets(graph)
+        coloring, num_colors, lower_bound, timed_out = pool.submit(
+            run_degree_of_saturation_budgeted, labels, adjacency, time_limit, memory_limit_mb
+        ).result()
+        return (coloring, num_colors, lower_bound), timed_out
+    return s2_runner
+
+
+def solve_instance(graph, min_colors, llm, episodic_memory=None, solution_cache=None, max_iterations=5,
+                   retrieval_mode="bm25", race=False, s2_runner=None, s2_time_limit=S2_TIME_LIMIT,
+                   s2_memory_limit_mb=S2_MEMORY_LIMIT_MB, stop_on_conflict=False, token_budget=None, repair_time_limit=REPAIR_TIME_LIMIT,
+                   router=None, log_features=False, stopping_rules=None, tracer=None, on_event=None):
+    """
+    Runs the SOFAI loop on one instance: solution cache, S1 feedback iterations, then S2.
+
+    Every invalid S1 coloring is first handed to a TabuCol repair (see solver/repair.py) within
+    the color budget; only if that fails is another LLM call or S2 spent. With a router, the
+    instance may instead be dispatched straight to the repair tier (seeded with the DSATUR
+    coloring, then S2 if that fails) or to S2.
+
+    The loop has no UI code; callers follow its progress through on_event, which receives an
+    event name and a dict of data ("route", "prompt", "response", "validation", "repair", "feedback",
+    "s2_start", "s2_result", "cache_hit" and "race"). The callback runs on the critical path of the loop, so
+    slow work such as drawing should be handed off (see utils/visualization.BackgroundRenderer).
+
+    Every phase (cache lookup, features, memory retrieval and additions, prompt, LLM call, parse,
+    validation, repair, example, S2 and the on_event callback as "render") is a span of tracer,
+    which writes the run's JSONL trace when the run ends (see utils/tracing.py).
+
+    Args:
+        graph (CompactGraph): The instance.
+        min_colors (int): The color budget given to S1.
+        llm (callable): llm(messages, should_stop, parser) returns the model's response to the chat messages.
+                        It should stop generating once should_stop() (which may be None) returns True, and
+                        may feed the streamed chunks to parser (a StreamingPlanParser) to stop early.
+        episodic_memory (EpisodicMemory, optional): Memory to retrieve examples from and add solutions to.
+        solution_cache (SolutionCache, optional): Cache consulted before any model call.
+        max_iterations (int): Maximum number of S1 iterations.
+        retrieval_mode (str): Episodic memory retrieval mode, "bm25" or "structural".
+        race (bool): Start S2 in a background process right away and stop at the first valid answer within
+                     min_colors (a conflict-free coloring with more colors does not count), or
+                     as soon as S2 finishes: if it proves that min_colors is too few, S2 wins with its
+                     optimum (lower_bound) and time_to_first_valid is the time S2 finished.
+        s2_runner (callable, optional): s2_runner(graph) returns ((coloring, num_colors, lower_bound),
+                                        timeout_occurred); defaults to run_s2_with_timeout. Unused in race mode.
+        s2_time_limit (float): S2 wall-clock budget in seconds.
+        s2_memory_limit_mb (int): S2 memory budget in megabytes.
+        stop_on_conflict (bool): Stop a generation at the first conflicting pair instead of waiting
+                                 for the whole coloring (the conflict is then reported as feedback).
+        token_budget (int, optional): Build every S1 request with a PromptBuilder within this many
+                                      estimated tokens, instead of growing the conversation at each
+                                      iteration. An instance that does not fit goes straight to S2.
+        repair_time_limit (float): Local search budget in seconds per invalid S1 coloring; 0 disables repair.
+        router (Router, optional): Picks the first tier from the instance features (see solver/router.py).
+                                   Without one, S1 always goes first.
+        log_features (bool): Add the instance features to the summary even without a router, so the
+                             router's policy table can be fitted from the logs (see Router.fit).
+        stopping_rules (dict, optional): Keyword arguments of ImprovementTrendEvaluator (plateau_window,
+                                         stop_on_regression, stop_on_repeat, projection and its
+                                         max_iterations horizon, max_iterations by default)
+                                         deciding when S1 is abandoned.
+        tracer (Tracer, optional): Records the phases of the run; an in-memory Tracer by default.
+        on_event (callable, optional): on_event(event, data) progress callback.
+
+    Returns:
+        dict: Per-instance summary (what solved it, iterations, timings, race winner, route, features, ...).
+    """
+    tracer = tracer if tracer is not None else Tracer()
+
+    def emit(event, data):
+        if on_event is not None:
+            with tracer.span("render", event=event):
+                on_event(event, data)
+
+    def add_memory(solution):
+        if episodic_memory is not None:
+            with tracer.span("memory_add"):
+                episodic_memory.add_memory(graph_content, solution, graph=graph)
+
+    summary = None
+    s2_job = None
+    error = None
+    try:
+        graph_content, num_edges, num_vertices, edges, vertices = parse_graph(graph)
+        validator = GraphColoringValidator(graph)
+        validation_session = ValidationSession(validator)
+        trend_evaluator = ImprovementTrendEvaluator(**{"max_iterations": max_iterations, **(stopping_rules or {})})
+        summary = {
+            "num_vertices": num_vertices, "num_edges": num_edges, "min_colors": min_colors,
+            "cache_hit": False, "s1_solved": False, "s2_solved": False, "s2_optimal": False, "timeout_occurred": False,
+            "repair_attempts": 0, "repair_successes": 0, "repair_time": 0.0,
+            "iterations": 0, "s1_time": 0.0, "s1_chunks": 0, "prompt_tokens": 0, "max_prompt_tokens": 0,
+            "s2_time": 0.0, "sofai_time": 0.0,
+            "winner": None, "time_to_first_valid": None, "num_colors": None, "route": "S1",
+            "stop_reason": None, "trajectory": trend_evaluator.trajectory,
+        }
+        start_time = time.time()
+        start_monotonic = time.monotonic()  # S2Job timestamps are monotonic
+
+        # An instance isomorphic to one solved before is answered without any model call
+        if solution_cache is not None:
+            with tracer.span("cache_lookup") as span:
+                cached = solution_cache.lookup(graph)
+                span["hit"] = cached is not None
+            print(f"Solution cache: {solution_cache.stats()}")
+            if cached is not None:
+                cached_coloring, chromatic_number = cached
+                summary.update(cache_hit=True, winner="cache", num_colors=chromatic_number,
+                               sofai_time=time.time() - start_time)
+                summary["time_to_first_valid"] = summary["sofai_time"]
+                emit("cache_hit", {"coloring": cached_coloring, "num_colors": chromatic_number})
+                return summary
+
+        def repair(coloring, iteration):
+            """Runs TabuCol from coloring; on success the instance is solved by the repair tier."""
+            repair_start_time = time.time()
+            with tracer.span("repair", iteration=iteration) as span:
+                repaired, remaining, repair_iterations = tabucol(graph, coloring, min_colors, time_limit=repair_time_limit)
+                span.update(conflicts=remaining, moves=repair_iterations)
+            repair_time = time.time() - repair_start_time
+            summary["repair_attempts"] += 1
+            summary["repair_time"] += repair_time
+            emit("repair", {"coloring": repaired, "success": remaining == 0, "conflicts": remaining,
+                            "iterations": repair_iterations, "repair_time": repair_time, "iteration": iteration})
+            print(f"Repair: {remaining} conflicts left after {repair_iterations} moves in {repair_time * 1000:.1f} ms.")
+            if remaining:
+                return False
+            summary["repair_successes"] += 1
+            summary.update(winner="repair", num_colors=len(set(repaired.values())))
+            summary["time_to_first_valid"] = time.time() - start_time
+            add_memory(format_coloring(repaired))
+            return True
+
+        # The features cost a clique search and a DSATUR coloring, so they are only computed when used
+        if router is not None or log_features:
+            with tracer.span("features"):
+                features = instance_features(graph)
+            summary.update(features)
+        if router is not None:
+            route, reason = router.route(num_vertices, min_colors, features)
+            summary["route"] = route
+            tracer.count(f"route_{route}")
+            print(f"Routed to {route}: {reason}")
+            emit("route", {"tier": route, "reason": reason, "features": features})
+            if route == "repair":
+                labels = graph.labels
+                colors = dsatur_coloring(graph.adjacency_bitsets())
+                if repair({labels[i]: c for i, c in enumerate(colors)}, 0):
+                    print("Problem solved by the repair tier.")
+                    summary["sofai_time"] = time.time() - start_time
+                    return summary
+        skip_s1 = summary["route"] != "S1"
+
+        # In race mode S2 searches in a background process while the S1 feedback loop runs
+        s2_job = S2Job(graph, s2_time_limit, s2_memory_limit_mb).start() if race else None
+        should_stop = (lambda: s2_won_race(s2_job, min_colors)) if race else None
+        if s2_runner is None:
+            s2_runner = lambda g: run_s2_with_timeout(g, s2_time_limit, s2_memory_limit_mb)
+
+        prompt_builder = None
+        if not skip_s1:
+            with tracer.span("example_pool"):
+                example_pool = ExamplePool(graph)
+            top_examples = None
+            if episodic_memory is not None and len(episodic_memory):
+                print("Episodic memory loaded.")
+                with tracer.span("memory_retrieve", mode=retrieval_mode):
+                    top_examples = episodic_memory.retrieve_similar(
+                        graph if retrieval_mode == "structural" else graph_content, mode=retrieval_mode
+                    )
+            else:
+                print("No episodic memory found.")
+
+            with tracer.span("prompt"):
+                if token_budget is not None:
+                    prompt_builder = PromptBuilder(graph, min_colors, token_budget, additional_examples=top_examples)
+                    messages = prompt_builder.initial_messages()
+                    initial_prompt = prompt_builder.initial_prompt
+                else:
+                    initial_prompt = prompt_generator(graph_content, min_colors, additional_examples=top_examples)
+                    messages = [{"role": "user", "content": initial_prompt}]
+            emit("prompt", {"content": initial_prompt})
+
+        def s2_started():
+            """Wall-clock time S2 started: now, or when the background job was launched in race mode."""
+            if s2_job is not None:
+                return time.time() - (time.monotonic() - s2_job.started_at)
+            return time.time()
+
+        def run_s2():
+            with tracer.span("s2", race=s2_job is not None) as span:
+                if s2_job is not None:
+                    # S2 has been running since the instance was loaded; wait for the rest of its budget
+                    coloring, num_colors, lower_bound, timed_out = s2_job.wait()
+                    result = (coloring, num_colors, lower_bound)
+                else:
+                    result, timed_out = s2_runner(graph)
+                span.update(num_colors=result[1], timed_out=timed_out)
+            return result, timed_out
+
+        iteration = 0
+        timeout_occurred = False
+        dos_result = None
+        s2_start_time = None
+        if skip_s1 or (prompt_builder is not None and prompt_builder.over_budget):
+            if skip_s1:
+                summary["stop_reason"] = f"routed to {summary['route']}"
+            else:
+                summary["stop_reason"] = f"prompt over the {token_budget} token budget"
+            print(f"Skipping S1: {summary['stop_reason']}.")
+            emit("s2_start", {"iteration": iteration, "reason": summary["stop_reason"], "trajectory": []})
+            s2_start_time = s2_started()
+            dos_result, timeout_occurred = run_s2()
+
+        while dos_result is None and iteration < max_iterations:
+            if s2_job is not None and s2_won_race(s2_job, min_colors):
+                break
+            print(f"Starting iteration {iteration}...")
+            iteration += 1
+            s1_start_time = time.time()
+            # Generate a response from the model, stopping as soon as the coloring is complete
+            parser = StreamingPlanParser(graph, stop_on_conflict=stop_on_conflict)
+            prompt_tokens = messages_tokens(messages)
+            summary["prompt_tokens"] += prompt_tokens
+            summary["max_prompt_tokens"] = max(summary["max_prompt_tokens"], prompt_tokens)
+            print(f"Prompt: about {prompt_tokens} tokens.")
+            with tracer.span("llm", iteration=iteration, prompt_tokens=prompt_tokens, messages=len(messages)) as span:
+                response = llm(messages, should_stop, parser)
+                span.update(chunks=parser.chunks, response_chars=len(response))
+            tracer.count("llm_calls")
+            tracer.count("prompt_tokens", prompt_tokens)
+            s1_time = time.time() - s1_start_time
+            summary["s1_time"] += s1_time
+            summary["s1_chunks"] += parser.chunks
+            messages.append({"role": "assistant", "content": response})
+            emit("response", {"content": response, "iteration": iteration, "s1_time": s1_time})
+            print(f"Iteration {iteration} complete. LLM responded in {s1_time:.2f} seconds.")
+            if s2_job is not None and s2_won_race(s2_job, min_colors):
+                print("S2 found a valid coloring or finished while the LLM was generating.")
+                break
+
+            # The parser already holds the coloring unless the llm returned the response in one piece
+            with tracer.span("parse", streamed=bool(parser.chunks)):
+                color_assignments = parser.coloring if parser.chunks else process_plan(response)
+            print(color_assignments)
+            # Only the edges around vertices whose color changed since the last iteration are re-checked
+            with tracer.span("validate", iteration=iteration) as span:
+                conflict_delta = validation_session.update(color_assignments)
+                # A conflict-free coloring with more than min_colors colors does not solve the instance
+                num_colors = len(set(color_assignments.values()))
+                coloring_correct = validation_session.is_valid() and num_colors <= min_colors
+                conflict_edges = validation_session.conflict_edges()
+                span.update(conflicts=len(conflict_edges), uncolored=conflict_delta['uncolored'], num_colors=num_colors)
+            tracer.count("conflicts", len(conflict_edges))
+            print(conflict_edges)
+            print(f"Conflicts fixed: {len(conflict_delta['fixed'])}, new: {len(conflict_delta['new'])}, "
+                  f"unchanged: {len(conflict_delta['unchanged'])}, uncolored vertices: {conflict_delta['uncolored']}")
+            feedback = format_feedback(
+                conflict_edges, validation_session.uncolored_vertices() if conflict_delta['uncolored'] else [],
+                num_colors, min_colors
+            )
+            emit("validation", {"coloring": color_assignments, "correct": coloring_correct, "feedback": feedback,
+                                "delta": conflict_delta, "conflicts": sorted(validation_session.conflicts),
+                                "iteration": iteration})
+            if coloring_correct:
+                summary.update(s1_solved=True, winner="S1", num_colors=num_colors)
+                summary["time_to_first_valid"] = time.time() - start_time
+                if s2_job is not None:
+                    s2_job.cancel()
+                    print("S1 won the race; background S2 cancelled.")
+                add_memory(response)
+                print("Problem solved by S1.")
+                break
+
+            # The LLM's coloring is usually a few conflicts away from a valid one
+            if repair_time_limit > 0 and repair(color_assignments, iteration):
+                if s2_job is not None:
+                    s2_job.cancel()
+                    print("Repair won the race; background S2 cancelled.")
+                print("Problem solved by repairing the S1 coloring.")
+                break
+
+            trend_evaluator.update(len(conflict_edges), conflict_delta['uncolored'],
+                                   num_colors, coloring=color_assignments,
+                                   repeated_conflicts=len(conflict_delta['unchanged']))
+            trend_evaluator.print_status()
+            if iteration == max_iterations or trend_evaluator.get_no_improvement_flag():
+                summary["stop_reason"] = trend_evaluator.stop_reason or "maximum iterations"
+                emit("s2_start", {"iteration": iteration, "reason": summary["stop_reason"],
+                                  "trajectory": trend_evaluator.trajectory})
+                s2_start_time = s2_started()
+                dos_result, timeout_occurred = run_s2()
+                break
+
+            # The precomputed example that contains most of the edges the model just got wrong
+            with tracer.span("example"):
+                example = example_pool.example_for(validation_session.conflicts)
+            if prompt_builder is not None:
+                # The conversation is rebuilt around the latest coloring instead of growing
+                messages = prompt_builder.retry_messages(
+                    color_assignments, conflict_edges, validation_session.uncolored_vertices(), example=example,
+                    num_colors=num_colors
+                )
+                full_feedback = messages[-1]["content"]
+            else:
+                full_feedback = f"Feedback: {feedback}. Example: {example}"
+                messages.append({"role": "user", "content": full_feedback})
+            emit("feedback", {"content": full_feedback, "iteration": iteration})
+
+        if summary["winner"] is None and s2_job is not None and dos_result is None and s2_won_race(s2_job, min_colors):
+            # S2 produced a valid coloring (or finished) before S1 did; S1 was abandoned, and S2 stops here too
+            s2_start_time = s2_started()
+            s2_job.cancel()
+            coloring, num_colors, lower_bound, timeout_occurred = s2_job.result()
+            dos_result = (coloring, num_colors, lower_bound)
+
+        if s2_job is not None and s2_job.error is not None:
+            # The background search stopped early (e.g. out of memory); its best coloring is still used
+            summary["s2_error"] = s2_job.error
+
+        if dos_result is not None:
+            dos_coloring, chromatic_number, lower_bound = dos_result
+            s2_time = time.time() - s2_start_time
+            # A coloring within the budget solves the instance even when the search was stopped (e.g. after
+            # winning the race) before proving it optimal; only proven optima go to the solution cache
+            s2_optimal = not timeout_occurred
+            s2_solved = s2_optimal or (chromatic_number is not None and chromatic_number <= min_colors)
+            summary.update(s2_solved=s2_solved, s2_optimal=s2_optimal, timeout_occurred=timeout_occurred,
+                           s2_time=s2_time, winner="S2", num_colors=chromatic_number, lower_bound=lower_bound)
+            if race:
+                elapsed = s2_job.time_to_colors(min_colors)
+                if elapsed is not None:
+                    summary["time_to_first_valid"] = s2_job.started_at + elapsed - start_monotonic
+                else:
+                    # No coloring within the budget exists (or none was found): S2's final answer is the first
+                    finished_at = s2_job.finished_at if s2_job.finished_at is not None else time.monotonic()
+                    summary["time_to_first_valid"] = finished_at - start_monotonic
+            else:
+                summary["time_to_first_valid"] = time.time() - start_time
+            if s2_solved:
+                add_memory(dos_coloring)
+                if s2_optimal and solution_cache is not None:
+                    with tracer.span("cache_store"):
+                        solution_cache.store(graph, process_plan(dos_coloring), chromatic_number)
+                print(f"S2 solved the problem in {s2_time:.2f} seconds.")
+            else:
+                print(f"S2 stopped after {s2_time:.2f} seconds with {chromatic_number} colors "
+                      f"(lower bound {lower_bound}).")
+            emit("s2_result", {"coloring": dos_coloring, "num_colors": chromatic_number, "lower_bound": lower_bound,
+                               "timeout_occurred": timeout_occurred, "s2_time": s2_time})
+
+        summary["iterations"] = iteration
+        summary["sofai_time"] = time.time() - start_time
+        if race:
+            emit("race", {"winner": summary["winner"], "time_to_first_valid": summary["time_to_first_valid"]})
+            print(f"Race winner: {summary['winner']}, time to first valid answer: {summary['time_to_first_valid']}")
+        return summary
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # Also on errors (e.g. a failed LLM call), so the worker process never outlives the run
+        if s2_job is not None:
+            s2_job.cancel()
+        # Failed runs are traced too, so every run writes exactly one closing record
+        tracer.finish(summary, error=error)
@@ -0,0 +1,33 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["matplotlib", "networkx", "rank_bm25"]
+
+
+def app_imports():
+    """The modules run_app.py imports at module level (streamlit aside), read from its source."""
+    with open(os.path.join(ROOT, "run_app.py")) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+    return [module for module in modules if module != "streamlit"]
+
+
+def test_app_imports_do_not_load_heavy_modules():
+    modules = app_imports()
+    assert "solver.client" in modules
+    assert not any(module.startswith("problem_generator") for module in modules)
+
+    code = (f"import json, sys\nfor name in {modules!r}: __import__(name)\n"
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": ROOT}).stdout
+    assert json.loads(output.splitlines()[-1]) == []
@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils.bm25_index import BM25Index
+
+
+def random_corpus(rng, size):
+    vocabulary = [f"t{i}" for i in range(40)]
+    # A few tokens in nearly every document so their idf is floored, like "p", "edge" and "e" in DIMACS
+    return [["p", "edge"] + rng.choices(vocabulary, k=rng.randint(1, 30)) for _ in range(size)]
+
+
+def build(corpus, **kwargs):
+    index = BM25Index(**kwargs)
+    for tokens in corpus:
+        index.add(tokens)
+    return index
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_index_matches_fresh_rebuild(seed):
+    rng = random.Random(seed)
+    corpus = random_corpus(rng, 60)
+    index = BM25Index()
+    live = {}
+    for tokens in corpus:
+        live[index.add(tokens)] = tokens
+        if len(live) > 5 and rng.random() < 0.3:
+            doc_id = rng.choice(sorted(live))
+            index.remove(doc_id, live.pop(doc_id))
+
+    ids = sorted(live)
+    fresh = build([live[i] for i in ids])
+    assert index.df_counts == fresh.df_counts
+    assert index.average_idf() == pytest.approx(fresh.average_idf())
+    for query in random_corpus(rng, 10):
+        assert index.get_scores(query)[ids] == pytest.approx(fresh.get_scores(query))
+        top = index.top_k(query, 5)
+        assert [ids.index(i) for i in top] == fresh.top_k(query, 5)
+
+
+def test_scores_match_rank_bm25():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    rng = random.Random(7)
+    corpus = random_corpus(rng, 50)
+    index = build(corpus)
+    reference = rank_bm25.BM25Okapi(corpus)
+    for query in random_corpus(rng, 10) + [["unknown"]]:
+        assert index.get_scores(query) == pytest.approx(reference.get_scores(query))
+        for term in set(query):
+            assert index.idf(term) == pytest.approx(reference.idf.get(term, 0.0))
+
+
+def test_skip_clamped_ignores_only_floored_terms():
+    rng = random.Random(3)
+    corpus = random_corpus(rng, 50)
+    exact = build(corpus)
+    skipping = build(corpus, skip_clamped=True)
+    for query in random_corpus(rng, 10):
+        kept = [t for t in query if t not in exact.postings or exact.raw_idf(exact.postings[t].size) >= 0]
+        assert "p" not in kept and "edge" not in kept
+        assert skipping.get_scores(query) == pytest.approx(exact.get_scores(kept))
+    assert not np.any(skipping.get_scores(["p", "edge"]))
@@ -0,0 +1,31 @@
+import csv
+import os
+
+import networkx as nx
+import pytest
+
+from problem_generator.generate import GraphColoringGenerator
+from utils.util_functions import load_graph
+
+
+def test_unsolvable_instances_contain_a_planted_clique(tmp_path):
+    num_colors = 4
+    generator = GraphColoringGenerator(str(tmp_path))
+    manifest = generator.generate_dataset(10, [5, 8, 20], 0.2, seed=3, num_colors=num_colors,
+                                          solvable_fraction=0.5, processes=1)
+    with open(manifest) as f:
+        rows = list(csv.DictReader(f))
+    unsolvable = [row for row in rows if row["solvable"] == "False"]
+    assert unsolvable
+    for row in unsolvable:
+        graph = load_graph(os.path.join(tmp_path, row["file"]))
+        G = nx.Graph(graph.edges.tolist())
+        assert max(len(clique) for clique in nx.find_cliques(G)) >= num_colors + 1, row["file"]
+
+
+def test_unsolvable_instances_need_more_vertices_than_colors(tmp_path):
+    generator = GraphColoringGenerator(str(tmp_path))
+    with pytest.raises(ValueError):
+        generator.generate_dataset(2, [3, 10], 0.4, num_colors=4, solvable_fraction=0.5, processes=1)
+    # Solvable-only datasets may still use sizes up to the budget
+    generator.generate_dataset(2, [3], 0.4, num_colors=4, solvable_fraction=1.0, processes=1)
@@ -0,0 +1,33 @@
+from utils.graph import CompactGraph
+from utils.util_functions import parse_graph
+
+# Declares 4 edges; one is repeated in the other direction and one is a self-loop
+DIMACS = "c test\np edge 3 4\ne a b\ne b a\ne b c\ne c c\n"
+
+
+def test_duplicate_edges_and_self_loops_are_dropped():
+    graph = CompactGraph.from_dimacs(DIMACS)
+
+    assert graph.labels == ("a", "b", "c")
+    assert list(graph.edge_labels()) == [("a", "b"), ("b", "c")]
+    assert graph.declared_edges == 4
+
+
+def test_to_dimacs_counts_the_edges_it_writes():
+    graph = CompactGraph.from_dimacs(DIMACS)
+
+    assert graph.to_dimacs() == "p edge 3 2\ne a b\ne b c"
+    assert CompactGraph.from_dimacs(graph.to_dimacs()).declared_edges == graph.num_edges
+
+
+def test_parse_graph_returns_int_counts(tmp_path):
+    path = tmp_path / "graph.col"
+    path.write_text(DIMACS)
+
+    graph_content, num_edges, num_vertices, edges, vertices = parse_graph(str(path))
+
+    assert graph_content.startswith("p edge 3 2\n")
+    assert (num_edges, num_vertices) == (4, 3)
+    assert isinstance(num_edges, int) and isinstance(num_vertices, int)
+    assert edges == ["a b", "b c"]
+    assert vertices == ["a", "b", "c"]
@@ -0,0 +1,29 @@
+from utils.improvement_trend_evaluator import STOPPING_RULES, ImprovementTrendEvaluator
+
+
+def test_projection_stops_slow_improvement():
+    evaluator = ImprovementTrendEvaluator(max_iterations=3)
+    assert not evaluator.update(10, 0, 3)
+    assert evaluator.update(9, 0, 3)
+    assert evaluator.stop_reason.startswith("projection")
+
+
+def test_projection_can_be_disabled():
+    evaluator = ImprovementTrendEvaluator(projection=False, max_iterations=3)
+    assert not evaluator.update(10, 0, 3)
+    assert not evaluator.update(9, 0, 3)
+
+
+def test_every_rule_can_be_disabled():
+    evaluator = ImprovementTrendEvaluator(plateau_window=None, stop_on_regression=False, stop_on_repeat=False,
+                                          projection=False, max_iterations=5)
+    coloring = {"a": 1, "b": 1}
+    for conflicts in (1, 2, 2, 2):
+        assert not evaluator.update(conflicts, 0, 1, coloring=coloring)
+
+
+def test_stopping_rules_list_every_parameter():
+    import inspect
+
+    parameters = inspect.signature(ImprovementTrendEvaluator).parameters
+    assert set(STOPPING_RULES) == set(parameters)
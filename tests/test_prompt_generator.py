@@ -0,0 +1,51 @@
+import numpy as np
+
+from problem_generator.generate import _labels, sparse_gnp_edges
+from utils.graph import CompactGraph
+from utils.prompt_generator import PromptBuilder, count_tokens, messages_tokens
+
+
+def large_graph():
+    return CompactGraph(_labels(300), sparse_gnp_edges(300, 0.3, np.random.default_rng(0)))
+
+
+def tight_builder(graph, min_colors):
+    """A builder whose budget leaves exactly the reserve for the retries."""
+    initial = PromptBuilder(graph, min_colors, 10 ** 9).initial_prompt
+    builder = PromptBuilder(graph, min_colors, count_tokens(initial) + 4 * graph.num_vertices + 64)
+    assert not builder.over_budget
+    return builder
+
+
+def test_retry_messages_stay_within_the_budget():
+    graph = large_graph()
+    builder = tight_builder(graph, 5)
+    labels = graph.labels
+    # Half the vertices uncolored, the others all in one color, plus labels the model made up
+    coloring = {label: 1 for label in labels[::2]}
+    coloring.update({f"zz{i}": 2 for i in range(500)})
+    colored = set(labels[::2])
+    conflicts = [(u, v) for u, v in graph.edge_labels() if u in colored and v in colored]
+    uncolored = list(labels[1::2])
+
+    for example in (None, "Solved example: (a 1) (b 2)"):
+        messages = builder.retry_messages(coloring, conflicts, uncolored, example=example, num_colors=7)
+        assert messages_tokens(messages) <= builder.token_budget
+        feedback = messages[-1]["content"]
+        assert "zz0" not in messages[1]["content"]
+        assert "It uses 7 colors, at most 5 are allowed." in feedback
+        assert feedback.endswith("more. Give the complete corrected coloring.")
+
+    # A complete coloring leaves only the reserve, so the uncolored list is cut short as well
+    messages = builder.retry_messages({label: 1 for label in labels}, conflicts, list(labels))
+    assert messages_tokens(messages) <= builder.token_budget
+    assert messages[-1]["content"].count("more.") == 2
+    assert max(builder.token_counts) <= builder.token_budget
+
+
+def test_retry_messages_list_everything_when_it_fits():
+    graph = CompactGraph.from_dimacs("p edge 3 2\ne a b\ne b c")
+    builder = PromptBuilder(graph, 2, 1000)
+    messages = builder.retry_messages({"a": 1, "b": 1}, [("a", "b")], ["c"])
+    assert messages[-1]["content"] == ("Your coloring is wrong. Uncolored vertices: c. "
+                                       "Adjacent vertices with the same color: a-b. Give the complete corrected coloring.")
@@ -0,0 +1,59 @@
+import pytest
+
+from solver.router import Router, degeneracy, instance_features
+from utils.graph import CompactGraph
+
+FEATURES = {"density": 0.3, "clique_bound": 3, "dsatur_bound": 4}
+
+
+def clique(n):
+    return CompactGraph([str(i) for i in range(n)], [(u, v) for u in range(n) for v in range(u + 1, n)])
+
+
+def row(winner, s1_time, s2_time=0.0):
+    """A run_batch.py summary row of an unrouted 20-vertex instance in the same cell as FEATURES."""
+    return {
+        "num_vertices": "20", "density": "0.3", "min_colors": "3", "clique_bound": "3", "dsatur_bound": "4",
+        "cache_hit": "False", "route": "S1", "winner": winner, "s1_time": str(s1_time), "repair_time": "0",
+        "s2_solved": str(winner == "S2"), "timeout_occurred": "False", "s2_time": str(s2_time),
+    }
+
+
+def test_features_of_known_graphs():
+    cycle = CompactGraph([str(i) for i in range(6)], [(i, (i + 1) % 6) for i in range(6)])
+    assert degeneracy(cycle) == 2
+    assert degeneracy(clique(5)) == 4
+    features = instance_features(clique(4))
+    assert features == {"density": 1.0, "max_degree": 3, "degeneracy": 3, "clique_bound": 4, "dsatur_bound": 4}
+
+
+@pytest.mark.parametrize("min_colors, features, tier", [
+    (2, {"density": 1.0, "clique_bound": 3, "dsatur_bound": 3}, "S2"),
+    (3, {"density": 0.5, "clique_bound": 2, "dsatur_bound": 3}, "repair"),
+    (3, FEATURES, "S1"),
+])
+def test_route_without_data_uses_the_bounds(min_colors, features, tier):
+    assert Router().route(20, min_colors, features)[0] == tier
+
+
+def test_fitted_router_picks_the_cheapest_tier(tmp_path):
+    # S1 succeeds half of the time in 1.5 s on average; S2 always takes 5 s
+    rows = [row("S1", 1.0) for _ in range(3)] + [row("S2", 2.0, 5.0) for _ in range(3)]
+    router = Router.fit(rows)
+    tier, reason = router.route(20, 3, FEATURES)
+    assert tier == "S1"
+    assert "S1 4.00s" in reason and "S2 5.00s" in reason
+
+    # Once S1 keeps failing, going straight to S2 is cheaper
+    router = Router.fit(rows[3:] + [row("S2", 2.0, 5.0) for _ in range(3)])
+    assert router.route(20, 3, FEATURES)[0] == "S2"
+
+    path = tmp_path / "policy.json"
+    router.save(path)
+    assert Router.load(path).cells == router.cells
+
+
+def test_fit_skips_cache_hits_and_rows_without_features():
+    rows = [{**row("S1", 1.0), "cache_hit": "True"} for _ in range(3)]
+    rows += [{**row("S1", 1.0), "clique_bound": ""} for _ in range(3)]
+    assert Router.fit(rows).cells == {}
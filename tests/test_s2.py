@@ -0,0 +1,58 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from problem_generator.generate import _labels, sparse_gnp_edges
+from solver.s2 import S2Job, branch_and_bound, parse_dimacs_bitsets, run_degree_of_saturation_anytime
+from utils.graph import CompactGraph
+
+
+def brute_force_chromatic_number(n, edges):
+    for k in range(1, n + 1):
+        for colors in itertools.product(range(k), repeat=n):
+            if all(colors[u] != colors[v] for u, v in edges):
+                return k
+    return 0
+
+
+def random_graph(n, p, seed):
+    return CompactGraph(_labels(n), sparse_gnp_edges(n, p, np.random.default_rng(seed)))
+
+
+def is_valid(adjacency, colors):
+    return all(colors[u] != colors[v] for u, adj in enumerate(adjacency) for v in range(len(adjacency))
+               if adj >> v & 1)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_branch_and_bound_is_optimal_on_small_graphs(seed):
+    n = 4 + seed % 5
+    graph = random_graph(n, 0.3 + 0.05 * (seed % 7), seed)
+    _, adjacency = parse_dimacs_bitsets(graph)
+    colors, num_colors, lower_bound, optimal = branch_and_bound(adjacency)
+    assert optimal
+    assert is_valid(adjacency, colors)
+    assert max(colors) == num_colors
+    assert lower_bound <= num_colors == brute_force_chromatic_number(n, graph.edges.tolist())
+
+
+def test_anytime_search_returns_a_valid_coloring_within_its_budget():
+    graph = random_graph(90, 0.5, 0)
+    start = time.monotonic()
+    coloring, num_colors, lower_bound, timed_out = run_degree_of_saturation_anytime(graph, time_limit=0.5)
+    assert time.monotonic() - start < 2.0
+    assert timed_out
+    assert lower_bound <= num_colors
+    colors = {label: int(c) for label, c in (line.strip("()").split() for line in coloring.splitlines())}
+    assert len(colors) == graph.num_vertices
+    assert all(colors[u] != colors[v] for u, v in graph.edge_labels())
+
+
+def test_worker_errors_are_recorded_not_printed(capsys):
+    job = S2Job(random_graph(6, 0.5, 0))
+    job.started_at = time.monotonic()
+    job._handle(("error", "memory limit exceeded"))
+    assert job.done and job.error == "memory limit exceeded"
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import pytest
+
+from solver.client import ServiceClient, ServiceError
+from solver.s1 import make_client
+from solver.service import FINISHED, HTTPServer, SolveService, dumps, parse_job_request
+from utils.graph import CompactGraph
+
+GRAPH = "p edge 3 2\ne a b\ne b c"
+
+
+def body(**options):
+    return json.dumps({"graph": GRAPH, "min_colors": 2, "options": options}).encode()
+
+
+def test_valid_job():
+    graph, min_colors, options = parse_job_request(body(race=True, stopping_rules={"plateau_window": 3}))
+    assert graph.num_vertices == 3
+    assert min_colors == 2
+    assert options["stopping_rules"] == {"plateau_window": 3}
+
+
+@pytest.mark.parametrize("options", [
+    {"colour": 3},
+    {"max_iterations": "5"},
+    {"max_iterations": True},
+    {"stopping_rules": {"plateau": 3}},
+    {"stopping_rules": {"plateau_window": "3"}},
+    {"stopping_rules": {"projection": 1}},
+    {"stopping_rules": [1]},
+])
+def test_invalid_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        parse_job_request(body(**options))
+
+
+def run_service(scenario, **kwargs):
+    """Runs scenario(service) against a SolveService with the fake S1 backend, on a fresh event loop."""
+    async def main():
+        kwargs.setdefault("client", make_client("fake", tokens_per_second=0, first_token_latency=0))
+        service = SolveService(workers=2, s2_processes=1, **kwargs)
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+async def finished(job):
+    while job.status not in FINISHED:
+        await job.wait_events(len(job.events))
+    return job
+
+
+def test_finished_job_keeps_a_copy_of_its_phases():
+    async def scenario(service):
+        return await finished(service.submit(CompactGraph.from_dimacs(GRAPH), 2))
+
+    job = run_service(scenario)
+    assert job.status == "done"
+    assert job.summary["winner"] == "S1"
+    assert job.phases["llm"]["count"] == 1
+    assert json.loads(dumps(job.to_dict()))["phases"] == job.phases
+
+
+@pytest.mark.parametrize("options", [
+    {"deadline": 0},
+    {"s2_time_limit": -1.0},
+    {"repair_time_limit": -0.5},
+    {"token_budget": 0},
+    {"max_iterations": -1},
+    {"stopping_rules": {"plateau_window": 0}},
+    {"stopping_rules": {"max_iterations": 0}},
+])
+def test_out_of_range_options_are_rejected(options):
+    with pytest.raises(ValueError, match="positive|negative"):
+        parse_job_request(body(**options))
+
+
+def test_zero_repair_time_limit_disables_repair():
+    _, _, options = parse_job_request(body(repair_time_limit=0))
+    assert options["repair_time_limit"] == 0
+
+
+@pytest.mark.parametrize("request_body", [b"{", b"[]", json.dumps({"graph": "c empty"}).encode(),
+                                          json.dumps({"graph": GRAPH, "min_colors": 0}).encode(),
+                                          json.dumps({"graph": GRAPH, "min_colors": True}).encode()])
+def test_invalid_bodies_are_rejected(request_body):
+    with pytest.raises(ValueError):
+        parse_job_request(request_body)
+
+
+def test_default_budget_is_computed_by_the_worker():
+    async def scenario(service):
+        job = service.submit(CompactGraph.from_dimacs(GRAPH))
+        queued = job.min_colors
+        return queued, await finished(job)
+
+    queued, job = run_service(scenario)
+    assert queued is None
+    assert job.min_colors == 2
+    assert job.status == "done"
+
+
+def test_job_past_its_deadline_expires():
+    async def scenario(service):
+        return await finished(service.submit(CompactGraph.from_dimacs(GRAPH), 2, {"deadline": 0.2}))
+
+    job = run_service(scenario, client=make_client("fake", first_token_latency=2))
+    assert job.status == "expired"
+    assert "deadline" in job.error
+
+
+def test_http_error_paths():
+    async def scenario(service):
+        # Without started workers the queue never drains, so its single slot stays taken
+        server = await asyncio.start_server(HTTPServer(service).handle, "127.0.0.1", 0)
+        client = ServiceClient(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        loop = asyncio.get_running_loop()
+
+        async def status_of(call, *args, **kwargs):
+            try:
+                await loop.run_in_executor(None, lambda: call(*args, **kwargs))
+            except ServiceError as e:
+                return e.status
+            return 200
+
+        async with server:
+            return [
+                await status_of(client.submit, GRAPH, 2, deadline=0),
+                await status_of(client.submit, GRAPH, 2, colour=3),
+                await status_of(client.submit, GRAPH, 2),
+                await status_of(client.submit, GRAPH, 2),
+                await status_of(client.status, "nosuchjob"),
+                await status_of(client._json, "GET", "/jobs"),
+                await status_of(client.health),
+            ]
+
+    async def main():
+        service = SolveService(make_client("fake"), workers=1, s2_processes=1, queue_size=1)
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+
+    assert asyncio.run(main()) == [400, 400, 200, 503, 404, 405, 200]
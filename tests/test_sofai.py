@@ -0,0 +1,153 @@
+import json
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from problem_generator.generate import _labels, sparse_gnp_edges
+from solver.sofai import solve_instance
+from utils.episodic_memory import EpisodicMemory
+from utils.graph import CompactGraph
+from utils.solution_cache import SolutionCache
+from utils.tracing import TraceWriter, Tracer
+
+
+def slow_invalid_llm(delay):
+    """An S1 stand-in that thinks for delay seconds and then colors nothing."""
+    def llm(messages, should_stop=None, parser=None):
+        time.sleep(delay)
+        return ""
+    return llm
+
+
+def test_race_s2_time_counts_from_job_start():
+    # Too large for S2 to prove optimal within its budget, so S1 gives up first and S2 runs out its time
+    graph = CompactGraph(_labels(80), sparse_gnp_edges(80, 0.5, np.random.default_rng(0)))
+    s2_time_limit = 1.0
+    summary = solve_instance(graph, 3, slow_invalid_llm(0.5), max_iterations=1, race=True,
+                             s2_time_limit=s2_time_limit, repair_time_limit=0)
+    assert summary["winner"] == "S2"
+    assert summary["timeout_occurred"]
+    # S2 ran from the start of the instance, not only from when S1 gave up after 0.5 s
+    assert abs(summary["s2_time"] - s2_time_limit) < 0.3
+    assert summary["s2_time"] <= summary["sofai_time"]
+
+
+def test_race_stops_s1_once_s2_proves_budget_too_small():
+    calls = []
+
+    def llm(messages, should_stop=None, parser=None):
+        calls.append(len(messages))
+        # Streams nothing useful for a while, abandoning the generation like model_res_generator
+        for _ in range(30):
+            if should_stop is not None and should_stop():
+                break
+            time.sleep(0.01)
+        return ""
+
+    # A 5-clique needs 5 colors; S2 proves it at once, S1 would otherwise use all 5 iterations
+    graph = CompactGraph(_labels(5), [(u, v) for u in range(5) for v in range(u + 1, 5)])
+    summary = solve_instance(graph, 3, llm, max_iterations=5, race=True, s2_time_limit=30, repair_time_limit=0,
+                             stopping_rules={"plateau_window": 10, "stop_on_repeat": False,
+                                             "stop_on_regression": False})
+    assert summary["winner"] == "S2"
+    assert summary["s2_solved"]
+    assert summary["num_colors"] == summary["lower_bound"] == 5
+    assert len(calls) < 5
+    assert summary["time_to_first_valid"] is not None
+    assert summary["time_to_first_valid"] <= summary["sofai_time"]
+
+
+def test_race_worker_is_stopped_when_s1_fails():
+    workers = []
+
+    def failing_llm(messages, should_stop=None, parser=None):
+        workers.extend(multiprocessing.active_children())
+        raise ConnectionError("model server went away")
+
+    graph = CompactGraph(_labels(80), sparse_gnp_edges(80, 0.5, np.random.default_rng(0)))
+    with pytest.raises(ConnectionError):
+        solve_instance(graph, 3, failing_llm, race=True, s2_time_limit=30)
+    assert workers
+    assert not any(worker.is_alive() for worker in workers)
+
+
+def test_stopping_rules_may_set_the_projection_horizon():
+    graph = CompactGraph(_labels(5), [(u, v) for u in range(5) for v in range(u + 1, 5)])
+    summary = solve_instance(graph, 5, slow_invalid_llm(0), max_iterations=2, repair_time_limit=0,
+                             stopping_rules={"max_iterations": 10, "projection": False})
+    assert summary["winner"] == "S2"
+    assert summary["iterations"] == 2
+
+
+def test_s1_coloring_over_the_budget_does_not_win():
+    requests = []
+
+    def rainbow_llm(messages, should_stop=None, parser=None):
+        # Conflict-free, but every vertex gets its own color
+        requests.append(messages[-1]["content"])
+        return "\n".join(f"({label} {i + 1})" for i, label in enumerate(_labels(4)))
+
+    path = CompactGraph(_labels(4), [(0, 1), (1, 2), (2, 3)])
+    summary = solve_instance(path, 2, rainbow_llm, max_iterations=2, repair_time_limit=0,
+                             stopping_rules={"plateau_window": None, "stop_on_repeat": False})
+    assert not summary["s1_solved"]
+    assert summary["winner"] == "S2"
+    assert summary["num_colors"] == 2
+    assert "uses 4 colors but at most 2 are allowed" in requests[-1]
+
+
+def test_race_s2_coloring_within_budget_counts_as_solved():
+    def waiting_llm(messages, should_stop=None, parser=None):
+        while not should_stop():
+            time.sleep(0.01)
+        return ""
+
+    # S2 finds a coloring within the generous budget at once but cannot prove it optimal before it is cancelled
+    graph = CompactGraph(_labels(80), sparse_gnp_edges(80, 0.5, np.random.default_rng(0)))
+    memory = EpisodicMemory()
+    cache = SolutionCache()
+    summary = solve_instance(graph, 40, waiting_llm, race=True, s2_time_limit=30, repair_time_limit=0,
+                             episodic_memory=memory, solution_cache=cache)
+    assert summary["winner"] == "S2"
+    assert summary["num_colors"] <= 40
+    assert summary["s2_solved"] and not summary["s2_optimal"]
+    assert len(memory) == 1
+    # The cache only holds proven optima
+    assert cache.lookup(graph) is None
+
+
+@pytest.mark.parametrize("log_features", [False, True])
+def test_features_are_only_computed_when_used(log_features):
+    graph = CompactGraph(_labels(5), [(u, v) for u in range(5) for v in range(u + 1, 5)])
+    tracer = Tracer()
+    summary = solve_instance(graph, 5, slow_invalid_llm(0), max_iterations=1, repair_time_limit=0,
+                             log_features=log_features, tracer=tracer)
+    assert ("clique_bound" in summary) == log_features
+    assert ("features" in tracer.phases) == log_features
+
+
+def closing_records(path):
+    with open(path) as f:
+        return [record for record in map(json.loads, f) if record["type"] == "run"]
+
+
+def test_failed_run_still_writes_its_trace_record(tmp_path):
+    def failing_llm(messages, should_stop=None, parser=None):
+        raise ConnectionError("model server went away")
+
+    path = tmp_path / "trace.jsonl"
+    graph = CompactGraph(_labels(5), [(u, v) for u in range(5) for v in range(u + 1, 5)])
+    with pytest.raises(ConnectionError):
+        solve_instance(graph, 5, failing_llm, tracer=Tracer(TraceWriter(path), run_id="failed"))
+    solve_instance(graph, 5, slow_invalid_llm(0), max_iterations=1, repair_time_limit=0,
+                   tracer=Tracer(TraceWriter(path), run_id="done"))
+
+    failed, done = closing_records(path)
+    assert (failed["run"], failed["status"]) == ("failed", "error")
+    assert "model server went away" in failed["error"]
+    assert failed["summary"]["winner"] is None
+    assert "llm" in failed["phases"]
+    assert (done["run"], done["status"]) == ("done", "ok")
+    assert "error" not in done
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from problem_generator.generate import _labels, sparse_gnp_edges
+from utils.graph import CompactGraph
+from validator.validate import GraphColoringValidator, ValidationSession
+
+
+def full_check(validator, coloring):
+    """Conflicting edges (as sorted label pairs) and uncolored count from a from-scratch validation."""
+    _, conflicts, uncolored = validator.validate_batch([coloring])
+    edges = validator.edge_labels(np.flatnonzero(conflicts[0]))
+    index = validator.graph.index
+    return {tuple(sorted(edge, key=index.get)) for edge in edges}, int(uncolored[0].sum())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_session_deltas_match_full_revalidation(seed):
+    rng = np.random.default_rng(seed)
+    n = 40
+    graph = CompactGraph(_labels(n), sparse_gnp_edges(n, 0.15, rng))
+    validator = GraphColoringValidator(graph)
+    session = ValidationSession(validator)
+    coloring = {}
+    previous = set()
+
+    for step in range(30):
+        # Recolor, uncolor or add a handful of vertices; every few steps replace the whole coloring
+        if step % 7 == 6:
+            coloring = {v: int(rng.integers(4)) for v in graph.labels if rng.random() < 0.9}
+            delta = session.update(coloring)
+        else:
+            changes = {}
+            for i in rng.choice(n, size=5, replace=False).tolist():
+                changes[graph.labels[i]] = None if rng.random() < 0.2 else int(rng.integers(4))
+            for vertex, color in changes.items():
+                if color is None:
+                    coloring.pop(vertex, None)
+                else:
+                    coloring[vertex] = color
+            delta = session.apply_changes(changes)
+
+        expected, uncolored = full_check(validator, coloring)
+        assert set(session.conflict_edges()) == expected
+        assert set(delta['fixed']) == previous - expected
+        assert set(delta['new']) == expected - previous
+        assert set(delta['unchanged']) == previous & expected
+        assert delta['uncolored'] == uncolored == len(session.uncolored_vertices())
+        assert session.is_valid() == (not expected and uncolored == 0)
+        previous = expected
+
+
+def test_session_ignores_unknown_vertices_and_repeated_colors():
+    graph = CompactGraph.from_dimacs("p edge 3 2\ne a b\ne b c")
+    session = ValidationSession(graph)
+
+    session.update({"a": 0, "b": 0, "c": 1})
+    delta = session.apply_changes({"a": 0, "zz": 3})
+
+    assert delta == {'fixed': [], 'new': [], 'unchanged': [("a", "b")], 'uncolored': 0}
+    assert session.apply_changes({"b": 2})['fixed'] == [("a", "b")]
+    assert session.is_valid()
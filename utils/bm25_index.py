@@ -0,0 +1,192 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+
+class _Postings:
+    """Growable (doc id, term frequency) arrays for one term."""
+
+    __slots__ = ("docs", "tfs", "size")
+
+    def __init__(self):
+        self.docs = np.empty(4, dtype=np.int64)
+        self.tfs = np.empty(4, dtype=np.float64)
+        self.size = 0
+
+    def append(self, doc_id, tf):
+        if self.size == len(self.docs):
+            self.docs = np.resize(self.docs, 2 * self.size)
+            self.tfs = np.resize(self.tfs, 2 * self.size)
+        self.docs[self.size] = doc_id
+        self.tfs[self.size] = tf
+        self.size += 1
+
+
+class BM25Index:
+    """
+    Incrementally maintained inverted index with BM25Okapi scoring.
+
+    Documents are added (and removed) one at a time: postings, document lengths and document
+    frequencies are updated in place, so nothing is re-tokenized at query time and only the
+    documents that share a term with the query are scored. Scores match rank_bm25.BM25Okapi over the same corpus,
+    including its epsilon floor for negative idf values.
+
+    The idf of a term is computed from its document frequency when it is queried. The epsilon floor
+    needs the average idf over the vocabulary, which is kept cheap by counting how many terms have
+    each document frequency, so it costs one term per distinct frequency instead of one per term.
+    With skip_clamped, terms whose idf is floored (those in more than half of the documents) are
+    left out of the scores: their postings are the longest and the floor gives them the same small
+    weight, so the query only touches the postings of the discriminative terms, at the cost of
+    no longer matching rank_bm25 exactly.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, epsilon=0.25, skip_clamped=False):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.skip_clamped = skip_clamped
+        self.postings = {}  # term -> _Postings
+        self.df_counts = Counter()  # document frequency -> number of terms with that frequency
+        self.doc_len = np.empty(16, dtype=np.float64)
+        self.live = np.zeros(16, dtype=bool)
+        self.next_id = 0
+        self.corpus_size = 0  # number of live documents
+        self.total_len = 0
+        # Cached per-corpus values, invalidated whenever a document is added or removed
+        self._average_idf = None
+        self._norm = None  # per-document length normalisation
+
+    def __len__(self):
+        return self.corpus_size
+
+    def add(self, tokens):
+        """Indexes a tokenized document and returns its id (ids are assigned in insertion order)."""
+        doc_id = self.next_id
+        if doc_id == len(self.doc_len):
+            self.doc_len = np.resize(self.doc_len, 2 * doc_id)
+            self.live = np.resize(self.live, 2 * doc_id)
+        self.doc_len[doc_id] = len(tokens)
+        self.live[doc_id] = True
+        self.next_id += 1
+        self.total_len += len(tokens)
+        self.corpus_size += 1
+        for term, tf in Counter(tokens).items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = _Postings()
+            self._move_df(postings.size, postings.size + 1)
+            postings.append(doc_id, tf)
+        self._average_idf = None
+        self._norm = None
+        return doc_id
+
+    def remove(self, doc_id, tokens):
+        """Removes a document given the tokens it was added with; its id is not reused."""
+        if not self.live[doc_id]:
+            return
+        for term in set(tokens):
+            postings = self.postings[term]
+            keep = postings.docs[:postings.size] != doc_id
+            size = int(keep.sum())
+            self._move_df(postings.size, size)
+            postings.size = size
+            if not postings.size:
+                del self.postings[term]
+                continue
+            postings.docs[:postings.size] = postings.docs[:len(keep)][keep]
+            postings.tfs[:postings.size] = postings.tfs[:len(keep)][keep]
+        self.total_len -= self.doc_len[doc_id]
+        self.doc_len[doc_id] = 0
+        self.live[doc_id] = False
+        self.corpus_size -= 1
+        self._average_idf = None
+        self._norm = None
+
+    def _move_df(self, old, new):
+        """Moves one term from document frequency old to new in df_counts (0 means not indexed)."""
+        for df, step in ((old, -1), (new, 1)):
+            if df:
+                self.df_counts[df] += step
+                if not self.df_counts[df]:
+                    del self.df_counts[df]
+
+    def raw_idf(self, df):
+        """Returns the BM25Okapi idf of a term with document frequency df, before the epsilon floor."""
+        return math.log(self.corpus_size - df + 0.5) - math.log(df + 0.5)
+
+    def average_idf(self):
+        """Returns the mean raw idf over the vocabulary, recomputing it only after the corpus changed."""
+        if self._average_idf is None:
+            if not self.postings:
+                self._average_idf = 0.0
+            else:
+                df = np.fromiter(self.df_counts.keys(), dtype=np.float64, count=len(self.df_counts))
+                counts = np.fromiter(self.df_counts.values(), dtype=np.float64, count=len(self.df_counts))
+                values = np.log(self.corpus_size - df + 0.5) - np.log(df + 0.5)
+                self._average_idf = float(values @ counts) / len(self.postings)
+        return self._average_idf
+
+    def idf(self, term):
+        """Returns the BM25Okapi idf of term, with negative values floored to epsilon * average_idf (0 when unknown)."""
+        postings = self.postings.get(term)
+        if postings is None:
+            return 0.0
+        value = self.raw_idf(postings.size)
+        return value if value >= 0 else self.epsilon * self.average_idf()
+
+    def length_norm(self):
+        """Returns k1 * (1 - b + b * dl / avgdl) for every document, recomputing it only after the corpus changed."""
+        if self._norm is None:
+            avgdl = self.total_len / self.corpus_size
+            self._norm = self.k1 * (1 - self.b + self.b * self.doc_len[:self.next_id] / avgdl)
+        return self._norm
+
+    def get_scores(self, tokens):
+        """Returns the BM25 score of every document id for the tokenized query (removed ids score 0)."""
+        scores = np.zeros(self.next_id)
+        if not self.corpus_size:
+            return scores
+        norm = self.length_norm()
+        k1 = self.k1
+        for term, count in Counter(tokens).items():
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            weight = self.raw_idf(postings.size)
+            if weight < 0:
+                if self.skip_clamped:
+                    continue
+                weight = self.epsilon * self.average_idf()
+            if not weight:
+                continue
+            tf = postings.tfs[:postings.size]
+            if postings.size == self.next_id:
+                # The term occurs in every document and none was removed, so its postings are exactly 0..N-1
+                scores += count * weight * (tf * (k1 + 1) / (tf + norm))
+            else:
+                docs = postings.docs[:postings.size]
+                scores[docs] += count * weight * (tf * (k1 + 1) / (tf + norm[docs]))
+        return scores
+
+    def top_k(self, tokens, top_k=1):
+        """
+        Returns the ids of the top_k documents, best first.
+
+        Ties are ordered like np.argsort(scores)[::-1] with a stable sort, i.e. higher ids first.
+        """
+        scores = self.get_scores(tokens)
+        top_k = min(top_k, self.corpus_size)
+        if top_k <= 0:
+            return []
+        if self.corpus_size < self.next_id:
+            scores[~self.live[:self.next_id]] = -np.inf
+        if top_k < self.next_id:
+            # Keep every document tied with the k-th best so the tie order is exact
+            threshold = np.partition(scores, self.next_id - top_k)[self.next_id - top_k]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(self.next_id)
+        order = np.lexsort((-candidates, -scores[candidates]))
+        return candidates[order[:top_k]].tolist()
+
@@ -1,37 +1,125 @@
-from rank_bm25 import BM25Okapi
+import threading
 from typing import List, Dict, Tuple
+
 import numpy as np
 
+from utils.bm25_index import BM25Index
+from utils.graph_fingerprint import FingerprintIndex, graph_fingerprint
+
+RETRIEVAL_MODES = ("bm25", "structural")
+
 class EpisodicMemory:
-    def __init__(self):
+    def __init__(self, store=None, skip_common_terms=False):
+        """
+        Args:
+            store (SQLiteMemoryStore, optional): Persistent backend shared with other processes. Without
+                one the memory only lives in this process. With one, entries are loaded lazily on first
+                use, solutions are only read for retrieved entries, and entries added or evicted by other
+                processes are picked up incrementally before every retrieval.
+            skip_common_terms (bool): In "bm25" mode, ignore the tokens found in more than half of the
+                problems (see BM25Index's skip_clamped); faster on a large memory, but the ranking no
+                longer matches rank_bm25.
+        """
         # Memory storage for past problem instances and their solutions
-        self.memory = []  # Each element will be a dict with 'problem' and 'solution' keys
+        self.memory = []  # Each element will be a dict with 'problem' and 'solution' keys (None once evicted)
+        # Indexes over the problems, both updated in place by add_memory
+        self.index = BM25Index(skip_clamped=skip_common_terms)
+        self.fingerprints = FingerprintIndex()
+        self.store = store
+        self._positions = {}  # store id -> position in self.memory
+        self._last_id = 0
+        self._last_eviction = None  # None until the first sync with the store
+        # Instances solved concurrently (see run_batch.py) share one memory
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self.index)
+
+    def _append(self, entry, tokens, fingerprint):
+        self.memory.append(entry)
+        self.index.add(tokens)
+        self.fingerprints.add(fingerprint)
+
+    def _sync(self):
+        """Indexes the store entries this process has not seen yet and drops evicted ones."""
+        if self.store is None:
+            return
+        if self._last_eviction is None:
+            # Evictions logged before the first load only concern rows that are already gone
+            self._last_eviction = self.store.last_eviction()
+        for memory_id, problem, blob in self.store.iter_problems(self._last_id):
+            fingerprint = graph_fingerprint(problem) if blob is None else np.frombuffer(blob, dtype=np.float32)
+            self._positions[memory_id] = len(self.memory)
+            # The solution is read from the store only when the entry is retrieved
+            self._append({'problem': problem, 'solution': None, 'id': memory_id}, problem.split(), fingerprint)
+            self._last_id = memory_id
+        for seq, memory_id in self.store.evictions_after(self._last_eviction):
+            position = self._positions.pop(memory_id, None)
+            if position is not None:
+                self.index.remove(position, self.memory[position]['problem'].split())
+                self.fingerprints.remove(position)
+                self.memory[position] = None
+            self._last_eviction = seq
+
+    def add_memory(self, problem: str, solution: str, graph=None):
+        """ Adds a problem and its solution to the episodic memory.
+
+        With a store, identical problems are only stored once and the store may evict older entries.
+
+        Args:
+            problem (str): The problem instance in DIMACS text form.
+            solution (str): Its solution.
+            graph (CompactGraph, optional): The already parsed problem, to skip re-parsing it for the fingerprint.
+        """
+        fingerprint = graph_fingerprint(problem if graph is None else graph)
+        with self._lock:
+            if self.store is None:
+                self._append({'problem': problem, 'solution': solution}, problem.split(), fingerprint)
+                return
+            self.store.add(problem, solution, fingerprint)
+            self._sync()
 
-    def add_memory(self, problem: str, solution: str):
-        """ Adds a problem and its solution to the episodic memory. """
-        self.memory.append({'problem': problem, 'solution': solution})
+    def retrieve_similar(self, new_problem: str, top_k: int = 1, mode: str = "bm25") -> List[Tuple[str, str]]:
+        """ Retrieves the most similar past problems and their solutions.
 
-    def retrieve_similar(self, new_problem: str, top_k: int = 1) -> List[Tuple[str, str]]:
-        """ Retrieves the most similar past problems and their solutions using BM25.
+        In "bm25" mode the problems are ranked by BM25 over their DIMACS tokens; only the documents
+        sharing a token with the query are scored and the ranking is the same as building
+        rank_bm25.BM25Okapi over the whole memory (unless skip_common_terms is set). In "structural" mode they are ranked by the
+        distance between label-invariant graph fingerprints (sizes, density, degree histogram and
+        Weisfeiler-Lehman hashes), which ignores the vertex names every generated graph shares.
 
         Args:
-            new_problem (str): The new problem instance described in text form.
+            new_problem (str or CompactGraph): The new problem instance described in text form, or already parsed.
             top_k (int): Number of top similar instances to retrieve.
+            mode (str): "bm25" or "structural".
 
         Returns:
             List[Tuple[str, str]]: A list of tuples containing the problem and solution pairs.
         """
-        # Tokenize and prepare data for BM25
-        corpus = [doc['problem'].split() for doc in self.memory]
-        bm25 = BM25Okapi(corpus)
+        query_fingerprint = graph_fingerprint(new_problem) if mode == "structural" else None
+        with self._lock:
+            self._sync()
+            if mode == "structural":
+                top_indexes = self.fingerprints.top_k(query_fingerprint, top_k)
+            elif mode == "bm25":
+                # Query the new problem
+                if not isinstance(new_problem, str):
+                    new_problem = new_problem.to_dimacs()
+                tokenized_query = new_problem.split()
+                top_indexes = self.index.top_k(tokenized_query, top_k)
+            else:
+                raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {RETRIEVAL_MODES}")
 
-        # Query the new problem
-        tokenized_query = new_problem.split()
-        scores = bm25.get_scores(tokenized_query)
-        top_indexes = np.argsort(scores)[::-1][:top_k]  # Get the indexes of the top_k scores
+            if self.store is not None:
+                ids = [self.memory[i]['id'] for i in top_indexes]
+                stored = self.store.get_solutions(ids)
+                self.store.touch(ids)
+                # An entry evicted by another process since the last sync is skipped
+                return [stored[i] for i in ids if i in stored]
 
-        # Fetch the most relevant memories
-        relevant_memories = [(self.memory[i]['problem'], self.memory[i]['solution']) for i in top_indexes]
+            # Fetch the most relevant memories
+            relevant_memories = [(self.memory[i]['problem'], self.memory[i]['solution']) for i in top_indexes]
 
         return relevant_memories
-    
@@ -1,43 +1,157 @@
 import random
-import networkx as nx
+
+import numpy as np
+
+from utils.graph import CompactGraph
+
+
+def greedy_color(graph, nodes):
+    """
+    Colors the subgraph induced by nodes greedily in largest-first order (colors start from 0).
+
+    Args:
+        graph (CompactGraph): The full graph.
+        nodes (list of int): Vertex ids of the induced subgraph.
+
+    Returns:
+        dict: Vertex id to color.
+    """
+    selected = set(nodes)
+    neighbours = {v: [u for u in graph.neighbours(v).tolist() if u in selected] for v in nodes}
+    coloring = {}
+    for v in sorted(nodes, key=lambda u: len(neighbours[u]), reverse=True):
+        used = {coloring[u] for u in neighbours[v] if u in coloring}
+        color = 0
+        while color in used:
+            color += 1
+        coloring[v] = color
+    return coloring
+
+
+def _format_example(graph, nodes, edges, coloring):
+    """Formats a colored subgraph (vertex ids, edge id pairs, {vertex id: color}) as shown to the LLM."""
+    labels = graph.labels
+    dimacs_format = "A simple example of solving graph coloring problem:\n"
+    dimacs_format += f"p edge {len(nodes)} {len(edges)}\n"
+    for u, v in edges:
+        dimacs_format += f"e {labels[u]} {labels[v]}\n\n"
+
+    # Format the coloring
+    coloring_format = " ".join([f"({labels[node]} {color})\n" for node, color in coloring.items()])
+
+    return dimacs_format + coloring_format
 
 
 def generate_example(graph_content):
     """
     Generates a subgraph coloring example from the given graph.
-    
+
     Args:
-        full_graph (nx.Graph): The full graph from which to generate a subgraph and its coloring.
-    
+        graph_content (str or CompactGraph): The full graph, as DIMACS text or an already loaded graph.
+
     Returns:
         str: A formatted string representing the subgraph and its coloring.
     """
-    print(graph_content)
-    G = nx.Graph()
-    lines = graph_content.strip().split('\n')
-    for line in lines:
-        parts = line.split()
-        if parts[0] == 'e':
-            G.add_edge(parts[1], parts[2])
+    if isinstance(graph_content, CompactGraph):
+        graph = graph_content
+    else:
+        graph = CompactGraph.from_dimacs(graph_content)
+
     # Create a subgraph by randomly selecting a subset of nodes
-    nodes = list(G.nodes())
+    nodes = list(range(graph.num_vertices))
     if len(nodes) > 2:
         subgraph_nodes = random.sample(nodes, max(3, len(nodes) // 2))  # At least 3 nodes, or half the nodes
     else:
         subgraph_nodes = nodes  # If not enough nodes, use all nodes
 
-    subgraph = G.subgraph(subgraph_nodes).copy()
-    
+    selected = set(subgraph_nodes)
+    subgraph_edges = [(u, v) for u, v in graph.edges.tolist() if u in selected and v in selected]
+
     # Provide a simple coloring solution using a greedy algorithm
-    coloring = nx.coloring.greedy_color(subgraph, strategy='largest_first')
-    
-    # Format the subgraph in DIMACS format
-    dimacs_format = "A simple example of solving graph coloring problem:\n"
-    dimacs_format += f"p edge {len(subgraph.nodes())} {len(subgraph.edges())}\n"
-    for edge in subgraph.edges():
-        dimacs_format += f"e {edge[0]} {edge[1]}\n\n"
-    
-    # Format the coloring
-    coloring_format = " ".join([f"({node} {color})\n" for node, color in coloring.items()])
-    
-    return dimacs_format + coloring_format
+    coloring = greedy_color(graph, subgraph_nodes)
+    return _format_example(graph, subgraph_nodes, subgraph_edges, coloring)
+
+
+class ExamplePool:
+    """
+    Precomputed pool of correctly colored subgraphs of one instance, picked by the conflicts they cover.
+
+    The pool is built once when the instance is loaded. Each example is the neighbourhood of a
+    center vertex, grown breadth-first to the size generate_example uses, with centers chosen so
+    that the examples together cover as many edges as possible. At feedback time the example that
+    contains the most conflicting edges is returned; that is one vectorized lookup per conflicting
+    edge in a (pool size, n) membership matrix, and the text is already formatted.
+    """
+
+    def __init__(self, graph, size=8):
+        """
+        Args:
+            graph (CompactGraph): The instance.
+            size (int): Maximum number of examples in the pool.
+        """
+        self.graph = graph
+        n = graph.num_vertices
+        self.examples = []  # formatted texts
+        self.uses = []
+        members = []  # one boolean vertex membership row per example
+        if n == 0:
+            self.members = np.zeros((0, 0), dtype=bool)
+            return
+        target = n if n <= 2 else max(3, n // 2)
+        degrees = graph.degrees()
+        uncovered = [set(graph.neighbours(v).tolist()) for v in range(n)]  # edges not in any example yet
+        for _ in range(size):
+            center = max(range(n), key=lambda v: (len(uncovered[v]), degrees[v], -v))
+            if self.examples and not uncovered[center]:
+                break
+            nodes = self._neighbourhood(center, target)
+            selected = set(nodes)
+            edges = [(u, v) for u, v in graph.edges.tolist() if u in selected and v in selected]
+            for u, v in edges:
+                uncovered[u].discard(v)
+                uncovered[v].discard(u)
+            row = np.zeros(n, dtype=bool)
+            row[nodes] = True
+            members.append(row)
+            self.examples.append(_format_example(graph, nodes, edges, greedy_color(graph, nodes)))
+            self.uses.append(0)
+        self.members = np.array(members)
+
+    def _neighbourhood(self, center, target):
+        """Vertex ids reached breadth-first from center, up to target of them."""
+        nodes = [center]
+        seen = {center}
+        for v in nodes:
+            for u in self.graph.neighbours(v).tolist():
+                if len(nodes) == target:
+                    return nodes
+                if u not in seen:
+                    seen.add(u)
+                    nodes.append(u)
+        # A small component: fill up with the lowest unvisited ids
+        for u in range(self.graph.num_vertices):
+            if len(nodes) == target:
+                break
+            if u not in seen:
+                seen.add(u)
+                nodes.append(u)
+        return nodes
+
+    def example_for(self, conflicts):
+        """
+        Returns the pooled example covering the most conflicting edges (the least used one on ties).
+
+        Args:
+            conflicts (iterable of tuple): Conflicting edges as (u, v) vertex id pairs.
+
+        Returns:
+            str: The formatted example, as generate_example returns it.
+        """
+        if not self.examples:
+            return generate_example(self.graph)
+        conflicts = np.asarray(list(conflicts), dtype=np.intp).reshape(-1, 2)
+        # An example covers a conflicting edge when it contains both endpoints
+        coverage = (self.members[:, conflicts[:, 0]] & self.members[:, conflicts[:, 1]]).sum(axis=1)
+        best = max(range(len(self.examples)), key=lambda i: (coverage[i], -self.uses[i]))
+        self.uses[best] += 1
+        return self.examples[best]
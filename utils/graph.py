@@ -0,0 +1,155 @@
+import numpy as np
+
+
+class CompactGraph:
+    """
+    Immutable, array-backed undirected graph shared by the parser, validator, example generator and S2.
+
+    Vertex labels are interned once and mapped to integer ids 0..n-1 in order of first appearance.
+    Edges are kept as an (m, 2) int32 array and adjacency in CSR form (indptr, indices), so an
+    instance is parsed a single time and every consumer works on the same arrays.
+    """
+
+    __slots__ = (
+        "_labels", "_index", "_edges", "_indptr", "_indices",
+        "_declared_vertices", "_declared_edges", "_content", "_bitsets",
+    )
+
+    def __init__(self, labels, edges, declared_vertices=None, declared_edges=None):
+        """
+        Args:
+            labels (sequence of str): Vertex labels; the position of a label is its id.
+            edges (array-like): Pairs of vertex ids. Duplicate edges and self-loops are dropped.
+            declared_vertices (int, optional): Vertex count from the DIMACS problem line.
+            declared_edges (int, optional): Edge count from the DIMACS problem line.
+        """
+        self._labels = tuple(labels)
+        self._index = {label: i for i, label in enumerate(self._labels)}
+        n = len(self._labels)
+
+        edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        if len(edges):
+            # Drop repeated edges (in either direction) while keeping the first occurrence order
+            keys = np.minimum(edges[:, 0], edges[:, 1]).astype(np.int64) * n + np.maximum(edges[:, 0], edges[:, 1])
+            _, first = np.unique(keys, return_index=True)
+            edges = edges[np.sort(first)]
+        self._edges = edges
+        self._edges.flags.writeable = False
+
+        # CSR adjacency: neighbours of i are indices[indptr[i]:indptr[i + 1]], sorted
+        src = np.concatenate([edges[:, 0], edges[:, 1]])
+        dst = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.lexsort((dst, src))
+        self._indices = dst[order].astype(np.int32)
+        self._indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self._indptr[1:])
+        self._indices.flags.writeable = False
+        self._indptr.flags.writeable = False
+
+        self._declared_vertices = n if declared_vertices is None else int(declared_vertices)
+        self._declared_edges = len(edges) if declared_edges is None else int(declared_edges)
+        self._content = None
+        self._bitsets = None
+
+    @classmethod
+    def from_dimacs(cls, graph_content):
+        """Builds a graph from DIMACS text ('p edge n m' and 'e u v' lines; other lines are ignored)."""
+        index = {}
+        labels = []
+        edges = []
+        declared_vertices = declared_edges = None
+        for line in graph_content.splitlines():
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'p' and len(parts) == 4:
+                declared_vertices, declared_edges = int(parts[2]), int(parts[3])
+            elif parts[0] == 'e' and len(parts) == 3:
+                for v in parts[1:]:
+                    if v not in index:
+                        index[v] = len(labels)
+                        labels.append(v)
+                edges.append((index[parts[1]], index[parts[2]]))
+        return cls(labels, edges, declared_vertices, declared_edges)
+
+    @classmethod
+    def from_file(cls, file_path):
+        """Builds a graph from a DIMACS .col file."""
+        with open(file_path, 'r') as file:
+            return cls.from_dimacs(file.read())
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def index(self):
+        """Mapping from vertex label to integer id (do not modify)."""
+        return self._index
+
+    @property
+    def edges(self):
+        return self._edges
+
+    @property
+    def indptr(self):
+        return self._indptr
+
+    @property
+    def indices(self):
+        return self._indices
+
+    @property
+    def num_vertices(self):
+        return len(self._labels)
+
+    @property
+    def num_edges(self):
+        return len(self._edges)
+
+    @property
+    def declared_vertices(self):
+        return self._declared_vertices
+
+    @property
+    def declared_edges(self):
+        return self._declared_edges
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __repr__(self):
+        return f"CompactGraph(n={self.num_vertices}, m={self.num_edges})"
+
+    def degrees(self):
+        """Returns the degree of every vertex as an int array."""
+        return np.diff(self._indptr)
+
+    def neighbours(self, i):
+        """Returns the ids of the neighbours of vertex i."""
+        return self._indices[self._indptr[i]:self._indptr[i + 1]]
+
+    def edge_labels(self):
+        """Yields every edge as a pair of vertex labels."""
+        labels = self._labels
+        for u, v in self._edges.tolist():
+            yield labels[u], labels[v]
+
+    def adjacency_bitsets(self):
+        """Returns adjacency as a list of ints where bit j of entry i is set when i and j are adjacent."""
+        if self._bitsets is None:
+            bitsets = [0] * self.num_vertices
+            for u, v in self._edges.tolist():
+                bitsets[u] |= 1 << v
+                bitsets[v] |= 1 << u
+            self._bitsets = bitsets
+        return list(self._bitsets)
+
+    def to_dimacs(self):
+        """Returns the graph as DIMACS text in the form used by the prompts, counting the deduplicated edges."""
+        if self._content is None:
+            self._content = f"p edge {self._declared_vertices} {len(self._edges)}\n" + "\n".join(
+                f"e {u} {v}" for u, v in self.edge_labels()
+            )
+        return self._content
@@ -0,0 +1,123 @@
+import zlib
+
+import numpy as np
+
+from utils.graph import CompactGraph
+
+DEGREE_BINS = 16
+WL_ITERATIONS = 3
+WL_BUCKETS = 32
+# log1p(n) and log1p(m), density, the degree histogram and one WL histogram per iteration
+FINGERPRINT_SIZE = 3 + DEGREE_BINS + WL_ITERATIONS * WL_BUCKETS
+
+
+def _stable_hash(values):
+    """Hashes a tuple of ints independently of PYTHONHASHSEED, so fingerprints can be persisted."""
+    return zlib.crc32(np.asarray(values, dtype=np.int64).tobytes())
+
+
+def weisfeiler_lehman_rounds(graph, iterations):
+    """
+    Yields the vertex colors after each Weisfeiler-Lehman refinement round, starting from the degrees.
+
+    Colors are stable hashes of a vertex's color and the sorted colors of its neighbours, so
+    isomorphic graphs get the same colors on corresponding vertices.
+
+    Args:
+        graph (CompactGraph): The graph.
+        iterations (int): Number of refinement rounds.
+
+    Yields:
+        np.ndarray: An int64 color per vertex id.
+    """
+    colors = graph.degrees().astype(np.int64)
+    indptr, indices = graph.indptr, graph.indices
+    for _ in range(iterations):
+        colors = np.array([
+            _stable_hash((colors[v], *np.sort(colors[indices[indptr[v]:indptr[v + 1]]])))
+            for v in range(graph.num_vertices)
+        ], dtype=np.int64)
+        yield colors
+
+
+def graph_fingerprint(graph):
+    """
+    Computes a fixed-length, label-invariant fingerprint of a graph.
+
+    The vector holds log-scaled vertex and edge counts, the edge density, a histogram of
+    relative degrees and, for each Weisfeiler-Lehman refinement round, a histogram of the
+    refined vertex colors hashed into WL_BUCKETS buckets. Histograms are normalised by the
+    number of vertices so graphs of different sizes remain comparable.
+
+    Args:
+        graph (CompactGraph or str): The graph, or its DIMACS text.
+
+    Returns:
+        np.ndarray: A float32 vector of length FINGERPRINT_SIZE.
+    """
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_dimacs(graph)
+    n, m = graph.num_vertices, graph.num_edges
+    fingerprint = np.zeros(FINGERPRINT_SIZE, dtype=np.float32)
+    # Sizes are scaled so that a 10x difference weighs about as much as a full histogram shift
+    fingerprint[0] = np.log1p(n) / np.log(10)
+    fingerprint[1] = np.log1p(m) / np.log(10)
+    if n == 0:
+        return fingerprint
+    fingerprint[2] = 2 * m / (n * (n - 1)) if n > 1 else 0.0
+
+    degrees = graph.degrees()
+    relative = degrees / max(n - 1, 1)
+    bins = np.minimum((relative * DEGREE_BINS).astype(np.int64), DEGREE_BINS - 1)
+    fingerprint[3:3 + DEGREE_BINS] = np.bincount(bins, minlength=DEGREE_BINS) / n
+
+    offset = 3 + DEGREE_BINS
+    for colors in weisfeiler_lehman_rounds(graph, WL_ITERATIONS):
+        fingerprint[offset:offset + WL_BUCKETS] = np.bincount(colors % WL_BUCKETS, minlength=WL_BUCKETS) / n
+        offset += WL_BUCKETS
+    return fingerprint
+
+
+class FingerprintIndex:
+    """Nearest-neighbour search over fingerprints stored in one growable (N, D) matrix."""
+
+    def __init__(self, dimension=FINGERPRINT_SIZE):
+        self.vectors = np.empty((16, dimension), dtype=np.float32)
+        self.live = np.zeros(16, dtype=bool)
+        self.size = 0  # ids handed out so far
+        self.live_count = 0
+
+    def __len__(self):
+        return self.live_count
+
+    def add(self, fingerprint):
+        """Appends a fingerprint and returns its id (ids are assigned in insertion order)."""
+        if self.size == len(self.vectors):
+            grown = np.empty((2 * self.size, self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.vectors
+            self.vectors = grown
+            self.live = np.resize(self.live, 2 * self.size)
+        self.vectors[self.size] = fingerprint
+        self.live[self.size] = True
+        self.size += 1
+        self.live_count += 1
+        return self.size - 1
+
+    def remove(self, fingerprint_id):
+        """Excludes a fingerprint from future searches; its id is not reused."""
+        if self.live[fingerprint_id]:
+            self.live[fingerprint_id] = False
+            self.live_count -= 1
+
+    def top_k(self, fingerprint, top_k=1):
+        """Returns the ids of the top_k nearest fingerprints by Euclidean distance, nearest first."""
+        top_k = min(top_k, self.live_count)
+        if top_k <= 0:
+            return []
+        distances = np.sum((self.vectors[:self.size] - fingerprint) ** 2, axis=1)
+        distances[~self.live[:self.size]] = np.inf
+        if top_k < self.size:
+            candidates = np.argpartition(distances, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(self.size)
+        return candidates[np.argsort(distances[candidates], kind='stable')[:top_k]].tolist()
@@ -0,0 +1,249 @@
+"""
+Packed binary dataset format for graph coloring instances.
+
+A dataset is a directory holding
+
+    manifest.npy           one record per instance (see MANIFEST_DTYPE)
+    names.txt              instance names, one per line, in manifest order
+    shard-00000.edges.npy  int32 (M, 2) edges of every instance of the shard, back to back
+    shard-00000.labels.npy uint8 blob of the newline-separated vertex labels of those instances
+
+Shards are memory-mapped, so loading an instance is a slice of two arrays instead of opening
+and parsing a file. Converters to and from DIMACS .col files are at the bottom of the module:
+
+    python -m utils.graph_shards pack graph_coloring_problems graph_coloring_dataset
+    python -m utils.graph_shards unpack graph_coloring_dataset graph_coloring_problems
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from utils.graph import CompactGraph
+
+MANIFEST_DTYPE = np.dtype([
+    ("shard", np.int32),
+    ("edge_offset", np.int64),  # first row of the instance in the shard's edge array
+    ("m", np.int64),
+    ("label_offset", np.int64),  # byte range of the instance's labels in the shard's label blob
+    ("label_bytes", np.int64),
+    ("n", np.int64),
+    ("declared_vertices", np.int64),
+    ("declared_edges", np.int64),
+    ("p", np.float64),  # edge probability, NaN if unknown
+    ("seed", np.int64),  # -1 if unknown
+    ("colors", np.int32),  # color budget of the instance, -1 if unknown
+    ("lower_bound", np.int32),  # known bounds on the chromatic number, -1 if unknown
+    ("upper_bound", np.int32),
+])
+MANIFEST_FILE = "manifest.npy"
+NAMES_FILE = "names.txt"
+
+
+def is_dataset(path):
+    """True when path is a dataset directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def _shard_paths(directory, shard):
+    base = os.path.join(directory, f"shard-{shard:05d}")
+    return f"{base}.edges.npy", f"{base}.labels.npy"
+
+
+class ShardWriter:
+    """Writes instances to a dataset directory, one shard at a time, as they are added."""
+
+    def __init__(self, directory, shard_size=10000):
+        """
+        Args:
+            directory (str): Dataset directory; it is created if missing and overwritten otherwise.
+            shard_size (int): Instances per shard.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.records = []
+        self.names = []
+        self._edges = []
+        self._labels = []
+        self._edge_rows = 0
+        self._label_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, name, graph, p=float("nan"), seed=-1, colors=-1, lower_bound=-1, upper_bound=-1):
+        """
+        Appends an instance.
+
+        Args:
+            name (str): Instance name (for example the .col file name).
+            graph (CompactGraph): The instance.
+            p (float): Edge probability it was generated with, if known.
+            seed (int): Seed it was generated with, if known.
+            colors (int): Its color budget, if known.
+            lower_bound (int): Known lower bound on its chromatic number.
+            upper_bound (int): Known upper bound on its chromatic number.
+        """
+        if "\n" in name or any("\n" in label for label in graph.labels):
+            raise ValueError("Instance names and vertex labels must not contain newlines")
+        labels = "\n".join(graph.labels).encode()
+        shard = len(self.records) // self.shard_size
+        self.records.append((
+            shard, self._edge_rows, graph.num_edges, self._label_bytes, len(labels), graph.num_vertices,
+            graph.declared_vertices, graph.declared_edges, p, seed, colors, lower_bound, upper_bound,
+        ))
+        self.names.append(name)
+        self._edges.append(graph.edges)
+        self._labels.append(labels)
+        self._edge_rows += graph.num_edges
+        self._label_bytes += len(labels)
+        if len(self.records) % self.shard_size == 0:
+            self._flush(shard)
+
+    def _flush(self, shard):
+        if not self._edges:
+            return
+        edges_path, labels_path = _shard_paths(self.directory, shard)
+        np.save(edges_path, np.concatenate(self._edges).astype(np.int32).reshape(-1, 2))
+        np.save(labels_path, np.frombuffer(b"".join(self._labels), dtype=np.uint8))
+        self._edges, self._labels = [], []
+        self._edge_rows = self._label_bytes = 0
+
+    def close(self):
+        """Writes the last shard and the manifest."""
+        self._flush((len(self.records) - 1) // self.shard_size)
+        np.save(os.path.join(self.directory, MANIFEST_FILE), np.array(self.records, dtype=MANIFEST_DTYPE))
+        with open(os.path.join(self.directory, NAMES_FILE), "w") as f:
+            f.write("".join(f"{name}\n" for name in self.names))
+
+
+class GraphDataset:
+    """
+    Read-only view of a dataset directory; instances are loaded from memory-mapped shards.
+
+    Instances can be looked up by position or by name, and iterating yields (name, graph) pairs.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = np.load(os.path.join(directory, MANIFEST_FILE), mmap_mode="r")
+        with open(os.path.join(directory, NAMES_FILE)) as f:
+            self.names = f.read().splitlines()
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __iter__(self):
+        for i, name in enumerate(self.names):
+            yield name, self[i]
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            edges_path, labels_path = _shard_paths(self.directory, shard)
+            self._shards[shard] = (np.load(edges_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r"))
+        return self._shards[shard]
+
+    def position(self, key):
+        """Returns the manifest position of an instance given by position or name."""
+        return self._positions[key] if isinstance(key, str) else int(key)
+
+    def metadata(self, key):
+        """Returns the manifest record of an instance as a dict."""
+        record = self.manifest[self.position(key)]
+        return {field: record[field].item() for field in MANIFEST_DTYPE.names}
+
+    def __getitem__(self, key):
+        record = self.manifest[self.position(key)]
+        edges, labels = self._shard(int(record["shard"]))
+        start = int(record["label_offset"])
+        label_text = labels[start:start + int(record["label_bytes"])].tobytes().decode()
+        start = int(record["edge_offset"])
+        return CompactGraph(
+            label_text.split("\n") if label_text else [],
+            edges[start:start + int(record["m"])],
+            int(record["declared_vertices"]),
+            int(record["declared_edges"]),
+        )
+
+
+def _col_metadata(file_path):
+    """Reads the "c colors k solvable s seed x probability p" line written by generate_dataset."""
+    metadata = {}
+    with open(file_path) as f:
+        parts = f.readline().split()
+    if parts[:1] != ["c"]:
+        return metadata
+    fields = dict(zip(parts[1::2], parts[2::2]))
+    if "colors" in fields:
+        colors = int(fields["colors"])
+        metadata["colors"] = colors
+        if fields.get("solvable") == "True":
+            metadata["upper_bound"] = colors
+        elif fields.get("solvable") == "False":
+            metadata["lower_bound"] = colors + 1
+    if "seed" in fields:
+        metadata["seed"] = int(fields["seed"])
+    if "probability" in fields:
+        metadata["p"] = float(fields["probability"])
+    return metadata
+
+
+def pack(problems_dir, directory, shard_size=10000):
+    """
+    Converts every .col file of problems_dir into a dataset.
+
+    Returns:
+        int: The number of instances written.
+    """
+    files = sorted(glob.glob(os.path.join(problems_dir, "*.col")))
+    with ShardWriter(directory, shard_size) as writer:
+        for file_path in files:
+            writer.add(os.path.basename(file_path), CompactGraph.from_file(file_path), **_col_metadata(file_path))
+    return len(files)
+
+
+def unpack(directory, problems_dir):
+    """
+    Writes every instance of a dataset back as a .col file.
+
+    Returns:
+        int: The number of instances written.
+    """
+    os.makedirs(problems_dir, exist_ok=True)
+    dataset = GraphDataset(directory)
+    for name, graph in dataset:
+        metadata = dataset.metadata(name)
+        with open(os.path.join(problems_dir, name), "w") as f:
+            if metadata["colors"] >= 0:
+                solvable = None
+                if 0 <= metadata["upper_bound"] <= metadata["colors"]:
+                    solvable = True
+                elif metadata["lower_bound"] > metadata["colors"]:
+                    solvable = False
+                f.write(f"c colors {metadata['colors']} solvable {solvable} seed {metadata['seed']} "
+                        f"probability {metadata['p']}\n")
+            f.write(graph.to_dimacs() + "\n")
+    return len(dataset)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between .col files and packed datasets.")
+    parser.add_argument("command", choices=["pack", "unpack"])
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    parser.add_argument("--shard-size", type=int, default=10000)
+    args = parser.parse_args()
+    if args.command == "pack":
+        print(f"Packed {pack(args.source, args.destination, args.shard_size)} instances into {args.destination}")
+    else:
+        print(f"Unpacked {unpack(args.source, args.destination)} instances into {args.destination}")
@@ -1,8 +1,48 @@
+import math
+
+# The keyword arguments of ImprovementTrendEvaluator and their types, for callers that take rules as data
+STOPPING_RULES = {
+    "plateau_window": int, "stop_on_regression": bool, "stop_on_repeat": bool, "projection": bool,
+    "max_iterations": int,
+}
+
+
 class ImprovementTrendEvaluator:
-    def __init__(self):
+    """
+    Decides when to give up on S1 from numeric progress signals.
+
+    Every iteration records the number of conflicting edges, uncolored vertices, colors used and
+    conflicts carried over from the previous coloring. The score of an iteration is conflicts
+    plus uncolored vertices; S1 is stopped when one of the rules fires:
+
+    - plateau: the best score has not improved for plateau_window iterations (swapping one
+      conflict for another does not count as progress);
+    - regression: the score got worse than in the previous iteration;
+    - repeated coloring: the model returned a coloring it had already returned;
+    - projection: at the mean rate of improvement so far, the score would not reach 0 within
+      max_iterations (only with projection and a max_iterations).
+
+    Every rule can be turned off: plateau_window=None, stop_on_regression=False,
+    stop_on_repeat=False, projection=False.
+
+    update_feedback keeps the original string-equality check for callers without numbers.
+    """
+
+    def __init__(self, plateau_window=2, stop_on_regression=True, stop_on_repeat=True, projection=True,
+                 max_iterations=None):
         self.previous_feedback = None
         self.current_feedback = None
         self.no_improvement_flag = False
+        self.plateau_window = plateau_window
+        self.stop_on_regression = stop_on_regression
+        self.stop_on_repeat = stop_on_repeat
+        self.projection = projection
+        self.max_iterations = max_iterations  # the horizon of the projection rule
+        self.trajectory = []  # one dict of signals per iteration
+        self.stop_reason = None
+        self._best = None
+        self._since_best = 0
+        self._seen_colorings = set()
 
     def update_feedback(self, new_feedback):
         """Update the evaluator with new feedback from the validator."""
@@ -20,6 +60,68 @@ class ImprovementTrendEvaluator:
             else:
                 self.no_improvement_flag = False
 
+    def update(self, conflicts, uncolored, colors_used, coloring=None, repeated_conflicts=0):
+        """
+        Records the signals of an iteration and applies the stopping rules.
+
+        Args:
+            conflicts (int): Number of conflicting edges.
+            uncolored (int): Number of uncolored vertices.
+            colors_used (int): Number of distinct colors in the coloring.
+            coloring (dict, optional): The {vertex: color} assignment, to detect repeated colorings.
+            repeated_conflicts (int): Conflicting edges that were already conflicting in the previous coloring.
+
+        Returns:
+            bool: True when S1 should be stopped (also available from get_no_improvement_flag).
+        """
+        score = conflicts + uncolored
+        previous = self.trajectory[-1]["score"] if self.trajectory else None
+        repeated = False
+        if coloring is not None:
+            key = frozenset(coloring.items())
+            repeated = key in self._seen_colorings
+            self._seen_colorings.add(key)
+        if self._best is None or score < self._best:
+            self._best = score
+            self._since_best = 0
+        else:
+            self._since_best += 1
+
+        reason = None
+        if score == 0:
+            pass
+        elif self.stop_on_repeat and repeated:
+            reason = "repeated coloring"
+        elif self.stop_on_regression and previous is not None and score > previous:
+            reason = f"regression ({previous} -> {score})"
+        elif self.plateau_window is not None and self._since_best >= self.plateau_window:
+            reason = f"plateau (no better than {self._best} for {self._since_best} iterations)"
+        elif self.projection and self.max_iterations is not None and len(self.trajectory) + 1 < self.max_iterations:
+            projected = self.projected_iterations(score)
+            remaining = self.max_iterations - len(self.trajectory) - 1
+            # A score that is not improving at all is left to the plateau rule
+            if math.isfinite(projected) and projected > remaining:
+                reason = f"projection ({projected} more iterations needed, {remaining} left)"
+
+        self.trajectory.append({
+            "iteration": len(self.trajectory) + 1, "conflicts": conflicts, "uncolored": uncolored,
+            "colors_used": colors_used, "repeated_conflicts": repeated_conflicts, "repeated_coloring": repeated,
+            "score": score, "best": self._best, "stop": reason,
+        })
+        self.stop_reason = reason
+        self.no_improvement_flag = reason is not None
+        return self.no_improvement_flag
+
+    def projected_iterations(self, score):
+        """Iterations still needed to reach a score of 0 at the mean improvement rate so far (inf if not improving)."""
+        if not self.trajectory:
+            return 0 if score == 0 else 1
+        first = self.trajectory[0]["score"]
+        rate = (first - score) / len(self.trajectory)
+        if rate <= 0:
+            return math.inf
+        return math.ceil(score / rate)
+
     def get_no_improvement_flag(self):
         """Return the no improvement flag status."""
         return self.no_improvement_flag
@@ -27,6 +129,6 @@ class ImprovementTrendEvaluator:
     def print_status(self):
         """Print the current status of improvement."""
         if self.no_improvement_flag:
-            print("No improvement between the last two feedbacks.")
+            print(f"No improvement: {self.stop_reason or 'same feedback as the last iteration'}.")
         else:
-            print("Improvement detected or insufficient data for comparison.")
\ No newline at end of file
+            print("Improvement detected or insufficient data for comparison.")
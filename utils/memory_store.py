@@ -0,0 +1,171 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+EVICTION_POLICIES = ("lru", "least_useful")
+
+
+def problem_hash(problem):
+    """Hashes a problem with whitespace normalised, so identical problems are stored once."""
+    return hashlib.sha1(" ".join(problem.split()).encode()).hexdigest()
+
+
+class SQLiteMemoryStore:
+    """
+    Persistent, capacity-bounded episodic memory backend shared by several processes.
+
+    Entries live in an SQLite database in WAL mode, so any number of readers can run next to one
+    writer and every process and thread opens its own connection. Identical problems are stored once. When
+    the store grows past capacity the least recently used entries ("lru") or the least retrieved
+    ones ("least_useful") are evicted, and every eviction is logged so other processes can drop
+    the entry from their in-memory index incrementally.
+    """
+
+    def __init__(self, path, capacity=None, eviction="lru", timeout=30.0):
+        """
+        Args:
+            path (str): Path to the database file; it is created if missing.
+            capacity (int, optional): Maximum number of entries; None keeps everything.
+            eviction (str): "lru" or "least_useful".
+            timeout (float): Seconds to wait for another process's write lock.
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction!r}, expected one of {EVICTION_POLICIES}")
+        self.path = path
+        self.capacity = capacity
+        self.eviction = eviction
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # sqlite connections must not cross a fork or be shared between threads, so each opens its own
+        local = self._local
+        if getattr(local, "connection", None) is None or local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS memories (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    problem_hash TEXT NOT NULL UNIQUE,
+                    problem TEXT NOT NULL,
+                    solution TEXT NOT NULL,
+                    fingerprint BLOB,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    uses INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS evictions (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    memory_id INTEGER NOT NULL
+                );
+            """)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        local = self._local
+        if getattr(local, "connection", None) is not None and local.pid == os.getpid():
+            local.connection.close()
+        local.connection = None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def add(self, problem, solution, fingerprint=None):
+        """
+        Stores a problem and its solution unless an identical problem is already stored.
+
+        Args:
+            problem (str): The problem in DIMACS text form.
+            solution (str): Its solution.
+            fingerprint (np.ndarray, optional): Structural fingerprint, stored as raw float32 bytes.
+
+        Returns:
+            int: The id of the new entry, or of the existing one for a duplicate.
+            bool: True if the entry was inserted.
+        """
+        key = problem_hash(problem)
+        blob = None if fingerprint is None else fingerprint.astype("float32").tobytes()
+        now = time.time()
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO memories (problem_hash, problem, solution, fingerprint, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, problem, solution, blob, now, now),
+            )
+            inserted = cursor.rowcount == 1
+            if inserted:
+                memory_id = cursor.lastrowid
+                self._evict(memory_id)
+            else:
+                memory_id = connection.execute(
+                    "SELECT id FROM memories WHERE problem_hash = ?", (key,)
+                ).fetchone()[0]
+                connection.execute("UPDATE memories SET last_used = ? WHERE id = ?", (now, memory_id))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return memory_id, inserted
+
+    def _evict(self, keep_id):
+        """Deletes entries beyond capacity (never keep_id) and logs them; runs inside add's transaction."""
+        if self.capacity is None:
+            return
+        excess = len(self) - self.capacity
+        if excess <= 0:
+            return
+        order = "last_used" if self.eviction == "lru" else "uses, last_used"
+        victims = [row[0] for row in self.connection.execute(
+            f"SELECT id FROM memories WHERE id != ? ORDER BY {order} LIMIT ?", (keep_id, excess)
+        )]
+        self.connection.executemany("DELETE FROM memories WHERE id = ?", [(v,) for v in victims])
+        self.connection.executemany("INSERT INTO evictions (memory_id) VALUES (?)", [(v,) for v in victims])
+
+    def touch(self, memory_ids):
+        """Records that the given entries were retrieved (drives both eviction policies)."""
+        if not memory_ids:
+            return
+        now = time.time()
+        self.connection.executemany(
+            "UPDATE memories SET last_used = ?, uses = uses + 1 WHERE id = ?", [(now, i) for i in memory_ids]
+        )
+
+    def iter_problems(self, after_id=0, batch_size=1000):
+        """Yields (id, problem, fingerprint bytes) for entries with id > after_id, in id order, batch by batch."""
+        while True:
+            rows = self.connection.execute(
+                "SELECT id, problem, fingerprint FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, batch_size),
+            ).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    def evictions_after(self, seq):
+        """Returns (seq, memory id) for every eviction logged after seq."""
+        return self.connection.execute(
+            "SELECT seq, memory_id FROM evictions WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+
+    def last_eviction(self):
+        """Returns the sequence number of the latest logged eviction (0 if none)."""
+        return self.connection.execute("SELECT COALESCE(MAX(seq), 0) FROM evictions").fetchone()[0]
+
+    def get_solutions(self, memory_ids):
+        """Returns {id: (problem, solution)} for the entries that still exist."""
+        if not memory_ids:
+            return {}
+        placeholders = ",".join("?" * len(memory_ids))
+        rows = self.connection.execute(
+            f"SELECT id, problem, solution FROM memories WHERE id IN ({placeholders})", list(memory_ids)
+        )
+        return {row[0]: (row[1], row[2]) for row in rows}
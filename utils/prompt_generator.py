@@ -1,3 +1,9 @@
+import re
+
+from utils.graph import CompactGraph
+from utils.util_functions import process_plan
+
+
 def prompt_generator(graph_content, min_colors, additional_examples=None):
     """
     Generates a prompt for graph coloring with optional examples from episodic memory.
@@ -37,6 +43,167 @@ def prompt_generator(graph_content, min_colors, additional_examples=None):
     {example_section}Please provide the color assignment directly below:
     """
 
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Identical for every instance and iteration, so a server that caches the KV state of prompt
+# prefixes only has to process it once
+COMPACT_INSTRUCTIONS = """Graph coloring task.
+Assign a color (a positive integer) to every vertex so that no two adjacent vertices share a color.
+The graph is given as adjacency lists: "a: b c" means a is adjacent to b and to c. Each edge is listed once.
+Answer with one (vertex color) pair per line and nothing else, for example:
+(a 1)
+(b 2)
+(c 1)
+"""
+
+
+def count_tokens(text):
+    """
+    Estimates the number of tokens of a prompt.
+
+    Words and numbers count as one token and every punctuation mark as another, which is close to
+    what LLM tokenizers produce for the short vertex labels and numbers of these prompts.
+
+    Args:
+        text (str): The prompt.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def messages_tokens(messages):
+    """Estimates the number of prompt tokens of a list of chat messages."""
+    return sum(count_tokens(message["content"]) for message in messages)
+
+
+def adjacency_lists(graph):
+    """
+    Encodes a graph as one "vertex: neighbours" line per vertex, listing each edge once.
+
+    Args:
+        graph (CompactGraph): The graph.
+
+    Returns:
+        str: The adjacency lists; vertices without later neighbours get an empty list.
+    """
+    labels = graph.labels
+    lines = []
+    for v in range(graph.num_vertices):
+        later = [labels[u] for u in graph.neighbours(v).tolist() if u > v]
+        lines.append(f"{labels[v]}: {' '.join(later)}".rstrip())
+    return "\n".join(lines)
+
+
+def format_coloring(coloring):
+    """Formats a {vertex: color} dict as (vertex color) pairs, one per line."""
+    return "\n".join(f"({vertex} {color})" for vertex, color in coloring.items())
+
+
+class PromptBuilder:
+    """
+    Builds token-budgeted S1 conversations of constant size.
+
+    The first message holds the fixed instructions followed by the graph as adjacency lists (and
+    the episodic memory examples that fit), and never changes between iterations. Instead of the
+    whole history, every retry sends that message, the latest coloring and the conflicts still
+    outstanding, so the prompt does not grow with the number of iterations. Optional content
+    (examples, the full lists of conflicts and uncolored vertices) is dropped to stay within
+    token_budget, which every conversation respects unless over_budget is set.
+    """
+
+    def __init__(self, graph, min_colors, token_budget, additional_examples=None):
+        """
+        Args:
+            graph (CompactGraph): The instance.
+            min_colors (int): The maximum number of distinct colors that can be used.
+            token_budget (int): Maximum estimated prompt tokens per request (see count_tokens).
+            additional_examples (list of tuple, optional): (problem, solution) pairs from episodic memory.
+        """
+        self.graph = graph
+        self.min_colors = min_colors
+        self.token_budget = token_budget
+        self.token_counts = []  # estimated prompt tokens of every conversation built so far
+        base = (f"{COMPACT_INSTRUCTIONS}\nUse at most {min_colors} colors.\n"
+                f"Graph ({graph.num_vertices} vertices, {graph.num_edges} edges):\n{adjacency_lists(graph)}\n")
+        # Room for the latest coloring (4 tokens per "(vertex color)" line) and the fixed parts of the
+        # feedback must remain in later iterations
+        reserve = 4 * graph.num_vertices + 64
+        examples = ""
+        for problem, solution in additional_examples or []:
+            example = self._format_example(problem, solution)
+            if count_tokens(base + examples + example) + reserve > token_budget:
+                break
+            examples += example
+        self.initial_prompt = base + examples + "\nColoring:\n"
+        self.over_budget = count_tokens(self.initial_prompt) + reserve > token_budget
+
+    @staticmethod
+    def _format_example(problem, solution):
+        example_graph = CompactGraph.from_dimacs(problem)
+        coloring = process_plan(solution)
+        return (f"\nSolved example ({example_graph.num_vertices} vertices):\n{adjacency_lists(example_graph)}\n"
+                f"Coloring:\n{format_coloring(coloring)}\n")
+
+    def _record(self, messages):
+        self.token_counts.append(messages_tokens(messages))
+        return messages
+
+    def initial_messages(self):
+        """Returns the conversation for the first iteration."""
+        return self._record([{"role": "user", "content": self.initial_prompt}])
+
+    def retry_messages(self, coloring, conflict_edges, uncolored_vertices, example=None, num_colors=None):
+        """
+        Returns the conversation for the next iteration: the fixed first message, the latest
+        coloring and the outstanding mistakes, within the token budget.
+
+        Args:
+            coloring (dict): The latest {vertex: color} assignment.
+            conflict_edges (list of tuple): Adjacent vertex pairs that share a color.
+            uncolored_vertices (list of str): Vertices without a color.
+            example (str, optional): A solved subgraph example (see generate_example), added if it fits.
+            num_colors (int, optional): Distinct colors of the coloring; reported when over min_colors.
+
+        Returns:
+            list of dict: The chat messages.
+        """
+        index = self.graph.index
+        messages = [
+            {"role": "user", "content": self.initial_prompt},
+            # Labels the model made up are not part of the instance and are not repeated back
+            {"role": "assistant", "content": format_coloring({v: c for v, c in coloring.items() if v in index})},
+        ]
+        used = messages_tokens(messages)
+        feedback = "Your coloring is wrong."
+        if num_colors is not None and num_colors > self.min_colors:
+            feedback += f" It uses {num_colors} colors, at most {self.min_colors} are allowed."
+        closing = " Give the complete corrected coloring."
+        lists = [(" Uncolored vertices:", list(uncolored_vertices)),
+                 (" Adjacent vertices with the same color:", [f"{u}-{v}" for u, v in conflict_edges])]
+        lists = [(header, items) for header, items in lists if items]
+        # Keep as many uncolored vertices, then conflicts, as fit; the rest are only counted
+        available = self.token_budget - used - count_tokens(feedback + closing) - sum(
+            count_tokens(f"{header} and {len(items)} more.") for header, items in lists
+        )
+        for header, items in lists:
+            listed = []
+            for item in items:
+                cost = count_tokens(item)
+                if cost > available:
+                    break
+                available -= cost
+                listed.append(item)
+            rest = len(items) - len(listed)
+            feedback += " ".join([header, *listed])
+            feedback += f" and {rest} more." if rest else "."
+        if example is not None and used + count_tokens(feedback + closing + example) <= self.token_budget:
+            feedback += f" {example}"
+        messages.append({"role": "user", "content": feedback + closing})
+        return self._record(messages)
+
+
 # # Example usage:
 # if __name__ == "__main__":
 #     graph_content = """
@@ -0,0 +1,207 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.graph import CompactGraph
+from utils.graph_fingerprint import weisfeiler_lehman_rounds
+from validator.validate import GraphColoringValidator
+
+
+def wl_certificate(graph):
+    """
+    Computes an isomorphism-invariant certificate of a graph by Weisfeiler-Lehman refinement.
+
+    Refinement runs until the number of distinct colors stops growing. Isomorphic graphs always
+    get the same certificate; the rare non-isomorphic graphs that collide are told apart by
+    find_isomorphism.
+
+    Args:
+        graph (CompactGraph): The graph.
+
+    Returns:
+        str: The certificate.
+        np.ndarray: The stable vertex colors, used to restrict the isomorphism search.
+    """
+    colors = graph.degrees().astype(np.int64)
+    classes = len(np.unique(colors))
+    for refined in weisfeiler_lehman_rounds(graph, graph.num_vertices):
+        refined_classes = len(np.unique(refined))
+        colors = refined
+        if refined_classes == classes:
+            break
+        classes = refined_classes
+    digest = hashlib.sha1(f"{graph.num_vertices} {graph.num_edges} ".encode())
+    digest.update(np.sort(colors).tobytes())
+    return digest.hexdigest(), colors
+
+
+def find_isomorphism(source, source_colors, target, target_colors):
+    """
+    Finds a mapping from the vertices of source onto those of target that preserves edges.
+
+    Backtracking over adjacency bitmasks; a vertex may only be mapped onto a vertex with the same
+    Weisfeiler-Lehman color and the same adjacency to the vertices already mapped.
+
+    Args:
+        source (CompactGraph): Graph to map from.
+        source_colors (np.ndarray): Its stable WL colors (from wl_certificate).
+        target (CompactGraph): Graph to map onto.
+        target_colors (np.ndarray): Its stable WL colors.
+
+    Returns:
+        list or None: mapping[i] is the target vertex id of source vertex i, or None if the graphs
+                      are not isomorphic.
+    """
+    n = source.num_vertices
+    if n != target.num_vertices or source.num_edges != target.num_edges:
+        return None
+    if not np.array_equal(np.sort(source_colors), np.sort(target_colors)):
+        return None
+    source_adj = source.adjacency_bitsets()
+    target_adj = target.adjacency_bitsets()
+    by_color = {}
+    for j, color in enumerate(target_colors.tolist()):
+        by_color[color] = by_color.get(color, 0) | (1 << j)
+
+    # Map vertices from small color classes first, preferring neighbours of already ordered ones
+    class_size = {c: bin(mask).count("1") for c, mask in by_color.items()}
+    order = []
+    placed = 0
+    remaining = set(range(n))
+    while remaining:
+        frontier = [v for v in remaining if source_adj[v] & placed] or list(remaining)
+        v = min(frontier, key=lambda u: (class_size[source_colors[u]], -bin(source_adj[u]).count("1"), u))
+        order.append(v)
+        placed |= 1 << v
+        remaining.discard(v)
+
+    mapping = [-1] * n
+    mapped_source = 0  # bitmask of source vertices already mapped
+    mapped_target = 0  # bitmask of their images
+    stack = []
+    depth = 0
+    while True:
+        if depth == n:
+            return mapping
+        if len(stack) == depth:
+            v = order[depth]
+            # The image of v's mapped neighbours must be exactly the candidate's mapped neighbours
+            image = 0
+            for u in _bit_indices(source_adj[v] & mapped_source):
+                image |= 1 << mapping[u]
+            candidates = by_color[source_colors[v]] & ~mapped_target
+            stack.append([c for c in _bit_indices(candidates) if target_adj[c] & mapped_target == image])
+        v = order[depth]
+        if mapping[v] >= 0:
+            mapped_source &= ~(1 << v)
+            mapped_target &= ~(1 << mapping[v])
+            mapping[v] = -1
+        if not stack[depth]:
+            stack.pop()
+            depth -= 1
+            if depth < 0:
+                return None
+            continue
+        c = stack[depth].pop()
+        mapping[v] = c
+        mapped_source |= 1 << v
+        mapped_target |= 1 << c
+        depth += 1
+
+
+def _bit_indices(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SolutionCache:
+    """
+    LRU cache of optimal colorings keyed by an isomorphism-invariant certificate.
+
+    A hit is verified by an explicit isomorphism, remapped to the labels of the new graph and
+    validated before it is returned, so instances that repeat up to relabeling skip S1 and S2.
+    The cache may be shared by several threads.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # certificate -> list of (graph, WL colors, coloring by vertex id, chromatic number)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.collisions = 0  # certificate matched but the graphs were not isomorphic
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, graph):
+        """
+        Returns the cached optimal coloring of a graph isomorphic to graph, in graph's labels.
+
+        Args:
+            graph (CompactGraph or str): The instance, or its DIMACS text.
+
+        Returns:
+            tuple or None: ({vertex: color}, chromatic number) on a hit, None on a miss.
+        """
+        if not isinstance(graph, CompactGraph):
+            graph = CompactGraph.from_dimacs(graph)
+        certificate, colors = wl_certificate(graph)
+        with self._lock:
+            for cached_graph, cached_wl, cached_coloring, chromatic_number in self.entries.get(certificate, []):
+                mapping = find_isomorphism(graph, colors, cached_graph, cached_wl)
+                if mapping is None:
+                    self.collisions += 1
+                    continue
+                remapped = cached_coloring[mapping]
+                counts, _, uncolored = GraphColoringValidator(graph).validate_batch(remapped[None, :])
+                if counts[0] or uncolored.any():
+                    continue
+                self.entries.move_to_end(certificate)
+                self.hits += 1
+                labels = graph.labels
+                return {labels[i]: int(c) for i, c in enumerate(remapped.tolist())}, chromatic_number
+            self.misses += 1
+            return None
+
+    def store(self, graph, coloring, chromatic_number):
+        """
+        Caches an optimal coloring of graph.
+
+        Args:
+            graph (CompactGraph or str): The instance, or its DIMACS text.
+            coloring (dict): {vertex: color} covering every vertex.
+            chromatic_number (int): The number of colors of the (optimal) coloring.
+        """
+        if not isinstance(graph, CompactGraph):
+            graph = CompactGraph.from_dimacs(graph)
+        certificate, colors = wl_certificate(graph)
+        with self._lock:
+            bucket = self.entries.setdefault(certificate, [])
+            for cached_graph, cached_wl, _, _ in bucket:
+                if find_isomorphism(graph, colors, cached_graph, cached_wl) is not None:
+                    self.entries.move_to_end(certificate)
+                    return
+            bucket.append((graph, colors, np.array([coloring[v] for v in graph.labels], dtype=np.int64), chromatic_number))
+            self.entries.move_to_end(certificate)
+            self.size += 1
+            while self.size > self.capacity:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += len(evicted)
+
+    def stats(self):
+        """Returns the hit, miss, eviction and collision counters and the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "collisions": self.collisions,
+            "size": self.size,
+        }
@@ -0,0 +1,137 @@
+"""
+Lightweight per-phase tracing for SOFAI runs.
+
+A Tracer records spans (timed phases such as "llm", "validate" or "s2", with attributes) and
+counters for one run. When the run finishes, every span and a closing record with the counters,
+per-phase totals and the run summary are appended to a JSONL trace, one JSON object per line:
+
+    {"run": "...", "type": "span", "name": "llm", "start": 0.0012, "duration": 1.93, "depth": 1, ...}
+    {"run": "...", "type": "run", "status": "ok", "counters": {...}, "phases": {"llm": {"count": 3, "total": 5.2}}, ...}
+
+A run that raises still gets its closing record, with status "error" and the exception's repr.
+
+Two opt-in hooks show where time and memory go: phases listed in profile_phases run under
+cProfile (stats are dumped to profile_dir as <run>.<phase>.prof, readable with pstats or
+snakeviz), and with trace_memory every span also records its tracemalloc peak. tracemalloc is
+process-wide, so memory figures of concurrent runs include each other's allocations.
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+
+class TraceWriter:
+    """Appends trace records to a JSONL file; one writer can be shared by concurrent runs."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, records):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+
+class Tracer:
+    """Spans and counters of one run; without a writer the records are only kept in memory."""
+
+    def __init__(self, writer=None, run_id=None, profile_phases=(), profile_dir=".", trace_memory=False):
+        """
+        Args:
+            writer (TraceWriter, optional): Where finish() appends the records.
+            run_id (str, optional): Identifies the run in the trace; random by default.
+            profile_phases (iterable of str): Span names to run under cProfile.
+            profile_dir (str): Directory of the .prof files.
+            trace_memory (bool): Record the tracemalloc peak of every span (starts tracemalloc).
+        """
+        self.writer = writer
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.profile_phases = set(profile_phases)
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.spans = []
+        self.counters = {}
+        self.phases = {}  # name -> {"count", "total"}
+        self._profiles = {}  # phase -> cProfile.Profile accumulated over its spans
+        self._stack = []  # open spans, for the depth and the memory peaks of nested spans
+        self._start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def count(self, name, value=1):
+        """Adds value to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block as a phase. The yielded dict can be updated with attributes
+        known only at the end of the phase (e.g. the number of conflicts found).
+        """
+        record = {"run": self.run_id, "type": "span", "name": name,
+                  "start": time.perf_counter() - self._start, "depth": len(self._stack), **attributes}
+        frame = {"peak": 0, "base": 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["base"] = current
+        self._stack.append(frame)
+        profile = None
+        if name in self.profile_phases:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            try:
+                profile.enable()
+            except ValueError:  # another profiler is active (e.g. a concurrent run's)
+                profile = None
+                self.count("profile_skipped")
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            duration = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            self._stack.pop()
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame["peak"])
+                record["memory_peak_kb"] = round((peak - frame["base"]) / 1024, 1)
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            record["duration"] = duration
+            self.spans.append(record)
+            phase = self.phases.setdefault(name, {"count": 0, "total": 0.0})
+            phase["count"] += 1
+            phase["total"] += duration
+
+    def finish(self, summary=None, error=None):
+        """
+        Writes the run's records (if there is a writer) and dumps its profiles.
+
+        Args:
+            summary (dict, optional): The run summary, stored in the closing record.
+            error (BaseException, optional): What made the run fail; the closing record then has
+                status "error" and the error's repr, and is otherwise "ok".
+
+        Returns:
+            dict: summary, for convenience.
+        """
+        for phase, profile in self._profiles.items():
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile.dump_stats(os.path.join(self.profile_dir, f"{self.run_id}.{phase}.prof"))
+        if self.writer is not None:
+            closing = {"run": self.run_id, "type": "run", "status": "ok" if error is None else "error",
+                       "duration": time.perf_counter() - self._start,
+                       "counters": self.counters, "phases": self.phases, "summary": summary}
+            if error is not None:
+                closing["error"] = repr(error)
+            self.writer.write(self.spans + [closing])
+        return summary
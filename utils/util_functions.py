@@ -1,40 +1,55 @@
+import os
 import re
+from functools import lru_cache
+
+from utils.graph import CompactGraph
+from utils.graph_shards import GraphDataset, is_dataset
+
+@lru_cache(maxsize=None)
+def open_dataset(directory):
+    """Opens a packed dataset directory once per process (see utils/graph_shards.py)."""
+    return GraphDataset(directory)
+
+def load_graph(file_path):
+    """
+    Loads a DIMACS file once into a CompactGraph that can be shared by every consumer.
+
+    A path inside a packed dataset directory ("dataset_dir/graph_n10_graph0.col") is read from the
+    dataset's memory-mapped shards instead.
+
+    Args:
+        file_path (str): The file path of the graph data in DIMACS format.
+
+    Returns:
+        CompactGraph: The parsed graph.
+    """
+    directory, name = os.path.split(file_path)
+    if not os.path.isfile(file_path) and is_dataset(directory or "."):
+        return open_dataset(directory or ".")[name]
+    return CompactGraph.from_file(file_path)
 
 def parse_graph(file_path):
     """
     Parses the graph content from a file in DIMACS format to prepare it for inclusion in a prompt.
     
     Args:
-        file_path (str): The file path of the graph data in DIMACS format.
+        file_path (str or CompactGraph): The file path of the graph data in DIMACS format, or an already loaded graph.
     
     Returns:
-        str: A string representation of the graph suitable for prompts, detailing vertices and edges.
+        tuple: The DIMACS text of the graph for prompts, the edge and vertex counts from the problem
+            line (as int; they were the raw str tokens before the graph was parsed into a CompactGraph),
+            the edges as "u v" strings and the vertex labels.
     """
-    edges = []
-    num_vertices = 0
-    num_edges = 0
-    vertices = list()
-
-    # Open and read the file
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-
-    for line in lines:
-        parts = line.strip().split()
-        if len(parts) > 0:
-            if parts[0] == 'p':
-                _, _, num_vertices, num_edges = parts
-            elif parts[0] == 'e' and len(parts) == 3:
-                _, v1, v2 = parts
-                edges.append(f"{v1} {v2}")
-                vertices.append(v1)
-                vertices.append(v2)
-    
-    vertices = list(set(vertices))
+    graph = file_path if isinstance(file_path, CompactGraph) else load_graph(file_path)
+    edges = [f"{v1} {v2}" for v1, v2 in graph.edge_labels()]
+    vertices = list(graph.labels)
 
     # Preparing the string to be added to the prompt
-    graph_description = f"p edge {num_vertices} {num_edges}\n" + "\n".join(f"e {edge}" for edge in edges)
-    return graph_description, num_edges, num_vertices, edges, vertices
+    graph_description = graph.to_dimacs()
+    return graph_description, graph.declared_edges, graph.declared_vertices, edges, vertices
+
+# A vertex-color pair in the format (vertex color), wherever it appears in the response
+PAIR_PATTERN = re.compile(r"\((\w+)\s+(\d+)\)")
 
 def process_plan(response):
     """
@@ -47,18 +62,76 @@ def process_plan(response):
         dict: A dictionary with vertices as keys and their assigned colors as values.
     """
     coloring_assignment = {}
-    lines = response.strip().split('\n')
-    pattern = re.compile(r"\((\w+)\s+(\d+)\)")  # Regex to capture the vertex-color pair in the format (vertex color)
-
-    for line in lines:
-        line = line.strip()
-        match = pattern.match(line)
-        if match:
-            vertex, color = match.groups()
-            coloring_assignment[vertex] = int(color)  # Convert color to integer and store
+    for vertex, color in PAIR_PATTERN.findall(response):
+        coloring_assignment[vertex] = int(color)  # Convert color to integer and store
 
     return coloring_assignment
 
+class StreamingPlanParser:
+    """
+    Incremental version of process_plan for a response that arrives chunk by chunk.
+
+    It keeps a running coloring and tells the caller when generating more text is pointless:
+    once every vertex of the graph has a color or, with stop_on_conflict, as soon as two
+    adjacent vertices get the same color. Fed the whole response it yields the same coloring
+    as process_plan.
+    """
+
+    def __init__(self, graph, stop_on_conflict=False):
+        """
+        Args:
+            graph (CompactGraph): The instance being colored.
+            stop_on_conflict (bool): Also stop at the first conflicting pair.
+        """
+        self.graph = graph
+        self.stop_on_conflict = stop_on_conflict
+        self.coloring = {}
+        self.conflict = None  # the first conflicting edge seen, as a (u, v) label pair
+        self.chunks = 0
+        self._buffer = ""
+        self._colored = 0  # vertices of the graph with a color
+
+    @property
+    def complete(self):
+        return self._colored == self.graph.num_vertices
+
+    def feed(self, chunk):
+        """
+        Consumes the next chunk of the response.
+
+        Args:
+            chunk (str): The text received since the previous call.
+
+        Returns:
+            bool: True when the generation can be stopped.
+        """
+        self.chunks += 1
+        self._buffer += chunk
+        end = 0
+        for match in PAIR_PATTERN.finditer(self._buffer):
+            self._assign(match.group(1), int(match.group(2)))
+            end = match.end()
+        # A pair contains no "(", so only the text from the last one on can still start a pair
+        start = self._buffer.rfind("(", end)
+        self._buffer = self._buffer[start:] if start >= 0 else ""
+        return self.complete or (self.stop_on_conflict and self.conflict is not None)
+
+    def _assign(self, vertex, color):
+        index = self.graph.index.get(vertex)
+        if index is None:
+            # Not a vertex of this graph; kept so the result matches process_plan
+            self.coloring[vertex] = color
+            return
+        if vertex not in self.coloring:
+            self._colored += 1
+        self.coloring[vertex] = color
+        if self.conflict is None:
+            labels = self.graph.labels
+            for u in self.graph.neighbours(index).tolist():
+                if self.coloring.get(labels[u]) == color:
+                    self.conflict = (labels[u], vertex)
+                    break
+
 def print_aesthetic(message, symbol='=', length=50):
     """
     Prints a message in a nicely formatted way.
@@ -0,0 +1,197 @@
+"""
+Drawing of colorings for the app.
+
+matplotlib and networkx take a few hundred milliseconds to import, so they are imported by the
+functions that draw, on the renderer's worker thread, the first time a figure is needed.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Larger instances are drawn as a summary plus the subgraph around the conflicting edges
+FULL_DRAW_MAX_VERTICES = 100
+# At most this many conflicting edges are drawn in the conflict view
+CONFLICT_VIEW_MAX_EDGES = 40
+UNCOLORED_RGBA = (0.5, 0.5, 0.5, 1.0)
+
+
+def graph_key(graph):
+    """Identifies an instance by its contents, so a regenerated file with the same name gets a new layout."""
+    digest = hashlib.sha1("\n".join(graph.labels).encode())
+    digest.update(graph.edges.tobytes())
+    return digest.hexdigest()
+
+
+def spring_layout(graph, vertices=None):
+    """
+    Computes node positions for graph, or for the subgraph induced by the given vertex ids.
+
+    Returns:
+        np.ndarray: An (n, 2) array of positions, in the order of vertices (all vertices by default).
+    """
+    import networkx as nx
+
+    if vertices is None:
+        vertices = list(range(graph.num_vertices))
+    selected = set(vertices)
+    G = nx.Graph()
+    G.add_nodes_from(vertices)
+    G.add_edges_from((u, v) for u, v in graph.edges.tolist() if u in selected and v in selected)
+    pos = nx.spring_layout(G, seed=42) if G.number_of_edges() > 0 else nx.circular_layout(G)
+    return np.array([pos[v] for v in vertices]).reshape(-1, 2)
+
+
+class LayoutCache:
+    """LRU cache of full-graph layouts keyed by instance contents; safe to share between threads."""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.layouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, graph):
+        """Returns the (n, 2) positions of every vertex of graph, computing them on the first call."""
+        key = graph_key(graph)
+        with self._lock:
+            if key in self.layouts:
+                self.layouts.move_to_end(key)
+                self.hits += 1
+                return self.layouts[key]
+        positions = spring_layout(graph)
+        with self._lock:
+            self.misses += 1
+            self.layouts[key] = positions
+            while len(self.layouts) > self.capacity:
+                self.layouts.popitem(last=False)
+        return positions
+
+
+def _node_colors(graph, coloring, vertices):
+    import matplotlib
+
+    labels = graph.labels
+    unique_colors = sorted(set(coloring.values()))
+    palette = matplotlib.colormaps['rainbow'].resampled(max(len(unique_colors), 1))
+    color_value_map = {color: palette(i) for i, color in enumerate(unique_colors)}
+    return [color_value_map.get(coloring.get(labels[v]), UNCOLORED_RGBA) for v in vertices]
+
+
+def _draw(ax, graph, positions, vertices, edges, coloring, conflicts, with_labels=True):
+    """Draws the given vertex ids at positions (aligned with vertices) and edges (pairs of ids)."""
+    from matplotlib.collections import LineCollection
+
+    where = {v: i for i, v in enumerate(vertices)}
+    segments = [(positions[where[u]], positions[where[v]]) for u, v in edges]
+    conflict_set = {tuple(sorted(e)) for e in conflicts}
+    colors = ["red" if tuple(sorted((u, v))) in conflict_set else "black" for u, v in edges]
+    widths = [3.0 if c == "red" else 1.0 for c in colors]
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=widths, zorder=1))
+    size = 500 if len(vertices) <= 30 else max(30, 15000 // max(len(vertices), 1))
+    ax.scatter(positions[:, 0], positions[:, 1], s=size, c=_node_colors(graph, coloring, vertices), zorder=2,
+               edgecolors="black", linewidths=0.5)
+    if with_labels:
+        font_size = 16 if len(vertices) <= 30 else 8
+        for i, v in enumerate(vertices):
+            ax.annotate(graph.labels[v], positions[i], ha="center", va="center", fontsize=font_size, zorder=3)
+    ax.set_axis_off()
+    ax.autoscale_view()
+
+
+def render_coloring(graph, coloring, is_correct, feedback, conflicts=(), layout_cache=None):
+    """
+    Draws a coloring of graph and returns the figure as PNG bytes.
+
+    Graphs with at most FULL_DRAW_MAX_VERTICES vertices are drawn whole on a cached layout, so
+    only the node colors change between iterations. Larger graphs get a summary (colors used,
+    conflicts, uncolored vertices) and, if there are conflicts, a drawing of the subgraph spanned
+    by the first CONFLICT_VIEW_MAX_EDGES conflicting edges.
+
+    Uses the object-oriented matplotlib API (no pyplot state), so it can run in a worker thread.
+
+    Args:
+        graph (CompactGraph): The instance.
+        coloring (dict): {vertex label: color}; missing vertices are drawn gray.
+        is_correct (bool): Whether the coloring is valid.
+        feedback (str): Title shown for an invalid coloring.
+        conflicts (list of tuple): Conflicting edges as (u, v) vertex id pairs, drawn in red.
+        layout_cache (LayoutCache, optional): Cache of full-graph layouts.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 8))
+    ax = fig.subplots()
+    n = graph.num_vertices
+    if n <= FULL_DRAW_MAX_VERTICES:
+        positions = layout_cache.get(graph) if layout_cache is not None else spring_layout(graph)
+        _draw(ax, graph, positions, list(range(n)), graph.edges.tolist(), coloring, conflicts)
+    else:
+        shown = list(conflicts)[:CONFLICT_VIEW_MAX_EDGES]
+        labels = graph.labels
+        used = len({coloring[label] for label in labels if label in coloring})
+        uncolored = sum(label not in coloring for label in labels)
+        summary = (f"{n} vertices, {graph.num_edges} edges, {used} colors used, "
+                   f"{len(conflicts)} conflicting edges, {uncolored} uncolored vertices")
+        if shown:
+            vertices = sorted({v for edge in shown for v in edge})
+            _draw(ax, graph, spring_layout(graph, vertices), vertices, shown, coloring, shown)
+            summary += f"\n(showing {len(shown)} conflicting edges)"
+        else:
+            ax.set_axis_off()
+        fig.text(0.5, 0.02, summary, ha="center", fontsize=12)
+
+    if is_correct:
+        ax.set_title("Graph Coloring - Correct Solution", fontsize=20, color='green')
+    else:
+        ax.set_title(f"Graph Coloring - {feedback}", fontsize=20 if len(feedback) < 60 else 10, color='red', wrap=True)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+class BackgroundRenderer:
+    """
+    Renders figures on a single worker thread so drawing does not delay the next LLM call.
+
+    Each submitted render is bound to a slot of the caller (for example a Streamlit placeholder).
+    The caller shows finished images with drain(), from its own thread. A render that has not
+    started yet when a newer one is submitted is dropped, so a slow renderer never falls behind.
+    """
+
+    def __init__(self, layout_cache=None):
+        self.layout_cache = layout_cache if layout_cache is not None else LayoutCache()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []  # (slot, future) in submission order
+        self.dropped = 0
+
+    def submit(self, slot, graph, coloring, is_correct, feedback, conflicts=()):
+        """Queues a render_coloring call whose image belongs to slot."""
+        for _, future in self._pending:
+            if not future.cancelled() and future.cancel():
+                self.dropped += 1
+        future = self._executor.submit(
+            render_coloring, graph, dict(coloring), is_correct, feedback, list(conflicts), self.layout_cache
+        )
+        self._pending.append((slot, future))
+
+    def drain(self, wait=False):
+        """
+        Returns [(slot, png bytes or None)] for the renders that are finished (all of them with wait).
+        None means the render was dropped in favour of a newer one.
+        """
+        finished, pending = [], []
+        for slot, future in self._pending:
+            if wait or future.done():
+                finished.append((slot, None if future.cancelled() else future.result()))
+            else:
+                pending.append((slot, future))
+        self._pending = pending
+        return finished
@@ -1,18 +1,31 @@
-import networkx as nx
+import numpy as np
+
+from utils.graph import CompactGraph
+from utils.util_functions import load_graph
+
+# Color code used for vertices without an assigned color
+UNCOLORED = -1
+
+def encode_coloring(graph, coloring):
+    """Converts a {vertex: color} dict into an int array indexed by the vertex ids of graph."""
+    colors = [coloring.get(label) for label in graph.labels]
+    return np.array([UNCOLORED if c is None else c for c in colors], dtype=np.int64)
 
 class GraphColoringValidator:
     def __init__(self, dimacs_file):
-        self.graph = self.load_graph_from_dimacs(dimacs_file)
+        """
+        Args:
+            dimacs_file (str or CompactGraph): Path to a DIMACS file, or an already loaded graph.
+        """
+        if isinstance(dimacs_file, CompactGraph):
+            self.graph = dimacs_file
+        else:
+            self.graph = self.load_graph_from_dimacs(dimacs_file)
+        self.edges = self.graph.edges.astype(np.intp)
 
     def load_graph_from_dimacs(self, file_path):
-        """Loads a graph from a DIMACS format file."""
-        G = nx.Graph()
-        with open(file_path, 'r') as file:
-            for line in file:
-                if line.startswith('e'):
-                    _, u, v = line.strip().split()
-                    G.add_edge(u, v)  # Treat u and v as strings (compatible with alphanumeric labels)
-        return G
+        """Loads a graph from a DIMACS format file (or from a packed dataset, see load_graph)."""
+        return load_graph(file_path)
 
     def validate_coloring(self, coloring, confidence=False):
         """Validates the coloring of the graph and optionally calculates the completion score.
@@ -27,10 +40,10 @@ class GraphColoringValidator:
             list: List of edges where coloring fails.
             float (optional): Completion score, only returned if confidence is True.
         """
-        errors = []
-        for u, v in self.graph.edges():
-            if coloring.get(u) == coloring.get(v):
-                errors.append((u, v))
+        colors = self.encode_coloring(coloring)
+        # Both endpoints uncolored also counts as a failing edge here
+        failing = np.flatnonzero(colors[self.edges[:, 0]] == colors[self.edges[:, 1]])
+        errors = self.edge_labels(failing)
 
         is_valid = len(errors) == 0
         if confidence:
@@ -39,6 +52,78 @@ class GraphColoringValidator:
         else:
             return is_valid, errors
 
+    def encode_coloring(self, coloring):
+        """Converts a {vertex: color} dict into an int array indexed by vertex id (UNCOLORED when missing)."""
+        return encode_coloring(self.graph, coloring)
+
+    def encode_colorings(self, colorings):
+        """Converts a list of {vertex: color} dicts, or a (B, V) array, into a (B, V) int array."""
+        if isinstance(colorings, np.ndarray):
+            return np.atleast_2d(colorings).astype(np.int64, copy=False)
+        if isinstance(colorings, dict):
+            colorings = [colorings]
+        if not colorings:
+            return np.empty((0, self.graph.num_vertices), dtype=np.int64)
+        return np.stack([self.encode_coloring(c) for c in colorings])
+
+    def edge_labels(self, edge_ids):
+        """Returns the label pairs of the given edge ids."""
+        labels = self.graph.labels
+        return [(labels[u], labels[v]) for u, v in self.graph.edges[edge_ids].tolist()]
+
+    def validate_batch(self, colorings):
+        """Validates a batch of candidate colorings in one vectorized pass over the (E, 2) edge array.
+
+        Args:
+            colorings (list of dict or np.ndarray): Candidate colorings, either as dicts or as a
+                (B, V) int array indexed by vertex id with UNCOLORED for missing vertices.
+
+        Returns:
+            np.ndarray: (B,) number of conflicting edges per candidate.
+            np.ndarray: (B, E) bool mask of edges whose endpoints share a color.
+            np.ndarray: (B, V) bool mask of uncolored vertices.
+        """
+        colors = self.encode_colorings(colorings)
+        left = colors[:, self.edges[:, 0]]
+        conflicts = (left == colors[:, self.edges[:, 1]]) & (left != UNCOLORED)
+        uncolored = colors == UNCOLORED
+        return conflicts.sum(axis=1), conflicts, uncolored
+
+    def evaluate(self, coloring, feedback_type="All Mistakes"):
+        """Validates one coloring and formats feedback like validator.evaluate_response.
+
+        Args:
+            coloring (dict or np.ndarray): The coloring to check.
+            feedback_type (str): "Right/Wrong", "Single Mistake" or "All Mistakes"
+                                 (or their underscore spellings).
+
+        Returns:
+            bool: True if every vertex is colored and no edge is in conflict.
+            str: The feedback message.
+        """
+        colors = self.encode_colorings(coloring)
+        _, conflicts, uncolored = self.validate_batch(colors)
+        missing = [self.graph.labels[i] for i in np.flatnonzero(uncolored[0])]
+        conflict_edges = self.edge_labels(np.flatnonzero(conflicts[0]))
+        if not missing and not conflict_edges:
+            return True, "The coloring is valid."
+
+        if feedback_type in ("Right/Wrong", "Right_Wrong"):
+            return False, "The coloring is invalid."
+
+        row = colors[0]
+        index = self.graph.index
+        feedback_messages = []
+        if missing:
+            feedback_messages.append(f"Vertices {', '.join(missing)} are not colored.")
+        for u, v in conflict_edges:
+            feedback_messages.append(
+                f"Vertices {u} and {v} are adjacent and share the same color {row[index[u]]}."
+            )
+        if feedback_type in ("Single Mistake", "Single_Mistake"):
+            return False, feedback_messages[0]
+        return False, "\n".join(feedback_messages)
+
     def calculate_completion_score(self, coloring):
         """Calculates the completion score as the percentage of nodes correctly colored.
         
@@ -48,11 +133,109 @@ class GraphColoringValidator:
         Returns:
             float: Completion score percentage.
         """
-        total_nodes = len(self.graph.nodes())
-        correctly_colored_nodes = sum(1 for n in self.graph.nodes() if coloring.get(n) is not None)
+        total_nodes = self.graph.num_vertices
+        correctly_colored_nodes = sum(1 for n in self.graph.labels if coloring.get(n) is not None)
         completion_score = (correctly_colored_nodes / total_nodes) * 100
         return completion_score
 
+class ValidationSession:
+    """Stateful validator that re-checks only the edges around vertices whose color changed.
+
+    The session keeps the previous coloring and its set of conflicting edges, so across SOFAI
+    iterations the edge work is proportional to the degree of the changed vertices rather than
+    to the size of the graph.
+    """
+
+    def __init__(self, validator):
+        """
+        Args:
+            validator (GraphColoringValidator or CompactGraph): The instance being solved.
+        """
+        self.graph = validator.graph if isinstance(validator, GraphColoringValidator) else validator
+        self.colors = np.full(self.graph.num_vertices, UNCOLORED, dtype=np.int64)
+        self.conflicts = set()  # (u, v) vertex-id pairs with u < v sharing a color
+        self.num_uncolored = self.graph.num_vertices
+        self.iteration = 0
+
+    def update(self, coloring):
+        """Replaces the whole coloring; vertices missing from coloring become uncolored.
+
+        Args:
+            coloring (dict): The new {vertex: color} assignment.
+
+        Returns:
+            dict: The conflict delta, see apply_changes.
+        """
+        new_colors = encode_coloring(self.graph, coloring)
+        changed = np.flatnonzero(new_colors != self.colors)
+        labels = self.graph.labels
+        return self.apply_changes({labels[i]: new_colors[i] for i in changed.tolist()})
+
+    def apply_changes(self, changes):
+        """Applies only the given color changes and re-checks the edges incident to them.
+
+        Args:
+            changes (dict): {vertex: color} for the vertices whose color changed; a color of
+                            None or UNCOLORED removes the vertex's color.
+
+        Returns:
+            dict: Lists of conflicting edges (as label pairs) under 'fixed', 'new' and
+                  'unchanged', plus the number of 'uncolored' vertices after the update.
+        """
+        index = self.graph.index
+        changed = []
+        for vertex, color in changes.items():
+            i = index.get(vertex)
+            if i is None:
+                continue
+            color = UNCOLORED if color is None else int(color)
+            if color == self.colors[i]:
+                continue
+            self.num_uncolored += int(color == UNCOLORED) - int(self.colors[i] == UNCOLORED)
+            self.colors[i] = color
+            changed.append(i)
+
+        removed = set()
+        added = set()
+        colors = self.colors
+        for i in changed:
+            color = colors[i]
+            for j in self.graph.neighbours(i).tolist():
+                edge = (i, j) if i < j else (j, i)
+                if color != UNCOLORED and colors[j] == color:
+                    if edge not in self.conflicts:
+                        self.conflicts.add(edge)
+                        added.add(edge)
+                elif edge in self.conflicts:
+                    self.conflicts.discard(edge)
+                    removed.add(edge)
+
+        # An edge between two changed vertices may have been dropped and re-added in this update
+        fixed = removed - added
+        new = added - removed
+        self.iteration += 1
+        labels = self.graph.labels
+        as_labels = lambda edges: [(labels[u], labels[v]) for u, v in sorted(edges)]
+        return {
+            'fixed': as_labels(fixed),
+            'new': as_labels(new),
+            'unchanged': as_labels(self.conflicts - new),
+            'uncolored': self.num_uncolored,
+        }
+
+    def is_valid(self):
+        """True when every vertex is colored and no edge is in conflict."""
+        return not self.conflicts and self.num_uncolored == 0
+
+    def conflict_edges(self):
+        """Returns the current conflicting edges as label pairs."""
+        labels = self.graph.labels
+        return [(labels[u], labels[v]) for u, v in sorted(self.conflicts)]
+
+    def uncolored_vertices(self):
+        """Returns the labels of the vertices that have no color."""
+        return [self.graph.labels[i] for i in np.flatnonzero(self.colors == UNCOLORED)]
+
 # # Example Usage
 # if __name__ == "__main__":
 #     # The DIMACS file should correspond to the one used by your generator and solver